@@ -9,7 +9,7 @@ from alembic import context
 
 from src.db.postgres_db import Base
 from src.auth.models import Users
-from src.chats.models import Chats, QuestionsAnswers
+from src.chats.models import Chats, QuestionsAnswers, VideoAccess, VideoIngestion
 from src.config import CONFIG
 
 DATABASE_URL = CONFIG.DATABASE_URL
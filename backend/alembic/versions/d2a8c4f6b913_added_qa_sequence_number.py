@@ -0,0 +1,48 @@
+"""added qa sequence number
+
+Revision ID: d2a8c4f6b913
+Revises: b7f3d9e41a62
+Create Date: 2026-10-18 10:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2a8c4f6b913'
+down_revision: Union[str, Sequence[str], None] = 'b7f3d9e41a62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('questionsandanswers', sa.Column('sequence_number', sa.BIGINT(), nullable=True))
+    # Existing rows numbered by time, ties (rows of one batched INSERT) by physical order
+    op.execute(
+        """
+        UPDATE questionsandanswers AS qa
+        SET sequence_number = ordered.position
+        FROM (
+            SELECT uuid, row_number() OVER (ORDER BY created_at, ctid) AS position
+            FROM questionsandanswers
+        ) AS ordered
+        WHERE qa.uuid = ordered.uuid
+        """
+    )
+    op.alter_column('questionsandanswers', 'sequence_number', nullable=False)
+    op.execute("ALTER TABLE questionsandanswers ALTER COLUMN sequence_number ADD GENERATED BY DEFAULT AS IDENTITY")
+    op.execute(
+        "SELECT setval(pg_get_serial_sequence('questionsandanswers', 'sequence_number'), "
+        "COALESCE((SELECT max(sequence_number) FROM questionsandanswers), 0) + 1, false)"
+    )
+    op.create_index('idx_chat_uid_sequence_number', 'questionsandanswers', ['chat_uid', 'sequence_number'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_chat_uid_sequence_number', table_name='questionsandanswers')
+    op.drop_column('questionsandanswers', 'sequence_number')
@@ -0,0 +1,45 @@
+"""backfilled video access from chats
+
+Revision ID: f4c9e7a2b615
+Revises: d2a8c4f6b913
+Create Date: 2026-10-18 14:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from src.utils import get_video_id
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4c9e7a2b615'
+down_revision: Union[str, Sequence[str], None] = 'd2a8c4f6b913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade data."""
+    # Chats created before video_access existed link their user to their video. Those videos
+    # get no registry row, their vectors are in the old per user namespaces, so the agent
+    # routes ingest them into the shared one on first use.
+    connection = op.get_bind()
+    chats = connection.execute(sa.text("SELECT DISTINCT user_uid, youtube_video_url FROM chats")).all()
+    links = {(user_uid, get_video_id(youtube_video_url)) for user_uid, youtube_video_url in chats}
+    rows = [{"user_uid": user_uid, "video_id": video_id} for user_uid, video_id in links if user_uid and video_id]
+    if rows:
+        connection.execute(
+            sa.text(
+                "INSERT INTO video_access (user_uid, video_id) VALUES (:user_uid, :video_id) "
+                "ON CONFLICT DO NOTHING"
+            ),
+            rows,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade data."""
+    # The backfilled links can't be told apart from the ones made since, they are kept
+    pass
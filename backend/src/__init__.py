@@ -1,4 +1,4 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 from contextlib import asynccontextmanager
@@ -10,6 +10,13 @@ from fastapi.exceptions import RequestValidationError
 from src.config import CONFIG
 from src.ai.components import Components
 from src.ai.agent import Agent
+from src.ai.chat_models import ChatModels, ChatModelRegistry
+from src.chats.qa_writer import QAWriteBehindQueue
+from src.ai.scheduler import LLMScheduler
+from src.ai.router import heuristic_router
+from src.ai.hedging import hedge_metrics
+from src.ai.retrieval import adaptive_top_k
+from src.auth.dependencies import admin_checker
 
 load_dotenv()
 
@@ -19,10 +26,35 @@ VERSION = 'v1'
 async def lifespan(app: FastAPI):
     components: Components = await Components.init()
 
-    app.state.agent = Agent()
+    qa_writer = QAWriteBehindQueue(
+        flush_interval_seconds=CONFIG.QA_WRITER_FLUSH_INTERVAL_SECONDS,
+        max_batch_size=CONFIG.QA_WRITER_MAX_BATCH_SIZE,
+    )
+    qa_writer.start()
+
+    agent = Agent(qa_writer=qa_writer)
+    # Cached answers of a video are stale once its transcript is gone
+    components.vector_db.add_delete_listener(agent.answer_cache.invalidate_video)
+    components.vector_db.add_delete_listener(agent.semantic_cache.invalidate_video)
+    components.vector_db.add_delete_listener(components.transcript_store.remove)
+
+    scheduler = LLMScheduler(
+        limits=CONFIG.LLM_RATE_LIMITS,
+        default_limits=CONFIG.LLM_DEFAULT_RATE_LIMITS,
+        max_queue_size=CONFIG.LLM_MAX_QUEUE_SIZE,
+        queue_timeout_seconds=CONFIG.LLM_QUEUE_TIMEOUT_SECONDS,
+    )
+    chat_models = ChatModelRegistry(scheduler=scheduler)
+    chat_models.warm_up([*ChatModels.AVAILABLE_MODELS, *CONFIG.NODE_MODELS.values()])
+
+    app.state.agent = agent
     app.state.components = components
+    app.state.chat_models = chat_models
     yield
 
+    await qa_writer.stop()
+    await chat_models.aclose()
+
 
 app = FastAPI(
     title="ChatTube",
@@ -98,5 +130,20 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     )
 
 
+# Operational numbers of the whole deployment, admins only
+@app.get(f"/api/{VERSION}/metrics", tags=['Metrics'], dependencies=[Depends(admin_checker)])
+async def get_metrics(request: Request):
+    return {
+        "router": heuristic_router.stats(),
+        "retrieval": adaptive_top_k.stats(),
+        "answer_cache": request.app.state.agent.answer_cache.stats(),
+        "semantic_cache": request.app.state.agent.semantic_cache.stats(),
+        "streams": request.app.state.agent.stream_metrics.stats(),
+        "qa_writer": request.app.state.agent.qa_writer.stats(),
+        "llm_scheduler": request.app.state.chat_models.scheduler.stats(),
+        "hedging": hedge_metrics.stats(),
+    }
+
+
 app.include_router(chats_router, tags=['Chats'], prefix=f"/api/{VERSION}/chats")
 app.include_router(auth_routes, tags=['Authentication'], prefix=f"/api/{VERSION}/auth")
\ No newline at end of file
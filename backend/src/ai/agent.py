@@ -1,8 +1,10 @@
-from typing import TypedDict, Annotated, Optional, List, Dict
+from typing import TypedDict, Annotated, Optional, List, Dict, Callable, Awaitable, Literal
+from contextlib import aclosing
 from dotenv import load_dotenv
+import asyncio
 import json
-from pydantic import BaseModel, Field,  ConfigDict
-from langgraph.config import RunnableConfig
+from pydantic import BaseModel, Field,  ConfigDict, ValidationError, field_validator
+from langgraph.config import RunnableConfig, get_stream_writer
 from langgraph.runtime import Runtime
 from langgraph.graph import StateGraph, START, END
 from enum import Enum
@@ -12,6 +14,17 @@ from .prompts import Prompts
 from .chat_models import ChatModels
 from .utils import typed_dict_to_prompt
 from .components import Components
+from .router import heuristic_router
+from .cache import AnswerCache
+from .semantic_cache import SemanticAnswerCache
+from .context_packer import context_packer, count_tokens
+from .memory import conversation_memory
+from .streaming import TokenCoalescer, StreamMetrics, with_release_deadlines
+from .hedging import HedgedStream
+from .retrieval import adaptive_top_k, split_query, run_limited
+from src.chats.qa_writer import QAWriteBehindQueue
+from src.app_responses import AppError
+from src.config import CONFIG
 
 
 
@@ -25,8 +38,15 @@ class Nodes(Enum):
     FINAL_LLM_RESPONSE = "final_llm_response"
 
 
+NODE_NAMES = {node.value for node in Nodes}
+
+
 class AgentContext(BaseModel):
     chat_model: ChatModels = Field(default=ChatModels())
+    # Per node overrides of chat_model, see CONFIG.NODE_MODELS
+    node_models: Dict[str, ChatModels] = Field(default_factory=dict)
+    # Raced against chat_model for the final answer, see CONFIG.HEDGE_FALLBACK_MODELS
+    fallback_model: Optional[ChatModels] = None
     components: Components
 
     # To be passed during every run
@@ -34,8 +54,17 @@ class AgentContext(BaseModel):
     video_id: str
     chat_id: str
 
+    # Vector search started alongside the decision llm call, consumed by fetch_relevant_context
+    speculative_retrieval: Optional[asyncio.Task] = None
+    # Model that streamed the final answer, the fallback's when the hedge picked it
+    answered_by: Optional[str] = None
+
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
+    def model_for(self, node: Nodes) -> ChatModels:
+        """Returns the chat model configured for the node, defaults to the user selected one."""
+        return self.node_models.get(node.value, self.chat_model)
+
 
 class DecisionState(TypedDict):
     requires_previous_conversations: Annotated[
@@ -54,6 +83,20 @@ class DecisionState(TypedDict):
     user_query: Annotated[str, "Raw text of the user’s latest message or instruction."]
 
 
+class RoutingDecision(BaseModel):
+    """Validates the decision llm's JSON, lax mode coerces "10" to 10 and "true" to True."""
+
+    requires_previous_conversations: bool = False
+    start_time: Optional[int] = None
+    end_time: Optional[int] = None
+    user_query: Optional[str] = None
+
+    @field_validator("start_time", "end_time")
+    @classmethod
+    def drop_negative_minutes(cls, value: Optional[int]) -> Optional[int]:
+        return value if value is None or value >= 0 else None
+
+
 class AgentState(DecisionState):
     relevant_context: List[Dict]
     conversation_history: List[str]
@@ -62,17 +105,81 @@ class AgentState(DecisionState):
     response: str
 
 
+def emit_agent_step(node: Nodes):
+    """Pushes the agent_step payload for the custom stream mode, a no-op in the events mode."""
+    get_stream_writer()(("agent_step", {"name": node.value}))
+
+
+def discard_search(search: Optional[asyncio.Task]):
+    """Cancels a search nothing will await, retrieving its failure so asyncio doesn't log it."""
+    if search is None:
+        return
+    search.cancel()
+    search.add_done_callback(lambda done: done.cancelled() or done.exception())
+
+
+def get_whole_transcript(context: AgentContext) -> Optional[List[Dict]]:
+    """Returns every chunk of the video when its transcript fits the model budget, else None."""
+    video_transcript = context.components.transcript_store.get(context.video_id)
+    if video_transcript is None:
+        return None
+    threshold = context_packer.whole_transcript_threshold(context.chat_model.llm.model_name)
+    if video_transcript.token_count > threshold:
+        return None
+    return video_transcript.chunks
+
+
 async def llm_initial_decision_maker(
     state: AgentState, runtime: Runtime[AgentContext], config: RunnableConfig
 ) -> dict:
-    """Returns the updated decision state directly from llm."""
-    chat_model = runtime.context.chat_model
+    """Returns the updated decision state, from the heuristic router when confident else from llm."""
+    emit_agent_step(Nodes.LLM_INITIAL_DECISION_MAKER)
+    context = runtime.context
+    chat_model = context.model_for(Nodes.LLM_INITIAL_DECISION_MAKER)
     user_query = state["user_query"]
-    instruction = typed_dict_to_prompt(DecisionState)
-    prompt = Prompts.INITIAL_DECISION_PROMPT.value.format(
-        query=user_query, instruction=instruction
-    )
-    decision_dict = await chat_model.call_llm(prompt, is_json=True)
+
+    # Most queries can be decided locally in microseconds, the llm is only the fallback
+    decision_dict = heuristic_router.route(user_query)
+    if decision_dict is None:
+        instruction = typed_dict_to_prompt(DecisionState)
+        prompt = Prompts.INITIAL_DECISION_PROMPT.value.format(
+            query=user_query, instruction=instruction
+        )
+
+        # The search almost always runs with the raw query, so start it while the llm decides
+        speculative_retrieval = None
+        if CONFIG.SPECULATIVE_RETRIEVAL and get_whole_transcript(context) is None:
+            speculative_retrieval = asyncio.create_task(
+                context.components.vector_db.retrieve_context(
+                    query=user_query,
+                    video_id=context.video_id,
+                    k=adaptive_top_k.candidate_k,
+                )
+            )
+
+        try:
+            llm_decision = await chat_model.call_llm(prompt, is_json=True, user_id=context.user_id)
+            decision = RoutingDecision.model_validate(llm_decision)
+            decision_dict = {**decision.model_dump(), "user_query": decision.user_query or user_query}
+        except (json.JSONDecodeError, ValidationError) as e:
+            # A broken routing answer shouldn't fail the whole question, use the local guess
+            logger.warning(f"[LLM INITIAL DECISION MAKER] invalid decision, using the heuristic one: {e}")
+            decision_dict, _ = heuristic_router.classify(user_query)
+        except BaseException:
+            discard_search(speculative_retrieval)
+            raise
+
+        if speculative_retrieval is not None:
+            is_reusable = (
+                decision_dict.get("start_time") is None
+                and decision_dict.get("end_time") is None
+                and decision_dict.get("user_query", user_query) == user_query
+            )
+            if is_reusable:
+                context.speculative_retrieval = speculative_retrieval
+            else:
+                logger.debug("[LLM INITIAL DECISION MAKER] speculative retrieval discarded")
+                discard_search(speculative_retrieval)
 
     if decision_dict.get("requires_previous_conversations"):
         decision_dict.update({'next_node': 'retrieve_conversation'})
@@ -95,45 +202,185 @@ async def route_to_context_or_conversation(state: AgentState) -> str:
 async def fetch_conversation_history(
     state: AgentState, runtime: Runtime[AgentContext]
 ) -> dict:
+    emit_agent_step(Nodes.FETCH_CONVERSATION_HISTORY)
     context = runtime.context
-    conversation_history = []
-    
-    # Since this contains the memory part, this will be done later
+    try:
+        conversation_history = await conversation_memory.load(context.chat_id)
+    except Exception as e:
+        # Answering without the history beats failing the question
+        logger.exception(f"[FETCH CONVERSATION HISTORY] {e}")
+        conversation_history = []
+
+    return {"conversation_history": conversation_history, 'next_node': 'fetch_relevant_context'}
+
+
+async def hybrid_search(context: AgentContext, user_query: str) -> List[Dict]:
+    """
+    Dense search fused with the BM25 matches of the locally stored transcript.
+
+    Compound questions are split into sub-queries searched concurrently, so the fan out costs
+    about one search round trip. With the transcript in the store, a failing or slow vector db
+    degrades to lexical only results instead of failing the question.
+    """
+    sub_queries = split_query(user_query, CONFIG.MULTI_QUERY_MAX_SUB_QUERIES)
+    dense_searches: List[Awaitable[List[Dict]]] = []
+    for sub_query in sub_queries:
+        if sub_query == user_query and context.speculative_retrieval is not None:
+            # Started with the raw query while the decision llm ran
+            dense_searches.append(context.speculative_retrieval)
+            context.speculative_retrieval = None
+        else:
+            dense_searches.append(
+                run_limited(
+                    context.components.vector_db.retrieve_context(
+                        query=sub_query,
+                        video_id=context.video_id,
+                        k=adaptive_top_k.candidate_k,
+                    )
+                )
+            )
+    if len(sub_queries) > 1:
+        logger.debug(f"[FETCH RELEVANT CONTEXT] fanned out into {sub_queries}")
+
+    video_transcript = context.components.transcript_store.get(context.video_id)
+    if video_transcript is None or CONFIG.RETRIEVAL_LEXICAL_K <= 0:
+        dense_lists: List[List[Dict]] = await asyncio.gather(*dense_searches)
+        lexical_lists: List[List[Dict]] = []
+    else:
+        lexical_lists = [
+            video_transcript.lexical_search(sub_query, CONFIG.RETRIEVAL_LEXICAL_K)
+            for sub_query in sub_queries
+        ]
+        try:
+            results = await asyncio.wait_for(
+                asyncio.gather(*dense_searches, return_exceptions=True),
+                timeout=CONFIG.VECTOR_DB_TIMEOUT_SECONDS,
+            )
+        except asyncio.TimeoutError as e:
+            results = [e]
+        dense_lists = [result for result in results if not isinstance(result, BaseException)]
+        if len(dense_lists) < len(results):
+            errors = [result for result in results if isinstance(result, BaseException)]
+            logger.warning(f"[FETCH RELEVANT CONTEXT] vector db unavailable, using lexical results: {errors[0]!r}")
+
+    # Over-fetched candidates, the effective k depends on the score drop-off and the token budget
+    formatted_context = adaptive_top_k.select(
+        dense_lists, context.chat_model.llm.model_name, lexical_lists=lexical_lists
+    )
+    logger.debug(
+        f"[FETCH RELEVANT CONTEXT] kept {len(formatted_context)} spans of "
+        f"{sum(len(hits) for hits in dense_lists)} dense "
+        f"and {sum(len(chunks) for chunks in lexical_lists)} lexical candidates"
+    )
+    return formatted_context
+
+
+def as_minutes(value) -> Optional[int]:
+    """A minute of the decision state as an int, anything else ("ten", -3) is dropped."""
+    try:
+        minutes = int(float(value))
+    except (TypeError, ValueError):
+        return None
+    return minutes if minutes >= 0 else None
+
+
+async def retrieve_video_context(
+    context: AgentContext, user_query: str, start_time: Optional[int], end_time: Optional[int]
+) -> List[Dict]:
+    """Returns the chunks the answer should be grounded on, in relevance order."""
+    vector_db = context.components.vector_db
+    start_time, end_time = as_minutes(start_time), as_minutes(end_time)
+    # Fills the transcript store on a miss, the modes below all read it
+    await context.components.get_transcript(context.video_id)
+
+    # Short videos fit the prompt whole, a search would only cost latency and recall
+    whole_transcript = get_whole_transcript(context)
+    if whole_transcript is not None:
+        logger.debug(f"[FETCH RELEVANT CONTEXT] whole transcript of {context.video_id}")
+        # The transcript was rebuilt after the decision started a search, it isn't needed
+        discard_search(context.speculative_retrieval)
+        context.speculative_retrieval = None
+        return whole_transcript
+
+    # Segment questions need the chunks covering the range, not a semantic top-k
+    if start_time is not None or end_time is not None:
+        discard_search(context.speculative_retrieval)
+        context.speculative_retrieval = None
+        video_transcript = context.components.transcript_store.get(context.video_id)
+        if video_transcript is not None:
+            logger.debug(f"[FETCH RELEVANT CONTEXT] time index lookup {start_time}-{end_time}")
+            return video_transcript.covering(start_time, end_time)
+        relevant_context: List[Dict] = await vector_db.retrieve_context_with_time_filter(
+            query=user_query,
+            video_id=context.video_id,
+            start_time=start_time if start_time is not None else 0,
+            end_time=end_time if end_time is not None else 24 * 60,
+            k=adaptive_top_k.candidate_k,
+        )
+        return adaptive_top_k.select([relevant_context], context.chat_model.llm.model_name)
+
+    return await hybrid_search(context, user_query)
 
 
 async def fetch_relevant_context(
     state: AgentState, runtime: Runtime[AgentContext]
 ) -> dict:
-    context: AgentContext = runtime.context
-    user_query = state["user_query"]
-    pinecone_client = context.components.vector_db
-    relevant_context: List[Dict] = await pinecone_client.retrieve_context(
-        query=user_query, user_id=context.user_id, video_id=context.video_id, k=4
+    emit_agent_step(Nodes.FETCH_RELEVANT_CONTEXT)
+    relevant_context = await retrieve_video_context(
+        runtime.context, state["user_query"], state.get("start_time"), state.get("end_time")
     )
-    formatted_context = [{ "start_time": context['fields']['start_time'], "end_time": context['fields']['end_time'], "text": context['fields']['text'] } for context in relevant_context]
-    # The value of k can be modified based on the user specific instruction
-    # logger.info(f"[FETCH RELEVANT CONTEXT] {formatted_context}")
-    return {"relevant_context": formatted_context, 'next_node': 'final_llm_response'}
+    return {"relevant_context": relevant_context, 'next_node': 'final_llm_response'}
 
 
+def build_answer_prompt(
+    user_query: str, conversation_history: List[str], packed_context: str
+) -> str:
+    # Stable content (instructions, video context) comes first so provider prefix caching can kick in
+    return Prompts.NORMAL_CHAT_PROMPT.value.format(
+        conversation_history=context_packer.pack_history(conversation_history),
+        context=packed_context,
+        user_query=user_query,
+    )
 
 
 async def final_llm_response(state: AgentState, runtime: Runtime[AgentContext]):
+    emit_agent_step(Nodes.FINAL_LLM_RESPONSE)
     context = runtime.context
     user_query = state["user_query"]
     conversation_history = state["conversation_history"]
     video_context = state["relevant_context"]
 
-    prompt = Prompts.NORMAL_CHAT_PROMPT.value.format(
-        conversation_history=conversation_history,
-        context=video_context,
-        user_query=user_query,
+    packed_context = context_packer.pack_context(video_context, context.chat_model.llm.model_name)
+    prompt = build_answer_prompt(user_query, conversation_history, packed_context)
+    logger.debug(
+        f"[FINAL LLM RESPONSE] context tokens raw={count_tokens(str(video_context))} "
+        f"packed={count_tokens(packed_context)}"
     )
     
-    # We use astream here so that astream_events can pick up individual tokens
+    # We use astream here so that astream_events can pick up individual tokens,
+    # the custom stream mode gets them through the writer instead
+    stream_writer = get_stream_writer()
     full_response = ""
-    async for chunk in context.chat_model.llm.astream(prompt):
-        full_response += chunk.content
+    hedged_stream = None
+    if CONFIG.HEDGE_FIRST_TOKEN_SECONDS > 0 and CONFIG.AGENT_STREAM_MODE == "custom":
+        # Not in events mode, the losing model's chunks would show up as on_chat_model_stream too
+        hedged_stream = HedgedStream(
+            primary=context.chat_model,
+            fallback=context.fallback_model,
+            first_token_timeout=CONFIG.HEDGE_FIRST_TOKEN_SECONDS,
+            measure_timeout=CONFIG.HEDGE_MEASURE_SECONDS,
+        )
+        token_stream = hedged_stream.astream(prompt, user_id=context.user_id)
+    else:
+        token_stream = context.chat_model.astream_llm(prompt, user_id=context.user_id)
+
+    async for token in token_stream:
+        full_response += token
+        if token:
+            stream_writer(("token", {"text": token}))
+    context.answered_by = (
+        hedged_stream.winner_model_name if hedged_stream is not None else context.chat_model.llm.model_name
+    )
         
     return {"response": full_response, 'next_node': '__end__'}
 
@@ -165,43 +412,340 @@ graph.add_edge(Nodes.FINAL_LLM_RESPONSE.value, END)
 
 
 class Agent:
-    def __init__(self):
+    def __init__(self, qa_writer: Optional[QAWriteBehindQueue] = None):
         global graph
         self.agent = graph.compile()
+        self.answer_cache = AnswerCache(
+            max_entries=CONFIG.ANSWER_CACHE_MAX_ENTRIES,
+            ttl_seconds=CONFIG.ANSWER_CACHE_TTL_SECONDS,
+        )
+        self.semantic_cache = SemanticAnswerCache(
+            similarity_threshold=CONFIG.SEMANTIC_CACHE_THRESHOLD,
+            max_entries_per_video=CONFIG.SEMANTIC_CACHE_MAX_ENTRIES_PER_VIDEO,
+            max_videos=CONFIG.SEMANTIC_CACHE_MAX_VIDEOS,
+        )
+        self.stream_metrics = StreamMetrics()
+        self.qa_writer = qa_writer
+        # Keeps references to fire and forget tasks so they aren't garbage collected mid-run
+        self.background_tasks: set[asyncio.Task] = set()
         logger.info('Graph has been compiled')
 
     def sse_event(self, event_type: str, data: dict):
         return f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
 
+    def replay_cached_answer(self, answer: str):
+        """Yields a cached answer in the same event format as a live run."""
+        yield self.sse_event('agent_step', {
+            "name": Nodes.FINAL_LLM_RESPONSE.value
+        })
+        yield self.sse_event("token", {
+            "text": answer
+        })
+
     async def run_agent(
-        self, input_state: AgentState, context: AgentContext
+        self,
+        input_state: AgentState,
+        context: AgentContext | Dict,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    ):
+        """
+        Streams the answer as sse frames.
+
+        `is_disconnected` (usually request.is_disconnected) is polled before every frame, once
+        the client is gone the graph is closed, which cancels the running llm stream.
+        """
+        if isinstance(context, dict):
+            context = AgentContext(**context)
+
+        # Follow ups depend on the dialogue, so only standalone questions are cached
+        user_query = input_state["user_query"]
+        requires_previous_conversations, confidence = heuristic_router.detect_follow_up(user_query)
+        cache_key = None
+        is_cache_owner = False
+        semantic_lookup: Optional[asyncio.Task] = None
+        query_embedding = None
+        full_response = ""
+        streamed_tokens = 0
+        # The exact cache only stores answers the requested model wrote
+        is_primary_answer = True
+        try:
+            if not requires_previous_conversations and confidence == 1.0:
+                cache_key = self.answer_cache.make_key(
+                    video_id=context.video_id,
+                    query=user_query,
+                    model_name=context.chat_model.llm.model_name,
+                )
+                cached_answer = self.answer_cache.get(cache_key)
+                if cached_answer is None:
+                    cached_answer = await self.answer_cache.wait_in_flight(cache_key)
+                if cached_answer is None:
+                    is_cache_owner = self.answer_cache.begin(cache_key)
+                    # Paraphrases of different segments look alike, time range questions skip it
+                    start_time, end_time, time_confidence = heuristic_router.extract_time_range(user_query)
+                    if (
+                        CONFIG.SEMANTIC_CACHE_ENABLED
+                        and start_time is None
+                        and end_time is None
+                        and time_confidence == 1.0
+                    ):
+                        # Embedded while the graph runs, so a miss costs no extra round trip
+                        semantic_lookup = asyncio.create_task(self.embed_for_semantic_cache(user_query, context))
+                if cached_answer is not None:
+                    logger.info("[AGENT] answer served from cache")
+                    full_response = cached_answer
+                    for event in self.replay_cached_answer(cached_answer):
+                        yield event
+                    self.on_answer_complete(user_query, cached_answer, context)
+                    return
+
+            token_coalescer = TokenCoalescer(
+                window_ms=CONFIG.SSE_TOKEN_WINDOW_MS, max_chars=CONFIG.SSE_TOKEN_MAX_CHARS
+            )
+            semantic_answer = None
+            # Closing the graph stream cancels the running node and its upstream http stream
+            async with aclosing(self.stream_graph(input_state, context)) as graph_stream, aclosing(
+                with_release_deadlines(graph_stream, token_coalescer)
+            ) as events:
+                async for event_type, data in events:
+                    if semantic_lookup is not None and semantic_lookup.done() and streamed_tokens == 0:
+                        # Only usable before the first token, later the lookup only feeds the cache
+                        query_embedding = semantic_lookup.result()
+                        semantic_lookup = None
+                        if query_embedding is not None:
+                            semantic_answer = self.semantic_cache.get(
+                                context.video_id, context.chat_model.llm.model_name, query_embedding
+                            )
+                        if semantic_answer is not None:
+                            break
+                    frames = []
+                    if event_type == "token":
+                        streamed_tokens += 1
+                        full_response += data["text"]
+                        text = token_coalescer.push(data["text"])
+                    else:
+                        # Keep the order of the frames, release pending text before a step,
+                        # a "flush" means the window ran out while waiting for the next token
+                        text = token_coalescer.flush()
+                    if text:
+                        frames.append(self.sse_event("token", {"text": text}))
+                    if event_type not in ("token", "flush"):
+                        frames.append(self.sse_event(event_type, data))
+
+                    if frames and is_disconnected is not None and await is_disconnected():
+                        logger.info(f"[AGENT] client disconnected after {streamed_tokens} tokens, cancelling")
+                        self.stream_metrics.record_cancelled(streamed_tokens)
+                        full_response = ""
+                        return
+                    for frame in frames:
+                        yield frame
+
+            if semantic_answer is not None:
+                logger.info("[AGENT] answer served from the semantic cache, graph closed")
+                full_response = semantic_answer
+                for event in self.replay_cached_answer(semantic_answer):
+                    yield event
+                self.on_answer_complete(user_query, semantic_answer, context)
+                return
+
+            text = token_coalescer.flush()
+            if text:
+                yield self.sse_event("token", {"text": text})
+            self.stream_metrics.record_completed(streamed_tokens)
+
+            # A hedged answer may come from the fallback model, it's cached under that one
+            answer_model_name = context.answered_by or context.chat_model.llm.model_name
+            if answer_model_name != context.chat_model.llm.model_name:
+                is_primary_answer = False
+                if is_cache_owner and full_response:
+                    self.answer_cache.set(
+                        self.answer_cache.make_key(
+                            video_id=context.video_id, query=user_query, model_name=answer_model_name
+                        ),
+                        full_response,
+                    )
+
+            if semantic_lookup is not None:
+                # Finished long ago in practice, the answer has been streamed already
+                query_embedding = await semantic_lookup
+                semantic_lookup = None
+            if query_embedding is not None and full_response:
+                self.semantic_cache.set(context.video_id, answer_model_name, query_embedding, full_response)
+
+            self.on_answer_complete(user_query, full_response, context)
+        except BaseException as e:
+            if isinstance(e, (asyncio.CancelledError, GeneratorExit)):
+                # The ASGI server cancelled the response, the client is gone
+                self.stream_metrics.record_cancelled(streamed_tokens)
+            full_response = ""
+            raise
+        finally:
+            if semantic_lookup is not None:
+                semantic_lookup.cancel()
+            # Left over when the graph raised or the client left before the search was used
+            discard_search(context.speculative_retrieval)
+            context.speculative_retrieval = None
+            if is_cache_owner:
+                self.answer_cache.finish(cache_key, full_response if is_primary_answer else None)
+
+    async def run_batch(
+        self,
+        questions: List[str],
+        context: AgentContext | Dict,
+        response_format: Literal["ndjson", "sse"] = "ndjson",
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
     ):
+        """
+        Answers many standalone questions about one video, one record per question.
+
+        The decision call is replaced by the local router and every retrieval runs at once,
+        identical questions are answered once and identical contexts are packed once (which also
+        gives their prompts a shared prefix for provider caching). At most
+        CONFIG.BATCH_GENERATION_CONCURRENCY answers are generated at a time. Records are
+        yielded as NDJSON lines or sse frames in completion order, tagged by question index.
+        """
+        if isinstance(context, dict):
+            context = AgentContext(**context)
+        model_name = context.chat_model.llm.model_name
+        records: asyncio.Queue = asyncio.Queue()
+        generation_slots = asyncio.Semaphore(CONFIG.BATCH_GENERATION_CONCURRENCY)
+        packed_contexts: Dict[tuple, str] = {}
+
+        indexes_by_key: Dict[tuple, List[int]] = {}
+        for index, question in enumerate(questions):
+            key = self.answer_cache.make_key(
+                video_id=context.video_id, query=question, model_name=model_name
+            )
+            indexes_by_key.setdefault(key, []).append(index)
+
+        async def answer_question(key: tuple, indexes: List[int]):
+            question = questions[indexes[0]]
+            try:
+                answer = self.answer_cache.get(key)
+                is_cached = answer is not None
+                if answer is None:
+                    start_time, end_time, time_confidence = heuristic_router.extract_time_range(question)
+                    if time_confidence < heuristic_router.confidence_threshold:
+                        # No decision llm here, an unsure range would search the wrong window
+                        start_time = end_time = None
+                    chunks = await retrieve_video_context(context, question, start_time, end_time)
+                    spans = tuple((chunk["start_time"], chunk["end_time"]) for chunk in chunks)
+                    if spans not in packed_contexts:
+                        packed_contexts[spans] = context_packer.pack_context(chunks, model_name)
+                    prompt = build_answer_prompt(question, [], packed_contexts[spans])
+                    async with generation_slots:
+                        answer = await context.chat_model.call_llm(prompt, user_id=context.user_id)
+                    self.answer_cache.set(key, answer)
+                for index in indexes:
+                    records.put_nowait({"index": index, "answer": answer, "cached": is_cached})
+                    if self.qa_writer is not None and answer:
+                        self.qa_writer.enqueue(chat_uid=context.chat_id, query=questions[index], answer=answer)
+            except Exception as e:
+                logger.exception(f"[AGENT BATCH] question {indexes[0]} failed: {e}")
+                message = e.error_response.message if isinstance(e, AppError) else "Failed to answer the question"
+                for index in indexes:
+                    records.put_nowait({"index": index, "error": message})
+
+        tasks = [
+            asyncio.create_task(answer_question(key, indexes))
+            for key, indexes in indexes_by_key.items()
+        ]
+        try:
+            for _ in range(len(questions)):
+                record = await records.get()
+                if is_disconnected is not None and await is_disconnected():
+                    logger.info("[AGENT BATCH] client disconnected, cancelling the batch")
+                    return
+                if response_format == "sse":
+                    yield self.sse_event("error" if "error" in record else "answer", record)
+                else:
+                    yield json.dumps(record) + "\n"
+            if response_format == "sse":
+                yield self.sse_event("done", {"count": len(questions)})
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.run_in_background(
+                conversation_memory.update_summary(
+                    context.chat_id, context.model_for(Nodes.FETCH_CONVERSATION_HISTORY)
+                )
+            )
+
+    def on_answer_complete(self, user_query: str, answer: str, context: AgentContext):
+        """Persists the QA and refreshes the conversation summary, both off the response path."""
+        if self.qa_writer is not None and answer:
+            self.qa_writer.enqueue(chat_uid=context.chat_id, query=user_query, answer=answer)
+        self.run_in_background(
+            conversation_memory.update_summary(
+                context.chat_id, context.model_for(Nodes.FETCH_CONVERSATION_HISTORY)
+            )
+        )
+
+    def run_in_background(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+
+    async def embed_for_semantic_cache(self, user_query: str, context: AgentContext) -> Optional[List[float]]:
+        """Returns the query embedding, None if the query couldn't be embedded."""
+        try:
+            return await context.components.vector_db.embed_query(user_query)
+        except Exception:
+            return None
+
+    async def stream_graph(self, input_state: AgentState, context: AgentContext):
+        """Runs the graph and yields (event_type, data) tuples for the sse stream."""
+        if CONFIG.AGENT_STREAM_MODE == "custom":
+            stream = self.stream_graph_custom(input_state, context)
+        else:
+            stream = self.stream_graph_events(input_state, context)
+        async with aclosing(stream):
+            async for event in stream:
+                yield event
+
+    async def stream_graph_custom(self, input_state: AgentState, context: AgentContext):
+        """
+        Lightweight mode, the nodes push only agent_step and token payloads through the
+        stream writer, so no callback event is built for the rest of the graph.
+        """
+        async with aclosing(self.agent.astream(
+            input=input_state,
+            context=context,
+            stream_mode="custom",
+        )) as stream:
+            async for event_type, data in stream:
+                if event_type == "agent_step":
+                    logger.info(f"[AGENT STEP] {data['name']}")
+                yield event_type, data
+
+    async def stream_graph_events(self, input_state: AgentState, context: AgentContext):
+        """Filters the astream_events v2 callback events down to agent_step and token."""
         # Use astream_events for token streaming. 
         # Context is passed as a top-level argument if supported by the compiled graph's astream_events
-        async for event in self.agent.astream_events(
+        async with aclosing(self.agent.astream_events(
             input=input_state, 
             context=context,
             version="v2"
-        ):
-            kind = event["event"]
+        )) as stream:
+            async for event in stream:
+                kind = event["event"]
             
-            # Handle Agent Step updates (Node transitions)
-            if kind == "on_chain_start":
-                # Check if this is a node starting
-                node_name = event.get("metadata", {}).get("langgraph_node")
-                if node_name and (node_name in [node.value for node in Nodes]):
-                    logger.info(f"[AGENT STEP] {node_name}")
-                    yield self.sse_event('agent_step', {
-                        "name": node_name
-                    })
+                # Handle Agent Step updates (Node transitions)
+                if kind == "on_chain_start":
+                    # Check if this is a node starting, not a chain run inside it (the
+                    # conditional edge after a node carries that node's metadata too)
+                    node_name = event.get("metadata", {}).get("langgraph_node")
+                    if node_name in NODE_NAMES and event.get("name") == node_name:
+                        logger.info(f"[AGENT STEP] {node_name}")
+                        yield 'agent_step', {
+                            "name": node_name
+                        }
             
-            # Handle Token streaming from the final response node
-            elif kind == "on_chat_model_stream":
-                # Only stream tokens from the final LLM response node
-                if event["metadata"].get("langgraph_node") == Nodes.FINAL_LLM_RESPONSE.value:
-                    token = event["data"]["chunk"].content
-                    if token:
-                        yield self.sse_event("token", {
-                            "text": token
-                        })
-                    
\ No newline at end of file
+                # Handle Token streaming from the final response node
+                elif kind == "on_chat_model_stream":
+                    # Only stream tokens from the final LLM response node
+                    if event["metadata"].get("langgraph_node") == Nodes.FINAL_LLM_RESPONSE.value:
+                        token = event["data"]["chunk"].content
+                        if token:
+                            yield "token", {
+                                "text": token
+                            }
@@ -0,0 +1,99 @@
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+
+from .prompts import PROMPT_VERSION
+
+CacheKey = Tuple[str, str, str, str]
+
+
+class AnswerCache:
+    """
+    Exact match answer cache keyed by (video_id, normalized query, model, prompt version).
+
+    Entries expire after `ttl_seconds` and the least recently used entry is evicted once
+    `max_entries` is reached. Identical requests arriving while an answer is being generated
+    wait on the in-flight generation instead of running their own.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: int = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[CacheKey, Tuple[float, str]] = OrderedDict()
+        self._in_flight: Dict[CacheKey, asyncio.Future] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Lowercases, collapses whitespace and drops trailing punctuation."""
+        query = re.sub(r"\s+", " ", query.strip().lower())
+        return query.rstrip("?!. ")
+
+    def make_key(self, video_id: str, query: str, model_name: str) -> CacheKey:
+        return (video_id, self.normalize_query(query), model_name, PROMPT_VERSION)
+
+    def get(self, key: CacheKey) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        stored_at, answer = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return answer
+
+    def set(self, key: CacheKey, answer: str):
+        self._entries[key] = (time.monotonic(), answer)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate_video(self, video_id: str):
+        """Drops every cached answer of the video."""
+        for key in [key for key in self._entries if key[0] == video_id]:
+            del self._entries[key]
+
+    async def wait_in_flight(self, key: CacheKey) -> Optional[str]:
+        """Waits for an identical generation already running, None if there is none or it failed."""
+        future = self._in_flight.get(key)
+        if future is None:
+            return None
+        self.coalesced += 1
+        return await asyncio.shield(future)
+
+    def begin(self, key: CacheKey) -> bool:
+        """Marks the generation as in-flight, returns False if another request already owns it."""
+        if key in self._in_flight:
+            return False
+        self._in_flight[key] = asyncio.get_running_loop().create_future()
+        return True
+
+    def finish(self, key: CacheKey, answer: Optional[str]):
+        """Stores the answer and wakes the waiting requests, pass None when the generation failed."""
+        if answer:
+            self.set(key, answer)
+        future = self._in_flight.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(answer or None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "in_flight": len(self._in_flight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -1,6 +1,16 @@
 from langchain_groq import ChatGroq
+import groq
+import httpx
 import json
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, Optional, AsyncIterator
+from langchain_core.messages import AIMessageChunk
+from loguru import logger
+
+from .scheduler import LLMScheduler
+from .context_packer import count_tokens
+
+# Budget assumed for the completion when charging a call against the tokens-per-minute limit
+ESTIMATED_COMPLETION_TOKENS = 512
 
 
 class ChatModels:
@@ -10,29 +20,132 @@ class ChatModels:
         "meta-llama/llama-4-scout-17b-16e-instruct",
     ]
 
-    def __init__(self, model_name: str = AVAILABLE_MODELS[0]):
-        self.llm = ChatGroq(model=model_name, temperature=0.1)
+    def __init__(
+        self,
+        model_name: str = AVAILABLE_MODELS[0],
+        http_async_client: httpx.AsyncClient | None = None,
+        scheduler: LLMScheduler | None = None,
+    ):
+        self.llm = ChatGroq(
+            model=model_name, temperature=0.1, http_async_client=http_async_client
+        )
+        self.scheduler = scheduler
+
+    async def wait_for_slot(self, prompt, user_id: Optional[str] = None):
+        """Waits for the scheduler to admit the call, returns right away without a scheduler."""
+        if self.scheduler is None:
+            return
+        estimated_tokens = count_tokens(str(prompt)) + ESTIMATED_COMPLETION_TOKENS
+        await self.scheduler.acquire(
+            self.llm.model_name, estimated_tokens=estimated_tokens, user_id=user_id
+        )
 
     async def use_model(
         self, model_name: str = AVAILABLE_MODELS[0], temperature: float = 0
     ):
-        """Returns the ChatGroq instance with the specified model and temperature."""
+        """
+        Returns a ChatGroq copy with the specified model and temperature.
+
+        The shared instance is never mutated, the copy reuses its http connection pool.
+        """
         if model_name.strip().lower() in self.AVAILABLE_MODELS:
-            self.llm.model = model_name
-            self.llm.temperature = temperature
-            return self.llm
+            return self.llm.model_copy(
+                update={"model_name": model_name, "temperature": temperature}
+            )
         return self.llm
     
 
-    async def call_llm(self, prompt, is_json: bool = False) -> str | Dict[str, Any]:
-        """A simple function that takes a prompt and calls a llm based on that prompt."""
-        response = await self.llm.ainvoke(prompt)
+    async def call_llm(
+        self, prompt, is_json: bool = False, user_id: Optional[str] = None
+    ) -> str | Dict[str, Any]:
+        """
+        A simple function that takes a prompt and calls a llm based on that prompt.
+
+        With `is_json` the provider's JSON mode is used, so the response is always a
+        parsable object. Raises json.JSONDecodeError if the provider still returns garbage,
+        including when Groq rejects the generation itself (400 json_validate_failed).
+        """
+        await self.wait_for_slot(prompt, user_id)
         if is_json:
-            return json.loads(response.content)
+            try:
+                response = await self.llm.bind(
+                    response_format={"type": "json_object"}
+                ).ainvoke(prompt)
+            except groq.BadRequestError as e:
+                if "json_validate_failed" not in str(e):
+                    raise
+                logger.warning(f"[CHAT MODELS] json validation failed on {self.llm.model_name}: {e}")
+                raise json.JSONDecodeError("json_validate_failed", str(e), 0) from e
+            try:
+                return json.loads(response.content)
+            except json.JSONDecodeError:
+                logger.warning(f"[CHAT MODELS] invalid json from {self.llm.model_name}: {response.content}")
+                raise
+
+        response = await self.llm.ainvoke(prompt)
         return response.content
 
-    async def astream_llm(self, prompt):
-        """Streams the LLM response."""
+    async def astream_chunks(self, prompt, user_id: Optional[str] = None) -> AsyncIterator[AIMessageChunk]:
+        """Streams the LLM response as message chunks, reasoning deltas included."""
+        await self.wait_for_slot(prompt, user_id)
         async for chunk in self.llm.astream(prompt):
+            yield chunk
+
+    async def astream_llm(self, prompt, user_id: Optional[str] = None):
+        """Streams the LLM response."""
+        async for chunk in self.astream_chunks(prompt, user_id):
             yield chunk.content
 
+
+
+
+class ChatModelRegistry:
+    """
+    App level registry holding one long lived ChatModels per model name.
+
+    Every model shares the registry's LLMScheduler, so all llm calls go through its rate limits.
+
+    All models share a single keep-alive, connection pooled http client, so requests reuse
+    warm TLS connections instead of paying the setup on every question. ChatModels are never
+    mutated after creation, which makes handing the same instance to concurrent requests safe.
+    Created in the app lifespan and closed on shutdown.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 60.0,
+        scheduler: LLMScheduler | None = None,
+    ):
+        self.http_async_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(60.0, connect=10.0),
+        )
+        self.scheduler = scheduler
+        self._models: Dict[str, ChatModels] = {}
+
+    def get(self, model_name: str) -> ChatModels:
+        """Returns the shared ChatModels for the model, created on first use."""
+        # No await between the lookup and the insert, so this can't race on the event loop
+        chat_model = self._models.get(model_name)
+        if chat_model is None:
+            chat_model = ChatModels(
+                model_name, http_async_client=self.http_async_client, scheduler=self.scheduler
+            )
+            self._models[model_name] = chat_model
+        return chat_model
+
+    def warm_up(self, model_names: Iterable[str]):
+        for model_name in model_names:
+            self.get(model_name)
+
+    async def aclose(self):
+        self._models.clear()
+        if self.scheduler is not None:
+            await self.scheduler.aclose()
+        await self.http_async_client.aclose()
@@ -0,0 +1,30 @@
+"""
+One-off cleanup of the per user namespaces, run once after deploying the shared namespace.
+
+    python -m src.ai.cleanup_legacy_namespaces
+
+Before the move to SHARED_NAMESPACE every user's videos were stored in a namespace named after
+the user. Nothing reads or deletes those records anymore, videos are ingested again into the
+shared namespace when a user loads them, so the old namespaces only cost storage.
+"""
+import asyncio
+
+from loguru import logger
+
+from src.ai.vector_store import init_vector_store
+
+
+async def main():
+    vector_db = await init_vector_store()
+    try:
+        deleted_namespaces = await vector_db.delete_legacy_namespaces()
+    finally:
+        # The Pinecone backend holds an http session, the local one holds nothing
+        for client in (getattr(vector_db, "index", None), getattr(vector_db, "client", None)):
+            if client is not None:
+                await client.close()
+    logger.info(f"Deleted {len(deleted_namespaces)} legacy namespaces : {deleted_namespaces}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
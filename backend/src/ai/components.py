@@ -1,44 +1,86 @@
-from typing import TypeAlias, Self
+import asyncio
+from typing import TypeAlias, Self, Dict, Optional
+
+from loguru import logger
 
 from src.ai.youtube.transcript_preprocessor import TranscriptPreprocessor, TranscriptChunk
 from src.ai.youtube.video_loader import load_video_transcript, YoutubeApiResponse
-from src.ai.pinecone_vector_db.youtube_chunks import PineconeClient, init_pinecone_db
+from src.ai.vector_store import VectorStore, init_vector_store
 from src.ai.utils import format_docs
-from src.ai.youtube.transcript_preprocessor import TranscriptPreprocessor
+from src.ai.transcript_store import TranscriptStore, VideoTranscript
 
 ContextText: TypeAlias = str
 
 
 class Components:
     def __init__(
-        self, vector_db: PineconeClient, transcript_preprocessor: TranscriptPreprocessor
+        self,
+        vector_db: VectorStore,
+        transcript_preprocessor: TranscriptPreprocessor,
+        transcript_store: TranscriptStore,
     ):
         self.vector_db = vector_db
         self.transcript_preprocessor = transcript_preprocessor
+        self.transcript_store = transcript_store
+        # One rebuild per video at a time, concurrent questions wait for the same one
+        self._transcript_loads: Dict[str, asyncio.Task] = {}
     
     @classmethod
     async def init(cls) -> Self:
-        pinecone_client = await init_pinecone_db()
+        vector_db = await init_vector_store()
         transcript_preprocessor = TranscriptPreprocessor()
-        return cls(pinecone_client, transcript_preprocessor)
+        transcript_store = TranscriptStore()
+        return cls(vector_db, transcript_preprocessor, transcript_store)
 
-    async def load_and_store_video(self, video_id: str, user_id: str):
-        """Loads the video transcript and stores it in the vector database."""
+    async def load_and_store_video(self, video_id: str) -> int:
+        """Loads the video transcript and stores it in the vector database, returns the chunk count."""
         youtube_api_response: YoutubeApiResponse = await load_video_transcript(video_id=video_id)
         transcript_data_chunks: list[TranscriptChunk] = await self.transcript_preprocessor.group_transcript_into_chunks(
             transcript=youtube_api_response.transcript, video_id=video_id
         )
-        video_records_data = {"user_id": user_id, "records": transcript_data_chunks}
+        video_records_data = {"video_id": video_id, "records": transcript_data_chunks}
         await self.vector_db.upsert_records_into_vdb(
             video_records_data=video_records_data
         )
+        self.transcript_store.put(video_id, transcript_data_chunks)
+        return len(transcript_data_chunks)
+
+    async def get_transcript(self, video_id: str) -> Optional[VideoTranscript]:
+        """
+        Returns the video's transcript, rebuilt from its vector db records when this worker
+        didn't ingest it (another worker did, or before a restart). None if that fails.
+        """
+        video_transcript = self.transcript_store.get(video_id)
+        if video_transcript is not None:
+            return video_transcript
+        load = self._transcript_loads.get(video_id)
+        if load is None:
+            load = asyncio.create_task(self._rebuild_transcript(video_id))
+            self._transcript_loads[video_id] = load
+            load.add_done_callback(lambda _: self._transcript_loads.pop(video_id, None))
+        # Shielded, a cancelled question doesn't cancel the rebuild others wait on
+        return await asyncio.shield(load)
+
+    async def _rebuild_transcript(self, video_id: str) -> Optional[VideoTranscript]:
+        try:
+            chunks = await self.vector_db.fetch_video_chunks(video_id)
+        except Exception as e:
+            logger.warning(f"[COMPONENTS] transcript of {video_id} couldn't be rebuilt: {e!r}")
+            return None
+        if not chunks:
+            return None
+        self.transcript_store.put(
+            video_id, [TranscriptChunk(video_id=video_id, **chunk) for chunk in chunks]
+        )
+        logger.info(f"[COMPONENTS] transcript of {video_id} rebuilt from {len(chunks)} records")
+        return self.transcript_store.get(video_id)
 
     async def load_cleaned_relevant_context(
-        self, query: str, video_id: str, user_id: str, k: int
+        self, query: str, video_id: str, k: int
     ) -> ContextText:
         """Loads the relevant context from the vector database."""
         retrieved_chunks = await self.vector_db.retrieve_context(
-            query=query, user_id=user_id, video_id=video_id, k=k
+            query=query, video_id=video_id, k=k
         )
         context_text = format_docs(retrieved_docs=retrieved_chunks)
         return context_text
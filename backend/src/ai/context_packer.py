@@ -0,0 +1,126 @@
+from typing import List, Dict, Optional
+from functools import lru_cache
+
+import tiktoken
+from loguru import logger
+
+from src.config import CONFIG
+
+
+@lru_cache(maxsize=1)
+def _get_encoding() -> Optional[tiktoken.Encoding]:
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # The encoding file is downloaded on first use, fall back to an estimate when offline
+        logger.warning(f"[CONTEXT PACKER] tokenizer unavailable, estimating tokens: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Counts the tokens of the text, roughly 4 characters per token without a tokenizer."""
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+# The "[start-end min] " prefix and line break each rendered chunk costs on top of its text
+CHUNK_OVERHEAD_TOKENS = 8
+
+
+def count_chunk_tokens(text: str) -> int:
+    """Tokens a chunk takes in the packed context, the same for the budget and the whole transcript check."""
+    return count_tokens(text) + CHUNK_OVERHEAD_TOKENS
+
+
+def format_minute_range(start_time: float, end_time: float) -> str:
+    return f"[{int(start_time)}-{int(end_time)} min]"
+
+
+class ContextPacker:
+    """
+    Packs the retrieved chunks and the conversation history into a compact prompt section.
+
+    Chunks are taken in relevance order until the model's token budget is spent, then
+    overlapping or adjacent ones are merged and rendered in time order as
+    "[start-end min] text" lines instead of python reprs of dicts.
+    """
+
+    # Token budget of the video context per model, history gets HISTORY_TOKEN_BUDGET on top
+    MODEL_TOKEN_BUDGETS: Dict[str, int] = {
+        "openai/gpt-oss-120b": 6000,
+        "openai/gpt-oss-20b": 6000,
+        "meta-llama/llama-4-scout-17b-16e-instruct": 6000,
+        "qwen/qwen3-32b": 4000,
+        "llama-3.1-8b-instant": 3000,
+        "llama-3.3-70b-versatile": 4000,
+        "moonshotai/kimi-k2-instruct-0905": 6000,
+    }
+    DEFAULT_TOKEN_BUDGET = 4000
+    HISTORY_TOKEN_BUDGET = 1500
+    # Merged spans stay short so the timestamps keep pointing somewhere useful
+    MAX_MERGED_SPAN_MINUTES = 3
+
+    def __init__(self, whole_transcript_budget_ratio: float = 1.0):
+        self.whole_transcript_budget_ratio = whole_transcript_budget_ratio
+
+    def budget_for(self, model_name: str) -> int:
+        return self.MODEL_TOKEN_BUDGETS.get(model_name, self.DEFAULT_TOKEN_BUDGET)
+
+    def whole_transcript_threshold(self, model_name: str) -> int:
+        """Transcripts up to this many tokens are sent whole instead of searched."""
+        # Past the budget pack_context would cut the transcript in time order, not by relevance
+        ratio = min(self.whole_transcript_budget_ratio, 1.0)
+        return int(self.budget_for(model_name) * ratio)
+
+    def merge_chunks(self, chunks: List[Dict]) -> List[Dict]:
+        """Sorts the chunks by start_time and merges the ones that overlap or touch."""
+        merged: List[Dict] = []
+        for chunk in sorted(chunks, key=lambda chunk: (chunk["start_time"], chunk["end_time"])):
+            if (
+                merged
+                and chunk["start_time"] <= merged[-1]["end_time"]
+                and chunk["end_time"] - merged[-1]["start_time"] <= self.MAX_MERGED_SPAN_MINUTES
+            ):
+                previous = merged[-1]
+                if chunk["text"] not in previous["text"]:
+                    previous["text"] = f"{previous['text']} {chunk['text']}"
+                previous["end_time"] = max(previous["end_time"], chunk["end_time"])
+            else:
+                merged.append(dict(chunk))
+        return merged
+
+    def pack_context(self, chunks: List[Dict], model_name: str) -> str:
+        """Renders the chunks (given in relevance order) within the model's token budget."""
+        budget = self.budget_for(model_name)
+        selected: List[Dict] = []
+        used_tokens = 0
+        for chunk in chunks:
+            chunk_tokens = count_chunk_tokens(chunk["text"])
+            if used_tokens + chunk_tokens > budget:
+                break
+            selected.append(chunk)
+            used_tokens += chunk_tokens
+
+        return "\n".join(
+            f"{format_minute_range(chunk['start_time'], chunk['end_time'])} {chunk['text']}"
+            for chunk in self.merge_chunks(selected)
+        )
+
+    def pack_history(self, conversation_history: List[str]) -> str:
+        """Keeps the most recent turns that fit in the history budget, oldest first."""
+        kept: List[str] = []
+        used_tokens = 0
+        for turn in reversed(conversation_history):
+            turn_tokens = count_tokens(turn)
+            if used_tokens + turn_tokens > self.HISTORY_TOKEN_BUDGET:
+                break
+            kept.append(turn)
+            used_tokens += turn_tokens
+        return "\n".join(reversed(kept)) or "None"
+
+
+context_packer = ContextPacker(
+    whole_transcript_budget_ratio=CONFIG.WHOLE_TRANSCRIPT_BUDGET_RATIO
+)
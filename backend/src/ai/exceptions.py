@@ -47,4 +47,16 @@ class TranscriptAlreadyExistError(ErrorResponse[T]):
     status_code: int = status.HTTP_409_CONFLICT
     message: str = "Video already loaded."
     error: str = "transcript_already_exists_error"
-    data: T | None = None
\ No newline at end of file
+    data: T | None = None
+
+class LLMRateLimitedError(ErrorResponse[T]):
+    status_code: int = status.HTTP_429_TOO_MANY_REQUESTS
+    message: str = "The AI service is busy right now, try again shortly."
+    error: str = "llm_rate_limited_error"
+    data: T | None = None
+
+class VideoIngestionInProgressError(ErrorResponse[T]):
+    status_code: int = status.HTTP_409_CONFLICT
+    message: str = "The video is still being loaded, try again shortly."
+    error: str = "video_ingestion_in_progress_error"
+    data: T | None = None
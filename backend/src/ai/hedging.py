@@ -0,0 +1,213 @@
+import asyncio
+import time
+from typing import Optional, AsyncIterator, Dict, Any, List, Tuple, Set
+
+import groq
+from langchain_core.messages import AIMessageChunk
+from loguru import logger
+
+from src.app_responses import AppError
+from .chat_models import ChatModels
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """Rate limits, provider 5xx and connection failures are worth retrying on another model."""
+    if isinstance(error, AppError):
+        return error.error_response.status_code == 429
+    if isinstance(error, (groq.APIConnectionError, groq.APITimeoutError)):
+        return True
+    status_code = getattr(error, "status_code", None)
+    return status_code is not None and (status_code == 429 or status_code >= 500)
+
+
+def is_generating(chunk: AIMessageChunk) -> bool:
+    """Content or a reasoning delta, reasoning models think for seconds before any content."""
+    return bool(chunk.content or chunk.additional_kwargs.get("reasoning_content"))
+
+
+class _Attempt:
+    """One model's stream, with its first generated chunk being awaited in a task."""
+
+    def __init__(self, chat_model: ChatModels, prompt, user_id: Optional[str]):
+        self.chat_model = chat_model
+        self.stream = chat_model.astream_chunks(prompt, user_id=user_id)
+        self.started_at = time.perf_counter()
+        # When the first chunk arrived, taken in the task so scheduling delays don't count
+        self.first_chunk_at: Optional[float] = None
+        self.first_chunk: asyncio.Task = asyncio.create_task(self._first_generated_chunk())
+
+    async def _first_generated_chunk(self) -> Optional[AIMessageChunk]:
+        """Skips the empty role delta, None if the stream ends without generating anything."""
+        async for chunk in self.stream:
+            if is_generating(chunk):
+                self.first_chunk_at = time.perf_counter()
+                return chunk
+        self.first_chunk_at = time.perf_counter()
+        return None
+
+    @property
+    def model_name(self) -> str:
+        return self.chat_model.llm.model_name
+
+    async def close(self):
+        self.first_chunk.cancel()
+        try:
+            await self.first_chunk
+        except BaseException:
+            pass
+        await self.stream.aclose()
+
+
+class HedgeMetrics:
+    """Totals of hedged streams, each hedged or failed over request is logged on its own."""
+
+    def __init__(self):
+        self.requests = 0
+        self.hedged = 0
+        self.failovers = 0
+        self.fallback_wins = 0
+        self.total_saved_ms = 0.0
+
+    def record(self, record: Dict[str, Any]):
+        self.requests += 1
+        self.hedged += record["reason"] == "slow_first_token"
+        self.failovers += record["reason"] == "error"
+        self.fallback_wins += record["winner"] != record["primary"]
+        self.total_saved_ms += record.get("saved_ms") or 0.0
+        if record["reason"] is not None:
+            logger.info(f"[HEDGED STREAM] {record}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "failovers": self.failovers,
+            "fallback_wins": self.fallback_wins,
+            "total_saved_ms": round(self.total_saved_ms, 2),
+        }
+
+
+hedge_metrics = HedgeMetrics()
+_measure_tasks: Set[asyncio.Task] = set()
+
+
+class HedgedStream:
+    """
+    Streams a prompt from the primary model, hedging to a fallback model on a slow first token.
+
+    If the primary hasn't produced its first chunk after `first_token_timeout` seconds the same
+    prompt is sent to the fallback, whichever answers first is streamed and the other one is
+    closed. A reasoning delta counts as a first chunk, a model that is thinking isn't stuck.
+    Retryable errors (429, 5xx, connection) before the first chunk fail over right away.
+    `winner_model_name` tells which model streamed the answer.
+
+    The loser's first chunk is awaited in the background for at most `measure_timeout` seconds
+    before it is closed, only to record how much latency the hedge saved.
+    """
+
+    def __init__(
+        self,
+        primary: ChatModels,
+        fallback: Optional[ChatModels],
+        first_token_timeout: float,
+        measure_timeout: float = 5.0,
+    ):
+        self.primary = primary
+        self.fallback = fallback
+        self.first_token_timeout = first_token_timeout
+        self.measure_timeout = measure_timeout
+        self.winner_model_name: Optional[str] = None
+
+    async def _pick_winner(
+        self, prompt, user_id: Optional[str], record: Dict[str, Any]
+    ) -> Tuple[_Attempt, Optional[_Attempt]]:
+        """Returns the attempt whose first chunk came first and the one still running, if any."""
+        attempts: List[_Attempt] = [_Attempt(self.primary, prompt, user_id)]
+        try:
+            primary = attempts[0]
+            done, _ = await asyncio.wait({primary.first_chunk}, timeout=self.first_token_timeout)
+
+            if done:
+                error = primary.first_chunk.exception()
+                if error is None:
+                    return primary, None
+                if self.fallback is None or not is_retryable_error(error):
+                    raise error
+                logger.warning(f"[HEDGED STREAM] {primary.model_name} failed ({error}), failing over")
+                record["reason"] = "error"
+                await primary.close()
+                fallback = _Attempt(self.fallback, prompt, user_id)
+                attempts = [fallback]
+                await asyncio.wait({fallback.first_chunk})
+                if fallback.first_chunk.exception() is not None:
+                    raise fallback.first_chunk.exception()
+                return fallback, None
+
+            if self.fallback is None:
+                return primary, None
+
+            logger.info(
+                f"[HEDGED STREAM] no first token from {primary.model_name} "
+                f"after {self.first_token_timeout}s, hedging"
+            )
+            record["reason"] = "slow_first_token"
+            attempts.append(_Attempt(self.fallback, prompt, user_id))
+            by_task = {attempt.first_chunk: attempt for attempt in attempts}
+            pending = set(by_task)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = by_task[task]
+                        return winner, next(attempt for attempt in attempts if attempt is not winner)
+            # Both failed, surface the primary's error
+            raise primary.first_chunk.exception()
+        except BaseException:
+            for attempt in attempts:
+                await attempt.close()
+            raise
+
+    async def _measure_and_close(self, loser: _Attempt, winner_first_chunk_at: float, record: Dict[str, Any]):
+        try:
+            await asyncio.wait_for(asyncio.shield(loser.first_chunk), timeout=self.measure_timeout)
+            if loser.chat_model is self.primary:
+                record["saved_ms"] = round((loser.first_chunk_at - winner_first_chunk_at) * 1000, 2)
+        except BaseException:
+            # Primary still silent after the measure window, the saving is at least that long
+            if loser.chat_model is self.primary:
+                record["saved_ms"] = round(self.measure_timeout * 1000, 2)
+        finally:
+            await loser.close()
+            hedge_metrics.record(record)
+
+    async def astream(self, prompt, user_id: Optional[str] = None) -> AsyncIterator[str]:
+        record: Dict[str, Any] = {
+            "primary": self.primary.llm.model_name,
+            "winner": None,
+            "reason": None,
+            "ttft_ms": None,
+            "saved_ms": 0.0,
+        }
+        started_at = time.perf_counter()
+        winner, loser = await self._pick_winner(prompt, user_id, record)
+        first_chunk = winner.first_chunk.result()
+        first_chunk_at = winner.first_chunk_at
+        record["winner"] = self.winner_model_name = winner.model_name
+        record["ttft_ms"] = round((first_chunk_at - started_at) * 1000, 2)
+
+        if loser is not None:
+            task = asyncio.create_task(self._measure_and_close(loser, first_chunk_at, record))
+            # Keep a reference so the task isn't garbage collected before it's done
+            _measure_tasks.add(task)
+            task.add_done_callback(_measure_tasks.discard)
+        else:
+            hedge_metrics.record(record)
+
+        try:
+            if first_chunk is None:
+                return
+            yield first_chunk.content
+            async for chunk in winner.stream:
+                yield chunk.content
+        finally:
+            await winner.stream.aclose()
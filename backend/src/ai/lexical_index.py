@@ -0,0 +1,78 @@
+import re
+from collections import Counter
+from typing import List, Tuple, Dict
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.'][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased words and numbers, "3.5" and "don't" stay single tokens."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Okapi BM25 over the chunks of one video.
+
+    Postings are kept in CSR form: for term t, doc_ids[offsets[t]:offsets[t + 1]] are the chunks
+    containing it and term_freqs the matching counts. A query touches only the postings of its
+    own terms, so lookups stay in the microseconds even for long videos.
+    """
+
+    def __init__(self, texts: List[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_ids: Dict[str, int] = {}
+
+        term_column: List[int] = []
+        doc_column: List[int] = []
+        freq_column: List[int] = []
+        doc_lengths: List[int] = []
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths.append(len(tokens))
+            for term, freq in Counter(tokens).items():
+                term_column.append(self.term_ids.setdefault(term, len(self.term_ids)))
+                doc_column.append(doc_id)
+                freq_column.append(freq)
+
+        terms = np.asarray(term_column, dtype=np.int32)
+        order = np.argsort(terms, kind="stable")
+        self.doc_ids = np.asarray(doc_column, dtype=np.int32)[order]
+        self.term_freqs = np.asarray(freq_column, dtype=np.float32)[order]
+        document_frequencies = np.bincount(terms, minlength=len(self.term_ids))
+        self.offsets = np.zeros(len(self.term_ids) + 1, dtype=np.int64)
+        np.cumsum(document_frequencies, out=self.offsets[1:])
+
+        self.doc_count = len(texts)
+        self.doc_lengths = np.asarray(doc_lengths, dtype=np.float32)
+        average_length = float(self.doc_lengths.mean()) if self.doc_count else 0.0
+        self.idf = np.log1p(
+            (self.doc_count - document_frequencies + 0.5) / (document_frequencies + 0.5)
+        ).astype(np.float32)
+        # Length normalisation of every doc, computed once instead of per query
+        self.length_norms = (
+            k1 * (1 - b + b * self.doc_lengths / average_length) if average_length else self.doc_lengths
+        )
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Returns up to k (doc_id, score) pairs with a positive score, best first."""
+        scores = np.zeros(self.doc_count, dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            doc_ids = self.doc_ids[start:end]
+            term_freqs = self.term_freqs[start:end]
+            scores[doc_ids] += self.idf[term_id] * term_freqs * (self.k1 + 1) / (
+                term_freqs + self.length_norms[doc_ids]
+            )
+
+        matched = np.flatnonzero(scores)
+        if matched.size > k:
+            matched = matched[np.argpartition(scores[matched], -k)[-k:]]
+        matched = matched[np.argsort(scores[matched])[::-1]]
+        return [(int(doc_id), float(scores[doc_id])) for doc_id in matched]
@@ -0,0 +1,591 @@
+import json
+import os
+import threading
+import time
+from typing import List, Dict, Optional, Tuple, Any, Literal
+
+import numpy as np
+from numpy.lib.format import open_memmap
+from loguru import logger
+
+from .quantization import train_quantizer, load_quantizer
+
+INITIAL_CAPACITY = 1024
+
+
+class GrowableMemmap:
+    """
+    A .npy file opened as a writable memmap, grown by doubling its capacity.
+
+    Rows are written in place, so inserts don't rewrite the file and a restart maps it
+    back without reading it into memory. The number of used rows is tracked by the caller.
+    """
+
+    def __init__(self, path: str, dtype):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self._array: Optional[np.memmap] = (
+            np.load(path, mmap_mode="r+") if os.path.exists(path) else None
+        )
+
+    @property
+    def capacity(self) -> int:
+        return 0 if self._array is None else len(self._array)
+
+    def _allocate(self, capacity: int, row_shape: Tuple[int, ...]) -> np.memmap:
+        temporary_path = f"{self.path}.tmp"
+        array = open_memmap(temporary_path, mode="w+", dtype=self.dtype, shape=(capacity, *row_shape))
+        if self._array is not None:
+            array[: len(self._array)] = self._array
+            array.flush()
+        # Same inode after the rename, the new memmap stays valid
+        os.replace(temporary_path, self.path)
+        return array
+
+    def write(self, start: int, rows: np.ndarray):
+        if not len(rows):
+            return
+        end = start + len(rows)
+        if end > self.capacity:
+            self._array = self._allocate(max(end, self.capacity * 2, INITIAL_CAPACITY), rows.shape[1:])
+        self._array[start:end] = rows
+
+    def view(self, size: int) -> np.ndarray:
+        if self._array is None:
+            return np.empty((0,), dtype=self.dtype)
+        return self._array[:size]
+
+    def rewrite(self, rows: np.ndarray):
+        """Replaces the file with exactly these rows (plus headroom), used by compaction."""
+        self._array = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        if len(rows):
+            self.write(0, rows)
+
+    def flush(self):
+        if self._array is not None:
+            self._array.flush()
+
+    def stage(self, rows: np.ndarray) -> "GrowableMemmap":
+        """Writes the rows to a side file, swapped in by `replace_with` without copying them again."""
+        staged = GrowableMemmap(f"{self.path}.staged", self.dtype)
+        staged.rewrite(rows)
+        staged.flush()
+        return staged
+
+    def replace_with(self, staged: "GrowableMemmap"):
+        staged.flush()
+        if os.path.exists(staged.path):
+            # The staged memmap stays valid after the rename
+            os.replace(staged.path, self.path)
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+        self._array = staged._array
+
+
+def assign_to_lists(vectors: np.ndarray, centroids: Optional[np.ndarray]) -> np.ndarray:
+    if centroids is None:
+        return np.full(len(vectors), -1, dtype=np.int32)
+    return np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+
+
+def train_centroids(vectors: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means, vectors are expected L2 normalised."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        for cluster in range(nlist):
+            members = vectors[assignments == cluster]
+            if len(members):
+                centroid = members.sum(axis=0)
+                centroids[cluster] = centroid / max(np.linalg.norm(centroid), 1e-12)
+            else:
+                # Reseed empty clusters so every list gets used
+                centroids[cluster] = vectors[rng.integers(len(vectors))]
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """
+    Inverted file index over the chunks of one namespace, persisted in a directory.
+
+    Vectors, cluster assignments, tombstones and time metadata are memory mapped .npy files
+    written in place on insert, ids and texts go to an append only metadata.jsonl, so a worker
+    restart maps the index back instead of rebuilding it. Centroids are trained by k-means once
+    the namespace holds `nlist * TRAIN_ROWS_PER_LIST` chunks, until then search is exact.
+
+    Deletes only set tombstones, the files are compacted (and the centroids retrained) once
+    more than `compact_ratio` of the rows are dead.
+
+    With `quantization` ("int8" or "pq") searches score compact codes, kept in their own memmap,
+    and only the best `k * rescore_factor` candidates (0 uses the quantizer's default) are
+    rescored against the float32 vectors, so the float32 file stays on disk except for the few
+    rows read per query. Quantizers are trained together with the centroids, smaller
+    namespaces are scored in float32.
+
+    Inserts, deletes and searches run in worker threads, a lock keeps searches from seeing
+    writes half done. Training and compaction work on a snapshot of the rows without the lock,
+    which is only taken to swap their results in, together with the rows written meanwhile.
+
+    Searches are always filtered by video. Probing `nprobe` lists touches about
+    nprobe / nlist of the namespace, so the video's own rows are scanned exactly whenever
+    they are fewer than that, which is both cheaper and exact. The ANN path kicks in for
+    videos that make up a large part of a big namespace.
+    """
+
+    TRAIN_ROWS_PER_LIST = 32
+    # Below this many rows a video is always scanned exactly
+    MIN_ANN_ROWS = 256
+
+    def __init__(
+        self,
+        directory: str,
+        nlist: int = 64,
+        nprobe: int = 8,
+        compact_ratio: float = 0.3,
+        quantization: Literal["none", "int8", "pq"] = "none",
+        pq_subvectors: int = 0,
+        rescore_factor: int = 0,
+    ):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.compact_ratio = compact_ratio
+        self.quantization = quantization
+        self.pq_subvectors = pq_subvectors
+        self.rescore_factor = rescore_factor
+        self._lock = threading.RLock()
+        # One training or compaction at a time
+        self._maintenance_lock = threading.RLock()
+
+        self.vectors = GrowableMemmap(self._path("vectors.npy"), np.float32)
+        self.assignments = GrowableMemmap(self._path("assignments.npy"), np.int32)
+        self.alive = GrowableMemmap(self._path("alive.npy"), np.bool_)
+        self.video_codes = GrowableMemmap(self._path("video_codes.npy"), np.int32)
+        self.start_times = GrowableMemmap(self._path("start_times.npy"), np.float32)
+        self.end_times = GrowableMemmap(self._path("end_times.npy"), np.float32)
+        centroids_path = self._path("centroids.npy")
+        self.centroids: Optional[np.ndarray] = np.load(centroids_path) if os.path.exists(centroids_path) else None
+        self.quantizer = load_quantizer(self._path("quantizer.npz"))
+        if self.quantizer is not None and self.quantizer.kind != quantization:
+            self.quantizer = None
+        self.codes = GrowableMemmap(
+            self._path(f"codes_{quantization}.npy"), np.int8 if quantization == "int8" else np.uint8
+        )
+
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.video_ids: List[str] = []
+        self._load_metadata()
+        self._inverted_lists: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        if self.quantization != "none" and self.quantizer is None and self.centroids is not None:
+            # Quantization configured after the index was trained, or with another mode
+            self.train()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _load_metadata(self):
+        self.video_code_by_id: Dict[str, int] = {}
+        metadata_path = self._path("metadata.jsonl")
+        if os.path.exists(metadata_path):
+            with open(metadata_path, encoding="utf-8") as metadata_file:
+                for line in metadata_file:
+                    chunk_id, video_id, text = json.loads(line)
+                    self.ids.append(chunk_id)
+                    self.texts.append(text)
+                    self.video_code_by_id.setdefault(video_id, len(self.video_code_by_id))
+        self.video_ids = list(self.video_code_by_id)
+        # Rows written to the arrays but not to the metadata (a crash mid insert) are ignored
+        self.size = len(self.ids)
+
+        alive = np.asarray(self.alive.view(self.size))
+        video_codes = np.asarray(self.video_codes.view(self.size))
+        self.row_by_id: Dict[str, int] = {}
+        self.rows_by_video: Dict[int, List[int]] = {}
+        for row in np.flatnonzero(alive):
+            self.row_by_id[self.ids[row]] = int(row)
+            self.rows_by_video.setdefault(int(video_codes[row]), []).append(int(row))
+
+    @property
+    def live_count(self) -> int:
+        return len(self.row_by_id)
+
+    def has_video(self, video_id: str) -> bool:
+        code = self.video_code_by_id.get(video_id)
+        return code is not None and bool(self.rows_by_video.get(code))
+
+    def video_chunks(self, video_id: str) -> List[Dict]:
+        """The video's live chunks, in insertion order."""
+        with self._lock:
+            code = self.video_code_by_id.get(video_id)
+            rows = list(self.rows_by_video.get(code, [])) if code is not None else []
+            start_times = self.start_times.view(self.size)
+            end_times = self.end_times.view(self.size)
+            return [
+                {
+                    "id": self.ids[row],
+                    "text": self.texts[row],
+                    "start_time": float(start_times[row]),
+                    "end_time": float(end_times[row]),
+                }
+                for row in rows
+            ]
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        return assign_to_lists(vectors, self.centroids)
+
+    def insert(self, records: List[Dict], vectors: np.ndarray):
+        """Appends the chunks, records whose id is already stored replace the old row."""
+        with self._lock:
+            self._insert(records, vectors)
+        self._maintain()
+
+    def _insert(self, records: List[Dict], vectors: np.ndarray):
+        replaced = [self.row_by_id[record["id"]] for record in records if record["id"] in self.row_by_id]
+        if replaced:
+            self._tombstone(replaced)
+
+        codes = np.asarray(
+            [self.video_code_by_id.setdefault(record["video_id"], len(self.video_code_by_id)) for record in records],
+            dtype=np.int32,
+        )
+        self.video_ids = list(self.video_code_by_id)
+        start = self.size
+        self.vectors.write(start, vectors.astype(np.float32))
+        self.assignments.write(start, self._assign(vectors))
+        self.alive.write(start, np.ones(len(records), dtype=np.bool_))
+        self.video_codes.write(start, codes)
+        self.start_times.write(start, np.asarray([record["start_time"] for record in records], dtype=np.float32))
+        self.end_times.write(start, np.asarray([record["end_time"] for record in records], dtype=np.float32))
+        if self.quantizer is not None:
+            self.codes.write(start, self.quantizer.encode(vectors))
+        self._flush_arrays()
+        # Metadata last, its line count is the committed size of the index
+        with open(self._path("metadata.jsonl"), "a", encoding="utf-8") as metadata_file:
+            for record in records:
+                metadata_file.write(json.dumps([record["id"], record["video_id"], record["text"]]) + "\n")
+
+        for offset, record in enumerate(records):
+            row = start + offset
+            self.ids.append(record["id"])
+            self.texts.append(record["text"])
+            self.row_by_id[record["id"]] = row
+            self.rows_by_video.setdefault(int(codes[offset]), []).append(row)
+        self.size += len(records)
+        self._inverted_lists = None
+
+    def _tombstone(self, rows: List[int]):
+        alive = self.alive.view(self.size)
+        video_codes = self.video_codes.view(self.size)
+        for row in rows:
+            alive[row] = False
+            self.row_by_id.pop(self.ids[row], None)
+            video_rows = self.rows_by_video.get(int(video_codes[row]))
+            if video_rows is not None and row in video_rows:
+                video_rows.remove(row)
+        self.alive.flush()
+        self._inverted_lists = None
+
+    def delete_video(self, video_id: str):
+        with self._lock:
+            code = self.video_code_by_id.get(video_id)
+            if code is None:
+                return
+            rows = self.rows_by_video.pop(code, [])
+            if rows:
+                self._tombstone(rows)
+        self._maintain()
+
+    def _maintain(self):
+        """Compacts or trains when due, skipped while another thread already does."""
+        if not self._maintenance_lock.acquire(blocking=False):
+            return
+        try:
+            dead = self.size - self.live_count
+            if self.size and dead / self.size > self.compact_ratio:
+                self.compact()
+            elif self.centroids is None and self.live_count >= self.nlist * self.TRAIN_ROWS_PER_LIST:
+                self.train()
+        finally:
+            self._maintenance_lock.release()
+
+    def train(self):
+        """
+        Trains the centroids (and the quantizer) on the live rows and reassigns every row,
+        drops them if too few rows. Rows inserted while training are assigned on the swap.
+        """
+        with self._maintenance_lock:
+            with self._lock:
+                size = self.size
+                live_rows = np.fromiter(self.row_by_id.values(), dtype=np.int64)
+                vectors = self.vectors.view(size)
+
+            centroids, quantizer, staged_codes = None, None, None
+            if len(live_rows) >= self.nlist * self.TRAIN_ROWS_PER_LIST:
+                started_at = time.perf_counter()
+                sample = np.sort(np.random.default_rng(0).choice(live_rows, size=min(len(live_rows), 50_000), replace=False))
+                sample_vectors = np.asarray(vectors[sample])
+                centroids = train_centroids(sample_vectors, self.nlist)
+                logger.info(
+                    f"[IVF INDEX] trained {self.nlist} lists on {len(sample)} rows "
+                    f"in {time.perf_counter() - started_at:.2f}s"
+                )
+                if self.quantization != "none":
+                    pq_subvectors = self.pq_subvectors or max(1, sample_vectors.shape[1] // 8)
+                    quantizer = train_quantizer(self.quantization, sample_vectors, pq_subvectors=pq_subvectors)
+                    staged_codes = self.codes.stage(quantizer.encode(np.asarray(vectors)))
+                    logger.info(f"[IVF INDEX] {self.quantization} codes built for {size} rows")
+            staged_assignments = self.assignments.stage(assign_to_lists(np.asarray(vectors), centroids))
+
+            with self._lock:
+                tail = np.asarray(self.vectors.view(self.size)[size:])
+                if centroids is None:
+                    if os.path.exists(self._path("centroids.npy")):
+                        os.remove(self._path("centroids.npy"))
+                else:
+                    np.save(self._path("centroids.npy"), centroids)
+                self.centroids = centroids
+                if len(tail):
+                    staged_assignments.write(size, self._assign(tail))
+                self.assignments.replace_with(staged_assignments)
+                if self.quantization != "none":
+                    self._install_quantizer(quantizer, staged_codes, size, tail)
+                self._inverted_lists = None
+
+    def _install_quantizer(self, quantizer, staged_codes: Optional[GrowableMemmap], size: int, tail: np.ndarray):
+        quantizer_path = self._path("quantizer.npz")
+        self.quantizer = quantizer
+        if quantizer is None:
+            if os.path.exists(quantizer_path):
+                os.remove(quantizer_path)
+            return
+        quantizer.save(quantizer_path)
+        if len(tail):
+            staged_codes.write(size, quantizer.encode(tail))
+        self.codes.replace_with(staged_codes)
+
+    def compact(self):
+        """
+        Drops the tombstoned rows from every file and retrains the centroids. The live rows are
+        copied to side files outside the lock, rows deleted or inserted meanwhile are patched
+        in while swapping the files.
+        """
+        with self._maintenance_lock:
+            with self._lock:
+                size = self.size
+                live_rows = np.sort(np.fromiter(self.row_by_id.values(), dtype=np.int64))
+                # Codes are renumbered by first appearance, the same way _load_metadata numbers them
+                video_ids = [self.video_ids[code] for code in self.video_codes.view(size)[live_rows]]
+                ids = [self.ids[row] for row in live_rows]
+                texts = [self.texts[row] for row in live_rows]
+                # Rows below `size` are never rewritten by inserts, only their tombstones change
+                row_arrays = {name: getattr(self, name).view(size) for name in ("vectors", "start_times", "end_times")}
+            logger.info(f"[IVF INDEX] compacting {self.directory}, {size - len(live_rows)} dead rows")
+
+            staged = {name: getattr(self, name).stage(np.asarray(rows[live_rows])) for name, rows in row_arrays.items()}
+            new_codes: Dict[str, int] = {}
+            video_codes = [new_codes.setdefault(video_id, len(new_codes)) for video_id in video_ids]
+            row_by_id = {chunk_id: row for row, chunk_id in enumerate(ids)}
+            rows_by_video: Dict[int, List[int]] = {}
+            for row, code in enumerate(video_codes):
+                rows_by_video.setdefault(code, []).append(row)
+            temporary_path = self._path("metadata.jsonl.tmp")
+            with open(temporary_path, "w", encoding="utf-8") as metadata_file:
+                for chunk_id, video_id, text in zip(ids, video_ids, texts):
+                    metadata_file.write(json.dumps([chunk_id, video_id, text]) + "\n")
+
+            with self._lock:
+                still_alive = np.asarray(self.alive.view(self.size))
+                for row in np.flatnonzero(~still_alive[live_rows]):
+                    row_by_id.pop(ids[row], None)
+                    rows_by_video[video_codes[row]].remove(int(row))
+                tail_rows = range(size, self.size)
+                for name in row_arrays:
+                    staged[name].write(len(ids), np.asarray(getattr(self, name).view(self.size)[size:]))
+                with open(temporary_path, "a", encoding="utf-8") as metadata_file:
+                    for row in tail_rows:
+                        video_id = self.video_ids[int(self.video_codes.view(self.size)[row])]
+                        code = new_codes.setdefault(video_id, len(new_codes))
+                        new_row = len(ids)
+                        ids.append(self.ids[row])
+                        texts.append(self.texts[row])
+                        video_codes.append(code)
+                        if still_alive[row]:
+                            row_by_id[self.ids[row]] = new_row
+                            rows_by_video.setdefault(code, []).append(new_row)
+                        metadata_file.write(json.dumps([self.ids[row], video_id, self.texts[row]]) + "\n")
+                alive = np.concatenate([still_alive[live_rows], still_alive[size:]])
+
+                for name in row_arrays:
+                    getattr(self, name).replace_with(staged[name])
+                self.video_codes.replace_with(self.video_codes.stage(np.asarray(video_codes, dtype=np.int32)))
+                self.alive.replace_with(self.alive.stage(alive))
+                self.assignments.replace_with(self.assignments.stage(np.full(len(alive), -1, dtype=np.int32)))
+                os.replace(temporary_path, self._path("metadata.jsonl"))
+                # Untrained until train() below swaps the new lists in, searches are exact meanwhile
+                for name in ("centroids.npy", "quantizer.npz"):
+                    if os.path.exists(self._path(name)):
+                        os.remove(self._path(name))
+                self.centroids, self.quantizer = None, None
+                self.ids, self.texts, self.size = ids, texts, len(ids)
+                self.video_code_by_id, self.video_ids = new_codes, list(new_codes)
+                self.row_by_id, self.rows_by_video = row_by_id, rows_by_video
+                self._inverted_lists = None
+            self.train()
+
+    def _flush_arrays(self):
+        for array in (
+            self.vectors, self.assignments, self.alive, self.video_codes, self.start_times, self.end_times, self.codes
+        ):
+            array.flush()
+
+    def _lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows ordered by list, offsets) of the live rows, rebuilt after changes."""
+        if self._inverted_lists is None:
+            live_rows = np.flatnonzero(np.asarray(self.alive.view(self.size)))
+            assignments = np.asarray(self.assignments.view(self.size))[live_rows]
+            order = np.argsort(assignments, kind="stable")
+            offsets = np.zeros(self.nlist + 1, dtype=np.int64)
+            np.cumsum(np.bincount(assignments, minlength=self.nlist), out=offsets[1:])
+            self._inverted_lists = (live_rows[order], offsets)
+        return self._inverted_lists
+
+    def _candidates(self, query_vector: np.ndarray, code: int, exact: bool) -> np.ndarray:
+        video_rows = np.asarray(self.rows_by_video.get(code, []), dtype=np.int64)
+        expected_probed_rows = self.live_count * self.nprobe / self.nlist
+        if (
+            exact
+            or self.centroids is None
+            or len(video_rows) <= max(self.MIN_ANN_ROWS, expected_probed_rows)
+        ):
+            return video_rows
+        rows, offsets = self._lists()
+        probed = np.argpartition(self.centroids @ query_vector, -self.nprobe)[-self.nprobe:]
+        candidates = np.concatenate([rows[offsets[cluster]:offsets[cluster + 1]] for cluster in probed])
+        return candidates[np.asarray(self.video_codes.view(self.size))[candidates] == code]
+
+    def search(
+        self,
+        query_vector: np.ndarray,
+        k: int,
+        video_id: str,
+        start_time: Optional[float] = None,
+        end_time: Optional[float] = None,
+        exact: bool = False,
+        quantized: bool = True,
+    ) -> List[Dict]:
+        """`exact` scans all the video's rows, `quantized=False` scores them all in float32."""
+        with self._lock:
+            return self._search(query_vector, k, video_id, start_time, end_time, exact, quantized)
+
+    def _search(
+        self,
+        query_vector: np.ndarray,
+        k: int,
+        video_id: str,
+        start_time: Optional[float],
+        end_time: Optional[float],
+        exact: bool,
+        quantized: bool,
+    ) -> List[Dict]:
+        code = self.video_code_by_id.get(video_id)
+        if code is None:
+            return []
+        candidates = self._candidates(query_vector, code, exact)
+        if start_time is not None:
+            candidates = candidates[np.asarray(self.start_times.view(self.size))[candidates] >= start_time]
+        if end_time is not None:
+            candidates = candidates[np.asarray(self.end_times.view(self.size))[candidates] <= end_time]
+        if not len(candidates):
+            return []
+
+        shortlist_size = k * (self.rescore_factor or getattr(self.quantizer, "RESCORE_FACTOR", 1))
+        if quantized and self.quantizer is not None and len(candidates) > shortlist_size:
+            approximate_scores = self.quantizer.scores(query_vector, np.asarray(self.codes.view(self.size)[candidates]))
+            candidates = candidates[np.argpartition(approximate_scores, -shortlist_size)[-shortlist_size:]]
+
+        # Rescored in full precision, only these rows of the float32 file are read
+        scores = np.asarray(self.vectors.view(self.size)[candidates]) @ query_vector
+        if len(candidates) > k:
+            top = np.argpartition(scores, -k)[-k:]
+            candidates, scores = candidates[top], scores[top]
+        order = np.argsort(scores)[::-1]
+        start_times = self.start_times.view(self.size)
+        end_times = self.end_times.view(self.size)
+        return [
+            {
+                "_id": self.ids[row],
+                "_score": float(score),
+                "fields": {
+                    "text": self.texts[row],
+                    "start_time": float(start_times[row]),
+                    "end_time": float(end_times[row]),
+                },
+            }
+            for row, score in zip(candidates[order], scores[order])
+        ]
+
+
+    def memory_report(self) -> Dict[str, Any]:
+        """Bytes per 1k chunks of the float32 vectors and of what searches actually scan."""
+        dimension = self.vectors.view(self.size).shape[1] if self.size else 0
+        float32_bytes = 4 * dimension
+        scanned_bytes = self.quantizer.code_size(dimension) if self.quantizer is not None else float32_bytes
+        # assignments, alive, video_codes, start_times and end_times
+        metadata_bytes = 4 + 1 + 4 + 4 + 4
+        return {
+            "quantization": self.quantizer.kind if self.quantizer is not None else "none",
+            "chunks": self.live_count,
+            "dimension": dimension,
+            "float32_bytes_per_1k_chunks": float32_bytes * 1000,
+            "scanned_bytes_per_1k_chunks": (scanned_bytes + metadata_bytes) * 1000,
+            "compression": round(float32_bytes / scanned_bytes, 2) if scanned_bytes else 1.0,
+        }
+
+
+def benchmark(index: IVFIndex, video_id: str, query_vectors: np.ndarray, k: int = 10) -> Dict[str, float]:
+    """Recall@k of the default search path against the exact float32 scan, and queries per second of both."""
+    results = {}
+    for name, exact in (("exact", True), ("ann", False)):
+        started_at = time.perf_counter()
+        results[name] = [
+            {hit["_id"] for hit in index.search(query_vector, k, video_id, exact=exact, quantized=not exact)}
+            for query_vector in query_vectors
+        ]
+        results[f"{name}_qps"] = len(query_vectors) / (time.perf_counter() - started_at)
+    recall = np.mean([
+        len(ann & exact) / max(len(exact), 1) for ann, exact in zip(results["ann"], results["exact"])
+    ])
+    return {
+        f"recall@{k}": round(float(recall), 4),
+        "exact_qps": round(results["exact_qps"], 1),
+        "ann_qps": round(results["ann_qps"], 1),
+    }
+
+
+if __name__ == "__main__":
+    # python -m src.ai.local_vector_db.ivf_index, synthetic benchmark in a temporary directory
+    import tempfile
+
+    rng = np.random.default_rng(42)
+    dimension, rows, queries = 384, 100_000, 200
+    centers = rng.standard_normal((256, dimension)).astype(np.float32)
+    data = centers[rng.integers(256, size=rows)] + 0.5 * rng.standard_normal((rows, dimension)).astype(np.float32)
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    records = [
+        {"id": str(row), "video_id": "benchmark", "text": "", "start_time": row, "end_time": row + 1}
+        for row in range(rows)
+    ]
+    query_vectors = data[rng.integers(rows, size=queries)] + 0.1 * rng.standard_normal((queries, dimension)).astype(np.float32)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    # One line per mode: memory per 1k chunks, recall@10 against the exact float32 scan and QPS
+    for quantization in ("none", "int8", "pq"):
+        with tempfile.TemporaryDirectory() as directory:
+            index = IVFIndex(directory, nlist=256, nprobe=16, quantization=quantization)
+            for batch_start in range(0, rows, 10_000):
+                index.insert(records[batch_start:batch_start + 10_000], data[batch_start:batch_start + 10_000])
+            print({**index.memory_report(), **benchmark(index, "benchmark", query_vectors, k=10)})
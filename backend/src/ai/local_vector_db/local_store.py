@@ -0,0 +1,290 @@
+import asyncio
+import os
+import shutil
+from typing import List, Dict, Callable, Optional, Literal
+
+import numpy as np
+from loguru import logger
+
+from src.utils import get_video_id
+from src.ai.vector_store import VideoRecords, SHARED_NAMESPACE
+from src.config import CONFIG
+from .ivf_index import IVFIndex
+
+try:
+    from fastembed import TextEmbedding
+except ImportError:  # Optional, only needed when VECTOR_STORE_BACKEND is "local"
+    TextEmbedding = None
+
+
+class LocalEmbedder:
+    """CPU embedding model run off the event loop, vectors are L2 normalised."""
+
+    def __init__(self, model_name: str):
+        if TextEmbedding is None:
+            raise RuntimeError(
+                "The local vector store needs fastembed, install it with `pip install fastembed`"
+            )
+        self.model = TextEmbedding(model_name=model_name)
+
+    def _embed(self, texts: List[str], is_query: bool) -> np.ndarray:
+        embed = self.model.query_embed if is_query else self.model.passage_embed
+        vectors = np.asarray(list(embed(texts)), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    async def embed_passages(self, texts: List[str]) -> np.ndarray:
+        return await asyncio.to_thread(self._embed, texts, False)
+
+    async def embed_query(self, query: str) -> np.ndarray:
+        return (await asyncio.to_thread(self._embed, [query], True))[0]
+
+
+class _VideoVectors:
+    """Embeddings of one video's chunks as a matrix, metadata in parallel arrays."""
+
+    def __init__(self, vectors: np.ndarray, chunks: List[Dict]):
+        self.ids = [chunk["id"] for chunk in chunks]
+        self.vectors = vectors
+        self.start_times = np.asarray([chunk["start_time"] for chunk in chunks], dtype=np.float32)
+        self.end_times = np.asarray([chunk["end_time"] for chunk in chunks], dtype=np.float32)
+        self.texts = [chunk["text"] for chunk in chunks]
+
+    def chunk(self, row: int) -> Dict:
+        return {
+            "id": self.ids[row],
+            "text": self.texts[row],
+            "start_time": float(self.start_times[row]),
+            "end_time": float(self.end_times[row]),
+        }
+
+    def search(
+        self,
+        query_vector: np.ndarray,
+        k: int,
+        start_time: Optional[float] = None,
+        end_time: Optional[float] = None,
+    ) -> List[Dict]:
+        scores = self.vectors @ query_vector
+        candidates = np.arange(len(self.ids))
+        if start_time is not None:
+            candidates = candidates[self.start_times[candidates] >= start_time]
+        if end_time is not None:
+            candidates = candidates[self.end_times[candidates] <= end_time]
+        if candidates.size > k:
+            candidates = candidates[np.argpartition(scores[candidates], -k)[-k:]]
+        candidates = candidates[np.argsort(scores[candidates])[::-1]]
+        return [
+            {
+                "_id": self.ids[row],
+                "_score": float(scores[row]),
+                "fields": {
+                    "text": self.texts[row],
+                    "start_time": float(self.start_times[row]),
+                    "end_time": float(self.end_times[row]),
+                },
+            }
+            for row in candidates
+        ]
+
+
+class _ExactNamespace:
+    """In memory namespace, every search is an exact scan of the video's matrix."""
+
+    def __init__(self):
+        self.videos: Dict[str, _VideoVectors] = {}
+
+    def insert(self, records: List[Dict], vectors: np.ndarray):
+        rows_by_video: Dict[str, List[int]] = {}
+        for row, record in enumerate(records):
+            rows_by_video.setdefault(record["video_id"], []).append(row)
+
+        for video_id, rows in rows_by_video.items():
+            chunks = [records[row] for row in rows]
+            video_vectors = vectors[rows]
+            existing = self.videos.get(video_id)
+            if existing is not None:
+                # Upsert semantics, records with a known id replace the stored ones
+                new_ids = {chunk["id"] for chunk in chunks}
+                kept = [row for row, chunk_id in enumerate(existing.ids) if chunk_id not in new_ids]
+                chunks = [existing.chunk(row) for row in kept] + chunks
+                video_vectors = np.vstack([existing.vectors[kept], video_vectors])
+            self.videos[video_id] = _VideoVectors(video_vectors, chunks)
+
+    def delete_video(self, video_id: str):
+        self.videos.pop(video_id, None)
+
+    def has_video(self, video_id: str) -> bool:
+        return video_id in self.videos
+
+    def video_chunks(self, video_id: str) -> List[Dict]:
+        video_vectors = self.videos.get(video_id)
+        if video_vectors is None:
+            return []
+        return [video_vectors.chunk(row) for row in range(len(video_vectors.ids))]
+
+    def search(
+        self,
+        query_vector: np.ndarray,
+        k: int,
+        video_id: str,
+        start_time: Optional[float] = None,
+        end_time: Optional[float] = None,
+    ) -> List[Dict]:
+        video_vectors = self.videos.get(video_id)
+        if video_vectors is None:
+            return []
+        return video_vectors.search(query_vector, k, start_time=start_time, end_time=end_time)
+
+
+class LocalVectorStore:
+    """
+    In-process VectorStore, searched with NumPy, one index per namespace.
+
+    Nothing leaves the worker, so retrieval costs no network round trip. Chunks are embedded
+    with a local CPU model, which makes this backend suited to development, benchmarks and
+    single worker deployments.
+
+    With the "exact" index every video is a matrix in memory, scanned in full and lost on
+    restart. With "ivf" each namespace is an IVFIndex persisted under `directory`, mapped back
+    on first use after a restart, optionally searched on int8 or product quantized codes.
+    """
+
+    def __init__(
+        self,
+        embedder: LocalEmbedder,
+        index_type: Literal["exact", "ivf"] = "exact",
+        directory: str = "data/vector_store",
+        nlist: int = 64,
+        nprobe: int = 8,
+        compact_ratio: float = 0.3,
+        quantization: Literal["none", "int8", "pq"] = "none",
+        pq_subvectors: int = 0,
+        rescore_factor: int = 0,
+    ):
+        self.embedder = embedder
+        self.index_type = index_type
+        self.directory = directory
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.compact_ratio = compact_ratio
+        self.quantization = quantization
+        self.pq_subvectors = pq_subvectors
+        self.rescore_factor = rescore_factor
+        self._namespaces: Dict[str, _ExactNamespace | IVFIndex] = {}
+        self._delete_listeners: List[Callable[[str], None]] = []
+
+    def _namespace(
+        self, name: str = SHARED_NAMESPACE, create: bool = False
+    ) -> Optional[_ExactNamespace | IVFIndex]:
+        namespace = self._namespaces.get(name)
+        if namespace is not None:
+            return namespace
+        if self.index_type == "exact":
+            if not create:
+                return None
+            namespace = _ExactNamespace()
+        else:
+            path = os.path.join(self.directory, name.replace(os.sep, "_"))
+            if not create and not os.path.isdir(path):
+                return None
+            namespace = IVFIndex(
+                path,
+                nlist=self.nlist,
+                nprobe=self.nprobe,
+                compact_ratio=self.compact_ratio,
+                quantization=self.quantization,
+                pq_subvectors=self.pq_subvectors,
+                rescore_factor=self.rescore_factor,
+            )
+        self._namespaces[name] = namespace
+        return namespace
+
+    def add_delete_listener(self, listener: Callable[[str], None]):
+        """Registers a callback run with the video_id after a video transcript is deleted."""
+        self._delete_listeners.append(listener)
+
+    async def embed_query(self, query: str) -> List[float]:
+        return (await self.embedder.embed_query(query)).tolist()
+
+    async def upsert_records_into_vdb(self, video_records_data: VideoRecords) -> bool:
+        records = [record.model_dump() for record in video_records_data["records"]]
+        if not records:
+            return True
+        vectors = await self.embedder.embed_passages([record["text"] for record in records])
+        namespace = self._namespace(create=True)
+        # Index files are written in place, keep the disk io off the event loop
+        await asyncio.to_thread(namespace.insert, records, vectors)
+        logger.debug(f"[LOCAL VECTOR STORE] {len(records)} chunks stored for {video_records_data['video_id']}")
+        return True
+
+    async def retrieve_context(self, query: str, video_id: str, k: int = 4) -> List[Dict]:
+        namespace = self._namespace()
+        if namespace is None or not namespace.has_video(video_id):
+            return []
+        query_vector = await self.embedder.embed_query(query)
+        # Scans and the index lock stay off the event loop
+        return await asyncio.to_thread(namespace.search, query_vector, k, video_id)
+
+    async def retrieve_context_with_time_filter(
+        self,
+        query: str,
+        video_id: str,
+        start_time: int,
+        end_time: int,
+        k: int = 4,
+    ) -> List[Dict]:
+        namespace = self._namespace()
+        if namespace is None or not namespace.has_video(video_id):
+            return []
+        query_vector = await self.embedder.embed_query(query)
+        return await asyncio.to_thread(
+            namespace.search, query_vector, k, video_id, start_time=start_time, end_time=end_time
+        )
+
+    async def fetch_video_chunks(self, video_id: str) -> List[Dict]:
+        namespace = self._namespace()
+        if namespace is None:
+            return []
+        return await asyncio.to_thread(namespace.video_chunks, video_id)
+
+    async def delete_video_transcript(self, video_url_or_id) -> bool:
+        video_id = get_video_id(video_url_or_id)
+        namespace = self._namespace()
+        if namespace is not None:
+            await asyncio.to_thread(namespace.delete_video, video_id)
+        for listener in self._delete_listeners:
+            listener(video_id)
+        return True
+
+    async def check_for_transcript(self, video_url_or_id) -> bool:
+        namespace = self._namespace()
+        return namespace is not None and namespace.has_video(get_video_id(video_url_or_id))
+
+    async def delete_legacy_namespaces(self) -> List[str]:
+        # Exact namespaces died with the worker that held them, per user IVF indexes stay on disk
+        if self.index_type != "ivf" or not os.path.isdir(self.directory):
+            return []
+        legacy_namespaces = sorted(
+            name
+            for name in os.listdir(self.directory)
+            if name != SHARED_NAMESPACE and os.path.isdir(os.path.join(self.directory, name))
+        )
+        for name in legacy_namespaces:
+            self._namespaces.pop(name, None)
+            await asyncio.to_thread(shutil.rmtree, os.path.join(self.directory, name))
+        return legacy_namespaces
+
+
+async def init_local_vector_db():
+    return LocalVectorStore(
+        LocalEmbedder(CONFIG.LOCAL_EMBEDDING_MODEL),
+        index_type=CONFIG.LOCAL_VECTOR_INDEX,
+        directory=CONFIG.LOCAL_VECTOR_STORE_DIR,
+        nlist=CONFIG.LOCAL_ANN_NLIST,
+        nprobe=CONFIG.LOCAL_ANN_NPROBE,
+        compact_ratio=CONFIG.LOCAL_ANN_COMPACT_RATIO,
+        quantization=CONFIG.LOCAL_VECTOR_QUANTIZATION,
+        pq_subvectors=CONFIG.LOCAL_PQ_SUBVECTORS,
+        rescore_factor=CONFIG.LOCAL_RESCORE_FACTOR,
+    )
@@ -0,0 +1,128 @@
+import os
+from typing import Optional
+
+import numpy as np
+
+
+class ScalarQuantizer:
+    """
+    int8 scalar quantization, every dimension mapped linearly from its [min, max] to [-128, 127].
+
+    4x smaller than float32. The inner product is computed on the codes as
+    (query * scale) . codes + query . offset, so vectors are never decoded.
+    """
+
+    kind = "int8"
+    code_dtype = np.int8
+    # Candidates rescored in float32 per result wanted
+    RESCORE_FACTOR = 4
+
+    def __init__(self, offsets: np.ndarray, scales: np.ndarray):
+        self.offsets = offsets.astype(np.float32)
+        self.scales = scales.astype(np.float32)
+
+    @classmethod
+    def train(cls, vectors: np.ndarray) -> "ScalarQuantizer":
+        minimums = vectors.min(axis=0)
+        maximums = vectors.max(axis=0)
+        scales = np.maximum(maximums - minimums, 1e-12) / 255
+        # value = code * scale + offset with code in [-128, 127]
+        return cls(offsets=minimums + 128 * scales, scales=scales)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.rint((vectors - self.offsets) / self.scales)
+        return np.clip(codes, -128, 127).astype(np.int8)
+
+    def scores(self, query_vector: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32) @ (query_vector * self.scales) + float(query_vector @ self.offsets)
+
+    def code_size(self, dimension: int) -> int:
+        return dimension
+
+    def save(self, path: str):
+        np.savez(path, kind=self.kind, offsets=self.offsets, scales=self.scales)
+
+
+class ProductQuantizer:
+    """
+    Product quantization, the vector is split in `subvectors` parts each replaced by the id
+    of its nearest of 256 centroids, one byte per part.
+
+    Scores use asymmetric distance computation: the query's inner product with every
+    centroid is tabulated once, then a vector's score is a sum of table lookups.
+    """
+
+    kind = "pq"
+    code_dtype = np.uint8
+    # Coarser scores, the true top k sits deeper in the approximate ranking
+    RESCORE_FACTOR = 16
+    CENTROIDS = 256
+
+    def __init__(self, codebooks: np.ndarray):
+        # (subvectors, 256, subvector dimension)
+        self.codebooks = codebooks.astype(np.float32)
+
+    @property
+    def subvectors(self) -> int:
+        return len(self.codebooks)
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, subvectors: int, iterations: int = 10, seed: int = 0) -> "ProductQuantizer":
+        dimension = vectors.shape[1]
+        if dimension % subvectors:
+            raise ValueError(f"dimension {dimension} is not divisible by {subvectors} subvectors")
+        rng = np.random.default_rng(seed)
+        parts = vectors.reshape(len(vectors), subvectors, -1)
+        codebooks = []
+        for part in range(subvectors):
+            data = parts[:, part, :]
+            centroids = data[rng.choice(len(data), size=cls.CENTROIDS, replace=len(data) < cls.CENTROIDS)].copy()
+            for _ in range(iterations):
+                assignments = cls._nearest(data, centroids)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignments, data)
+                counts = np.bincount(assignments, minlength=cls.CENTROIDS)[:, None]
+                centroids = np.where(counts > 0, sums / np.maximum(counts, 1), centroids)
+            codebooks.append(centroids)
+        return cls(np.stack(codebooks))
+
+    @staticmethod
+    def _nearest(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        distances = (centroids ** 2).sum(axis=1) - 2 * data @ centroids.T
+        return np.argmin(distances, axis=1)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        parts = vectors.reshape(len(vectors), self.subvectors, -1)
+        codes = np.empty((len(vectors), self.subvectors), dtype=np.uint8)
+        for part in range(self.subvectors):
+            codes[:, part] = self._nearest(parts[:, part, :], self.codebooks[part])
+        return codes
+
+    def scores(self, query_vector: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        query_parts = query_vector.reshape(self.subvectors, -1)
+        # (subvectors, 256) inner products of the query parts with every centroid
+        table = np.einsum("sd,scd->sc", query_parts, self.codebooks)
+        return table[np.arange(self.subvectors), codes].sum(axis=1)
+
+    def code_size(self, dimension: int) -> int:
+        return self.subvectors
+
+    def save(self, path: str):
+        np.savez(path, kind=self.kind, codebooks=self.codebooks)
+
+
+def train_quantizer(kind: str, vectors: np.ndarray, pq_subvectors: int):
+    if kind == "int8":
+        return ScalarQuantizer.train(vectors)
+    if kind == "pq":
+        return ProductQuantizer.train(vectors, subvectors=pq_subvectors)
+    return None
+
+
+def load_quantizer(path: str) -> Optional[ScalarQuantizer | ProductQuantizer]:
+    if not os.path.exists(path):
+        return None
+    data = np.load(path)
+    if str(data["kind"]) == "int8":
+        return ScalarQuantizer(offsets=data["offsets"], scales=data["scales"])
+    return ProductQuantizer(codebooks=data["codebooks"])
@@ -0,0 +1,103 @@
+from typing import List
+
+from loguru import logger
+
+from src.db.postgres_db import Session
+from src.chats.services import chat_service
+from src.chats.models import QuestionsAnswers
+from .chat_models import ChatModels
+from .prompts import Prompts
+
+
+def format_turn(qa: QuestionsAnswers) -> str:
+    return f"User: {qa.query}\nAssistant: {qa.answer}"
+
+
+class ConversationMemory:
+    """
+    DB backed conversation history of a chat.
+
+    The latest `recent_turns` QAs are sent verbatim, everything older is folded into a
+    rolling summary stored on the chat, so the prompt stays bounded however long the chat is.
+    Turns are folded `summarize_every` at a time instead of one llm call per answer, until
+    then the ones that left the window are still sent verbatim.
+    """
+
+    def __init__(self, recent_turns: int = 6, summarize_every: int = 4):
+        self.recent_turns = recent_turns
+        self.summarize_every = summarize_every
+        # Chats being summarized by this worker, a second run would fold the same turns
+        self._summarizing: set[str] = set()
+
+    async def load(self, chat_id: str) -> List[str]:
+        """Returns the summary of the older turns (if any) followed by the recent turns."""
+        async with Session() as session:
+            chat = await chat_service.get_chat_by_id(chat_id, session)
+            if chat is None:
+                return []
+            total_qas = await chat_service.count_qa(chat_id, session)
+            unsummarized_qas = total_qas - chat.summarized_qa_count
+            verbatim_turns = max(
+                self.recent_turns, min(unsummarized_qas, self.recent_turns + self.summarize_every)
+            )
+            recent_qas = await chat_service.get_recent_qa(chat_id, verbatim_turns, session)
+
+        conversation_history = []
+        if chat.conversation_summary:
+            conversation_history.append(f"Summary of the earlier conversation: {chat.conversation_summary}")
+        conversation_history.extend(format_turn(qa) for qa in recent_qas)
+        return conversation_history
+
+    async def update_summary(self, chat_id: str, chat_model: ChatModels):
+        """
+        Folds the turns that left the recent window into the rolling summary, once
+        `summarize_every` of them did.
+
+        Meant to run in the background after the answer has been streamed. No connection is
+        held during the llm call, the summary is only stored if no other run (another worker,
+        or the chat being cleared) moved summarized_qa_count in the meantime.
+        """
+        if chat_id in self._summarizing:
+            return
+        self._summarizing.add(chat_id)
+        try:
+            async with Session() as session:
+                chat = await chat_service.get_chat_by_id(chat_id, session)
+                if chat is None:
+                    return
+                previous_summary = chat.conversation_summary
+                summarized_qa_count = chat.summarized_qa_count
+
+                total_qas = await chat_service.count_qa(chat_id, session)
+                summarize_upto = total_qas - self.recent_turns
+                if summarize_upto - summarized_qa_count < self.summarize_every:
+                    return
+
+                new_qas = await chat_service.get_qa_slice(
+                    chat_id,
+                    offset=summarized_qa_count,
+                    limit=summarize_upto - summarized_qa_count,
+                    session=session,
+                )
+                new_turns = "\n\n".join(format_turn(qa) for qa in new_qas)
+
+            prompt = Prompts.ROLLING_SUMMARY_PROMPT.value.format(
+                summary=previous_summary or "None", new_turns=new_turns
+            )
+            summary = await chat_model.call_llm(prompt)
+
+            async with Session() as session:
+                stored = await chat_service.update_conversation_summary(
+                    chat_id, summary, summarize_upto, summarized_qa_count, session
+                )
+            if stored:
+                logger.info(f"[CONVERSATION MEMORY] summarized {summarize_upto} turns of chat {chat_id}")
+            else:
+                logger.info(f"[CONVERSATION MEMORY] summary of chat {chat_id} changed meanwhile, dropped")
+        except Exception as e:
+            logger.exception(f"[CONVERSATION MEMORY] summary update failed for chat {chat_id}: {e}")
+        finally:
+            self._summarizing.discard(chat_id)
+
+
+conversation_memory = ConversationMemory()
@@ -3,11 +3,13 @@ from pinecone.db_data.index_asyncio import _IndexAsyncio
 from pinecone.exceptions.exceptions import PineconeApiException
 from dotenv import load_dotenv
 import os
-from typing import List, TypedDict, Dict, Generator
+from typing import List, Dict, Generator, Callable
 
 from src.utils import get_video_id
 from src.ai.exceptions import VectorDatabaseError
+from src.app_responses import AppError
 from src.ai.youtube.transcript_preprocessor import TranscriptChunk
+from src.ai.vector_store import VideoRecords, SHARED_NAMESPACE
 from loguru import logger
 
 load_dotenv()
@@ -16,14 +18,19 @@ PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_HOST = os.getenv("PINECONE_HOST")
 
 
-class VideoRecords(TypedDict):
-    user_id: str
-    records: List[TranscriptChunk]
+EMBEDDING_MODEL = "llama-text-embed-v2"
+# Ids fetched per request when reading a video's records back
+FETCH_BATCH_SIZE = 100
 
 
 class PineconeClient:
-    def __init__(self, index):
+    """VectorStore backed by a hosted Pinecone index with integrated embedding."""
+
+    def __init__(self, index, client: PineconeAsyncio | None = None):
         self.index: _IndexAsyncio = index
+        self.client = client
+        # Called with the video_id whenever a video transcript is deleted
+        self._delete_listeners: List[Callable[[str], None]] = []
 
     @classmethod
     async def create(cls, index_name: str, api_key: str, host: str):
@@ -34,15 +41,31 @@ class PineconeClient:
                 cloud="aws",
                 region="us-east-1",
                 embed={
-                    "model": "llama-text-embed-v2",
+                    "model": EMBEDDING_MODEL,
                     "field_map": {"text": "chunk_text", "dimension": 2048},
                 },
             )
         index = client.IndexAsyncio(host=host)
-        return cls(index)
+        return cls(index, client)
+
+    def add_delete_listener(self, listener: Callable[[str], None]):
+        """Registers a callback run with the video_id after a video transcript is deleted."""
+        self._delete_listeners.append(listener)
+
+    async def embed_query(self, query: str) -> List[float]:
+        """Embeds the query with the same model the index uses."""
+        try:
+            embeddings = await self.client.inference.embed(
+                model=EMBEDDING_MODEL,
+                inputs=[query],
+                parameters={"input_type": "query", "truncate": "END"},
+            )
+        except Exception as e:
+            logger.exception(f"Error during query embedding : {e}")
+            raise VectorDatabaseError()
+        return embeddings[0]["values"]
 
     async def upsert_records_into_vdb(self, video_records_data: VideoRecords):
-        namespace: str = video_records_data["user_id"]
         records_with_chunks: list[TranscriptChunk] = video_records_data["records"]
 
         # To  convert pydantic class to dict, since pinecone uses .get() on records internally
@@ -60,7 +83,7 @@ class PineconeClient:
 
             for batch in chunks(records_dict, 96):
                 logger.debug(f"The batch is : {batch} \n\n")
-                await self.index.upsert_records(namespace=namespace, records=batch)
+                await self.index.upsert_records(namespace=SHARED_NAMESPACE, records=batch)
 
         except Exception as e:
             logger.exception(f"Error during upsert : {e}")
@@ -72,14 +95,13 @@ class PineconeClient:
         return True
 
     async def retrieve_context(
-        self, query: str, user_id: str, video_id: str, k: int = 4
+        self, query: str, video_id: str, k: int = 4
     ) -> List[Dict]:
         """
         Retrieves relevant context from the video based on the user query.
 
         Args:
             query (str): The user query about the video.
-            user_id (str): The user id to search in specific namespace in pinecone
             video_id (str): The video which the user is querying, required for metadata filtering
             k(int): The number of chunks to retrieve
 
@@ -88,7 +110,7 @@ class PineconeClient:
         """
         try:
             filtered_results = await self.index.search(
-                namespace=user_id,
+                namespace=SHARED_NAMESPACE,
                 query={
                     "inputs": {"text": query},
                     "top_k": k,
@@ -106,7 +128,6 @@ class PineconeClient:
     async def retrieve_context_with_time_filter(
         self,
         query: str,
-        user_id: str,
         video_id: str,
         start_time: int,
         end_time: int,
@@ -114,7 +135,7 @@ class PineconeClient:
     ) -> List[Dict]:
         try:
             filtered_results = await self.index.search(
-                namespace=user_id,
+                namespace=SHARED_NAMESPACE,
                 query={
                     "inputs": {"text": query},
                     "top_k": k,
@@ -136,22 +157,48 @@ class PineconeClient:
         return results
 
 
-    async def delete_video_transcript(self, user_id, video_url_or_id):
+    async def fetch_video_chunks(self, video_id: str) -> List[Dict]:
+        """Fetches the records by their ids, "<video_id>-<n>", until a batch comes back short."""
+        chunks: List[Dict] = []
+        try:
+            while True:
+                ids = [f"{video_id}-{n}" for n in range(len(chunks), len(chunks) + FETCH_BATCH_SIZE)]
+                response = await self.index.fetch(ids=ids, namespace=SHARED_NAMESPACE)
+                found = [response.vectors[chunk_id] for chunk_id in ids if chunk_id in response.vectors]
+                chunks.extend(
+                    {
+                        "id": vector.id,
+                        "text": vector.metadata["text"],
+                        "start_time": vector.metadata["start_time"],
+                        "end_time": vector.metadata["end_time"],
+                    }
+                    for vector in found
+                )
+                if len(found) < FETCH_BATCH_SIZE:
+                    return chunks
+        except Exception as e:
+            logger.exception(f"Error while fetching the records of {video_id} : {e}")
+            raise AppError(VectorDatabaseError())
+
+    async def delete_video_transcript(self, video_url_or_id):
         video_id = get_video_id(video_url_or_id)
         try:
             await self.index.delete(
-                namespace=user_id, filter={"video_id": {"$eq": video_id}}
+                namespace=SHARED_NAMESPACE, filter={"video_id": {"$eq": video_id}}
             )
         except Exception as e:
             print(e)
             raise VectorDatabaseError()
+
+        for listener in self._delete_listeners:
+            listener(video_id)
         return True
 
-    async def check_for_transcript(self, user_id, video_url_or_id):
+    async def check_for_transcript(self, video_url_or_id):
         video_id = get_video_id(video_url_or_id)
         try:
             results = await self.index.search(
-                namespace=user_id,
+                namespace=SHARED_NAMESPACE,
                 query={
                     "inputs": {"text": "What is the video about"},
                     "top_k": 1,
@@ -168,6 +215,17 @@ class PineconeClient:
         print(f"{results['result']['hits']}")
         return exists
 
+    async def delete_legacy_namespaces(self) -> List[str]:
+        try:
+            stats = await self.index.describe_index_stats()
+            legacy_namespaces = [name for name in stats.namespaces if name != SHARED_NAMESPACE]
+            for name in legacy_namespaces:
+                await self.index.delete(delete_all=True, namespace=name)
+        except Exception as e:
+            logger.exception(f"Error while deleting the legacy namespaces : {e}")
+            raise VectorDatabaseError()
+        return legacy_namespaces
+
 
 # async factory
 async def init_pinecone_db():
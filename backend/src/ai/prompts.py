@@ -1,24 +1,27 @@
 from langchain_core.prompts import PromptTemplate
 import enum
 
+# Bump whenever a prompt changes, cached answers are keyed by it
+PROMPT_VERSION = "2"
+
 
 class Prompts(enum.Enum):
     NORMAL_CHAT_PROMPT = PromptTemplate(
         template="""
         You are given a YouTube video transcript as context.
+        Each context line starts with the [start-end min] range of the video it covers.
         Answer the query using only the information from the context.
         If the context is insufficient, clearly say so.
         Respond clearly and naturally. **Respond in the same language as the query.**
 
-        QUERY:
-        {user_query}
+        CONTEXT:
+        {context}
 
         PREVIOUS CONVERSATION:
         {conversation_history}
 
-        CONTEXT:
-        {context}
-
+        QUERY:
+        {user_query}
     """,
         input_variables=["context", "user_query", "conversation_history"],
     )
@@ -58,3 +61,18 @@ class Prompts(enum.Enum):
 """,
         input_variables=["query", "conversation_history"],
     )
+
+    ROLLING_SUMMARY_PROMPT = PromptTemplate(
+        template="""
+        You maintain a running summary of a conversation between a user and an assistant about a YouTube video.
+        Update the existing summary with the new turns. Keep the facts, names, numbers and open questions
+        the user may refer back to, drop small talk. Write at most 200 words of plain text, no preamble.
+
+        EXISTING SUMMARY:
+        {summary}
+
+        NEW TURNS:
+        {new_turns}
+        """,
+        input_variables=["summary", "new_turns"],
+    )
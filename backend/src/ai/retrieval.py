@@ -0,0 +1,188 @@
+import asyncio
+import re
+from typing import List, Dict, Any, Tuple, Awaitable, TypeVar, Sequence
+
+from src.config import CONFIG
+from .context_packer import context_packer, count_chunk_tokens
+
+
+T = TypeVar("T")
+
+# Splits compound questions: comparisons, several questions in one message, "... and how/what ..."
+SUB_QUERY_SEPARATORS = re.compile(
+    r"\?\s+|;\s*|\s+(?:versus|vs\.?|compared (?:to|with)|as opposed to|and then)\s+"
+    r"|,?\s+and (?=(?:how|what|why|when|where|who|which|does|do|is|are|can)\b)",
+    re.IGNORECASE,
+)
+MIN_SUB_QUERY_WORDS = 3
+
+# Caps the vector searches fanned out by all requests of this worker at once
+vector_search_slots = asyncio.Semaphore(CONFIG.MULTI_QUERY_CONCURRENCY)
+
+
+def split_query(query: str, max_sub_queries: int) -> List[str]:
+    """
+    Returns the query followed by the sub-queries it splits into, at most `max_sub_queries`.
+
+    Parts too short to search on their own ("... early on versus later") are searched
+    together with the first part, so they keep its subject.
+    """
+    parts = [part.strip(" ,.?") for part in SUB_QUERY_SEPARATORS.split(query)]
+    parts = [part for part in parts if part]
+    sub_queries = [query]
+    if len(parts) > 1:
+        for part in parts:
+            if len(part.split()) < MIN_SUB_QUERY_WORDS:
+                part = f"{parts[0]} {part}"
+            if part not in sub_queries:
+                sub_queries.append(part)
+    return sub_queries[:max_sub_queries]
+
+
+async def run_limited(awaitable: Awaitable[T]) -> T:
+    async with vector_search_slots:
+        return await awaitable
+
+
+def format_hit(hit: Dict) -> Dict:
+    """Vector db hit -> {start_time, end_time, text} chunk."""
+    fields = hit["fields"]
+    return {"start_time": fields["start_time"], "end_time": fields["end_time"], "text": fields["text"]}
+
+
+def reciprocal_rank_fusion(rankings: List[List[Dict]], k: int = 60) -> List[Dict]:
+    """Fuses ranked chunk lists, a chunk scores sum(1 / (k + rank)) over the lists it's in."""
+    scores: Dict[Tuple[float, float], float] = {}
+    chunks: Dict[Tuple[float, float], Dict] = {}
+    for ranking in rankings:
+        for rank, chunk in enumerate(ranking, start=1):
+            key = (chunk["start_time"], chunk["end_time"])
+            scores[key] = scores.get(key, 0.0) + 1 / (k + rank)
+            chunks.setdefault(key, chunk)
+    return [chunks[key] for key in sorted(scores, key=scores.get, reverse=True)]
+
+
+class AdaptiveTopK:
+    """
+    Chooses how many of the over-fetched candidates are worth sending to the model.
+
+    Candidates come in relevance order, at least `min_k` are kept, then the cut is made at the
+    first sharp drop in score (more than `max_score_gap` of the top score between neighbours),
+    once scores fall under `min_score_ratio` of the top one, at `max_k`, or when the model's
+    context budget is spent. Kept chunks that overlap or touch in time are collapsed into one
+    span placed at the rank of its best chunk, so neighbouring hits don't repeat the window.
+
+    Each list of dense hits (one per sub-query) is cut on its own, then the kept hits and the
+    lexical matches are fused by reciprocal rank fusion before collapsing, so exact names and
+    numbers the embedding missed, and every part of a compound question, still make it in.
+    """
+
+    def __init__(
+        self,
+        candidate_k: int = 12,
+        min_k: int = 2,
+        max_k: int = 8,
+        min_score_ratio: float = 0.6,
+        max_score_gap: float = 0.15,
+    ):
+        self.candidate_k = candidate_k
+        self.min_k = min_k
+        self.max_k = max_k
+        self.min_score_ratio = min_score_ratio
+        self.max_score_gap = max_score_gap
+
+        self.searches = 0
+        self.candidates = 0
+        self.selected = 0
+        self.collapsed = 0
+
+    def effective_k(self, scores: List[float]) -> int:
+        """Number of leading candidates kept, from the score distribution alone."""
+        if not scores:
+            return 0
+        top_score = scores[0]
+        if top_score <= 0:
+            return min(len(scores), self.min_k)
+        k = 1
+        while k < min(len(scores), self.max_k):
+            if k >= self.min_k and (
+                scores[k] < top_score * self.min_score_ratio
+                or scores[k - 1] - scores[k] > top_score * self.max_score_gap
+            ):
+                break
+            k += 1
+        return k
+
+    def collapse_spans(self, chunks: List[Dict]) -> List[Dict]:
+        """Merges the chunks overlapping or touching an earlier (better ranked) span."""
+        spans: List[Dict] = []
+        for chunk in chunks:
+            for span in spans:
+                touches = chunk["start_time"] <= span["end_time"] and chunk["end_time"] >= span["start_time"]
+                merged_length = max(span["end_time"], chunk["end_time"]) - min(span["start_time"], chunk["start_time"])
+                if touches and merged_length <= context_packer.MAX_MERGED_SPAN_MINUTES:
+                    if chunk["text"] not in span["text"]:
+                        if chunk["start_time"] < span["start_time"]:
+                            span["text"] = f"{chunk['text']} {span['text']}"
+                        else:
+                            span["text"] = f"{span['text']} {chunk['text']}"
+                    span["start_time"] = min(span["start_time"], chunk["start_time"])
+                    span["end_time"] = max(span["end_time"], chunk["end_time"])
+                    self.collapsed += 1
+                    break
+            else:
+                spans.append(dict(chunk))
+        return spans
+
+    def cut(self, hits: List[Dict]) -> List[Dict]:
+        """Formats the hits worth keeping of one search, best first."""
+        hits = sorted(hits, key=lambda hit: hit.get("_score", 0.0), reverse=True)
+        k = self.effective_k([hit.get("_score", 0.0) for hit in hits])
+        return [format_hit(hit) for hit in hits[:k]]
+
+    def select(
+        self,
+        hit_lists: Sequence[List[Dict]],
+        model_name: str,
+        lexical_lists: Sequence[List[Dict]] = (),
+    ) -> List[Dict]:
+        """Returns the chunks to use, in relevance order, from the vector db hits and lexical matches."""
+        rankings = [self.cut(hits) for hits in hit_lists]
+        rankings += [chunks for chunks in lexical_lists if chunks]
+        if len(rankings) == 1:
+            chunks = rankings[0]
+        else:
+            chunks = reciprocal_rank_fusion(rankings)
+        spans = self.collapse_spans(chunks)
+
+        budget = context_packer.budget_for(model_name)
+        selected: List[Dict] = []
+        used_tokens = 0
+        for span in spans:
+            span_tokens = count_chunk_tokens(span["text"])
+            if selected and used_tokens + span_tokens > budget:
+                break
+            selected.append(span)
+            used_tokens += span_tokens
+
+        self.searches += 1
+        self.candidates += sum(len(hits) for hits in hit_lists) + sum(len(chunks) for chunks in lexical_lists)
+        self.selected += len(selected)
+        return selected
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "searches": self.searches,
+            "avg_candidates": round(self.candidates / self.searches, 2) if self.searches else 0.0,
+            "avg_selected": round(self.selected / self.searches, 2) if self.searches else 0.0,
+            "collapsed_chunks": self.collapsed,
+        }
+
+
+adaptive_top_k = AdaptiveTopK(
+    candidate_k=CONFIG.RETRIEVAL_CANDIDATE_K,
+    min_k=CONFIG.RETRIEVAL_MIN_K,
+    max_k=CONFIG.RETRIEVAL_MAX_K,
+    min_score_ratio=CONFIG.RETRIEVAL_MIN_SCORE_RATIO,
+    max_score_gap=CONFIG.RETRIEVAL_MAX_SCORE_GAP,
+)
@@ -0,0 +1,197 @@
+import re
+from typing import Optional, Dict, Any
+
+from loguru import logger
+
+from src.config import CONFIG
+
+
+# "minute 5 to 10", "from 5 to 10 min", "between 10 and 15 minutes", "5:30 - 10:00"
+_TIMESTAMP = r"(\d{1,2}:\d{2}(?::\d{2})?)"
+_NUMBER = r"(\d{1,3})"
+_MINUTE_WORD = r"(?:minutes?|mins?|m)\b"
+# Not inside a word, version or negative number ("GPT-4 and 5 minute rule")
+_NUMBER_START = r"(?<![\w.-])"
+
+# The anchor group is set when the range is anchored on both ends ("from 5 to 10 minutes",
+# "5 min to 10 min"), a bare "1 and 2 minutes" might be anything ("steps 1 and 2 minutes")
+TIME_RANGE_PATTERNS = [
+    re.compile(
+        rf"\b(?P<anchor>minutes?|mins?)\s*{_NUMBER}\s*(?:-|to|and|until|till|through)\s*(?:minutes?\s*|mins?\s*)?{_NUMBER}\b",
+        re.IGNORECASE,
+    ),
+    re.compile(
+        rf"(?:\b(?P<anchor>from|between|at)\s+)?{_NUMBER_START}{_NUMBER}\s*(?P<unit>{_MINUTE_WORD})?\s*"
+        rf"(?:-|to|and|until|till|through)\s*{_NUMBER}\s*{_MINUTE_WORD}",
+        re.IGNORECASE,
+    ),
+    # Timestamps are unambiguous, the empty anchor always matches
+    re.compile(
+        rf"(?P<anchor>){_TIMESTAMP}\s*(?:-|to|and|until|till|through)\s*{_TIMESTAMP}",
+        re.IGNORECASE,
+    ),
+]
+# Confidence of a range anchored on one end only, under the router threshold so the LLM decides
+UNANCHORED_RANGE_CONFIDENCE = 0.6
+
+FIRST_N_MINUTES_PATTERN = re.compile(
+    rf"\b(?:first|opening|initial)\s+{_NUMBER}\s*{_MINUTE_WORD}", re.IGNORECASE
+)
+
+SINGLE_MINUTE_PATTERNS = [
+    re.compile(rf"\b(?:at|around|near)\s+(?:minute\s+){_NUMBER}\s*(?:{_MINUTE_WORD})?", re.IGNORECASE),
+    re.compile(rf"\b(?:at|around|near)\s+{_NUMBER}\s*{_MINUTE_WORD}", re.IGNORECASE),
+    re.compile(rf"\b(?:at|around|near)\s+{_TIMESTAMP}", re.IGNORECASE),
+]
+
+# Time words we cannot resolve locally ("last 5 minutes", "near the end") go to the LLM
+UNRESOLVED_TIME_PATTERN = re.compile(
+    r"\b(minutes?|mins?|\d+\s*(seconds?|secs?|hours?|hrs?)|timestamps?|\d{1,2}:\d{2}|"
+    r"beginning|towards? the end|at the end|in the end|last part|ending|halfway|middle)\b",
+    re.IGNORECASE,
+)
+
+# Explicit references to the previous dialogue
+FOLLOW_UP_PATTERN = re.compile(
+    r"\b(you (just )?(said|mentioned|told|explained|wrote)|your (last|previous|earlier) (answer|response|reply)|"
+    r"previous (answer|response|question|reply)|earlier (answer|response|question)|"
+    r"(tell|explain|say) (me )?more|(elaborate|expand) on (that|this|it)|"
+    r"as (you|i) (said|asked)|the (above|last) (answer|point|one)|rephrase|simplify (that|it|this))\b",
+    re.IGNORECASE,
+)
+
+# Bare continuation requests are only follow-ups as the whole query ("continue", "go on please")
+# or in a short one ("can you elaborate?"), "How do I continue learning after this course?" isn't
+CONTINUATION_PATTERN = re.compile(
+    r"^\s*(please\s+)?(continue|go on|keep going|elaborate|expand|more)"
+    r"(\s+(on\s+)?(that|this|it))?(\s+please)?\s*[.!?]*\s*$",
+    re.IGNORECASE,
+)
+CONTINUATION_VERB_PATTERN = re.compile(r"\b(continue|go on|keep going|elaborate|expand)\b", re.IGNORECASE)
+
+# Short queries that open with a connective or a dangling pronoun ("and why?", "what about him?")
+FOLLOW_UP_OPENER_PATTERN = re.compile(
+    r"^\s*(and|but|so|also|then|what about|how about|"
+    r"it|that|those|these|they|them|he|she|him|her)\b(?!\s+(video|videos|youtuber|speaker|channel))",
+    re.IGNORECASE,
+)
+
+SHORT_QUERY_WORDS = 6
+
+
+def _timestamp_to_minutes(timestamp: str, round_up: bool = False) -> int:
+    """Converts "mm:ss" or "hh:mm:ss" into whole minutes."""
+    parts = [int(part) for part in timestamp.split(":")]
+    if len(parts) == 3:
+        hours, minutes, seconds = parts
+        minutes += hours * 60
+    else:
+        minutes, seconds = parts
+    if round_up and seconds:
+        minutes += 1
+    return minutes
+
+
+def _to_minutes(value: str, round_up: bool = False) -> int:
+    if ":" in value:
+        return _timestamp_to_minutes(value, round_up=round_up)
+    return int(value)
+
+
+class HeuristicRouter:
+    """
+    Deterministic, regex based router that fills the DecisionState without an LLM call.
+
+    It only answers when it is confident, otherwise `route` returns None and the caller
+    is expected to fall back to the LLM decision maker.
+    """
+
+    def __init__(self, confidence_threshold: float = 0.8):
+        self.confidence_threshold = confidence_threshold
+        self.local_decisions = 0
+        self.llm_fallbacks = 0
+
+    def extract_time_range(self, query: str) -> tuple[Optional[int], Optional[int], float]:
+        """Returns (start_time, end_time, confidence) in minutes for the time range in the query."""
+        for pattern in TIME_RANGE_PATTERNS:
+            match = pattern.search(query)
+            if match:
+                start, end = [group for group in match.groups() if group and group[0].isdigit()]
+                start_time = _to_minutes(start)
+                end_time = _to_minutes(end, round_up=True)
+                if start_time > end_time:
+                    return None, None, 0.0
+                is_anchored = match.group("anchor") is not None or match.groupdict().get("unit") is not None
+                return start_time, end_time, 1.0 if is_anchored else UNANCHORED_RANGE_CONFIDENCE
+
+        match = FIRST_N_MINUTES_PATTERN.search(query)
+        if match:
+            return 0, int(match.group(1)), 1.0
+
+        for pattern in SINGLE_MINUTE_PATTERNS:
+            match = pattern.search(query)
+            if match:
+                minute = _to_minutes(match.group(1))
+                return minute, minute + 1, 0.9
+
+        if UNRESOLVED_TIME_PATTERN.search(query):
+            # Mentions time but in a way we can't parse, let the LLM decide
+            return None, None, 0.0
+
+        return None, None, 1.0
+
+    def detect_follow_up(self, query: str) -> tuple[bool, float]:
+        """Returns (requires_previous_conversations, confidence)."""
+        if FOLLOW_UP_PATTERN.search(query) or CONTINUATION_PATTERN.search(query):
+            return True, 1.0
+
+        is_short = len(query.split()) <= SHORT_QUERY_WORDS
+        if CONTINUATION_VERB_PATTERN.search(query) and is_short:
+            return True, 0.9
+
+        if FOLLOW_UP_OPENER_PATTERN.search(query):
+            if is_short:
+                return True, 0.9
+            # A long query starting with a pronoun could go either way
+            return False, 0.5
+
+        if len(query.split()) <= 2:
+            # "why?", "really?" and the like are ambiguous without the dialogue
+            return False, 0.5
+
+        return False, 1.0
+
+    def classify(self, query: str) -> tuple[Dict[str, Any], float]:
+        """Returns the decision dict and the confidence of the decision."""
+        start_time, end_time, time_confidence = self.extract_time_range(query)
+        requires_previous_conversations, follow_up_confidence = self.detect_follow_up(query)
+        decision = {
+            "requires_previous_conversations": requires_previous_conversations,
+            "start_time": start_time,
+            "end_time": end_time,
+            "user_query": query,
+        }
+        return decision, min(time_confidence, follow_up_confidence)
+
+    def route(self, query: str) -> Optional[Dict[str, Any]]:
+        """Returns the decision dict if confident enough, None if the LLM should decide."""
+        decision, confidence = self.classify(query)
+        if confidence >= self.confidence_threshold:
+            self.local_decisions += 1
+            logger.debug(f"[HEURISTIC ROUTER] local decision ({confidence}) {decision}")
+            return decision
+
+        self.llm_fallbacks += 1
+        logger.debug(f"[HEURISTIC ROUTER] low confidence ({confidence}), falling back to llm")
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.local_decisions + self.llm_fallbacks
+        return {
+            "local_decisions": self.local_decisions,
+            "llm_fallbacks": self.llm_fallbacks,
+            "local_ratio": round(self.local_decisions / total, 4) if total else 0.0,
+        }
+
+
+heuristic_router = HeuristicRouter(confidence_threshold=CONFIG.ROUTER_CONFIDENCE_THRESHOLD)
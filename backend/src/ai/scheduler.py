@@ -0,0 +1,209 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Dict, Tuple, Optional, Deque, Any
+
+from loguru import logger
+
+from src.app_responses import AppError
+from .exceptions import LLMRateLimitedError
+
+SYSTEM_USER = "__system__"
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously up to `capacity` per minute."""
+
+    def __init__(self, capacity_per_minute: int):
+        self.capacity = float(capacity_per_minute)
+        self.refill_per_second = capacity_per_minute / 60
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken, 0 if it can be taken right away."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_per_second
+
+    def take(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+
+@dataclass(eq=False)
+class _Waiter:
+    estimated_tokens: int
+    deadline: float
+    enqueued_at: float
+    future: asyncio.Future = field(default_factory=lambda: asyncio.get_running_loop().create_future())
+
+
+class _ModelQueue:
+    """Waiters of one model, one FIFO per user served round robin."""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.users: OrderedDict[str, Deque[_Waiter]] = OrderedDict()
+        self.wakeup = asyncio.Event()
+        self.dispatcher: Optional[asyncio.Task] = None
+
+        self.granted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    @property
+    def depth(self) -> int:
+        return sum(len(waiters) for waiters in self.users.values())
+
+
+class LLMScheduler:
+    """
+    Admission control in front of every LLM call.
+
+    Each model gets a requests-per-minute and a tokens-per-minute bucket, calls are charged
+    their estimated tokens. Calls that can't be admitted right away wait in a bounded queue
+    with a deadline. The queue keeps one FIFO per user and serves users round robin, so a
+    single heavy user can't starve the others.
+    """
+
+    def __init__(
+        self,
+        limits: Dict[str, Tuple[int, int]],
+        default_limits: Tuple[int, int],
+        max_queue_size: int = 100,
+        queue_timeout_seconds: float = 20.0,
+    ):
+        self.limits = limits
+        self.default_limits = default_limits
+        self.max_queue_size = max_queue_size
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self._queues: Dict[str, _ModelQueue] = {}
+
+    def _queue_for(self, model_name: str) -> _ModelQueue:
+        queue = self._queues.get(model_name)
+        if queue is None:
+            requests_per_minute, tokens_per_minute = self.limits.get(model_name, self.default_limits)
+            queue = _ModelQueue(requests_per_minute, tokens_per_minute)
+            self._queues[model_name] = queue
+        if queue.dispatcher is None or queue.dispatcher.done():
+            queue.dispatcher = asyncio.create_task(self._dispatch(model_name, queue))
+        return queue
+
+    async def acquire(self, model_name: str, estimated_tokens: int, user_id: Optional[str] = None):
+        """
+        Waits until the call may be sent to the provider.
+
+        Raises AppError(LLMRateLimitedError) when the queue is full or the deadline passes.
+        """
+        queue = self._queue_for(model_name)
+        if queue.depth >= self.max_queue_size:
+            queue.rejected += 1
+            raise AppError(LLMRateLimitedError[None]())
+
+        now = time.monotonic()
+        waiter = _Waiter(
+            estimated_tokens=estimated_tokens,
+            deadline=now + self.queue_timeout_seconds,
+            enqueued_at=now,
+        )
+        queue.users.setdefault(user_id or SYSTEM_USER, deque()).append(waiter)
+        queue.wakeup.set()
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            self._remove(queue, waiter)
+            raise
+
+    def _remove(self, queue: _ModelQueue, waiter: _Waiter):
+        for user_id, waiters in list(queue.users.items()):
+            if waiter in waiters:
+                waiters.remove(waiter)
+                if not waiters:
+                    del queue.users[user_id]
+                return
+
+    def _expire(self, queue: _ModelQueue, now: float):
+        for user_id, waiters in list(queue.users.items()):
+            for waiter in [waiter for waiter in waiters if waiter.deadline <= now]:
+                waiters.remove(waiter)
+                queue.timed_out += 1
+                if not waiter.future.done():
+                    waiter.future.set_exception(AppError(LLMRateLimitedError[None]()))
+            if not waiters:
+                del queue.users[user_id]
+
+    async def _dispatch(self, model_name: str, queue: _ModelQueue):
+        while True:
+            now = time.monotonic()
+            self._expire(queue, now)
+            if not queue.users:
+                queue.wakeup.clear()
+                await queue.wakeup.wait()
+                continue
+
+            # Round robin, the user at the front gets one grant then goes to the back
+            user_id, waiters = next(iter(queue.users.items()))
+            waiter = waiters[0]
+            wait_seconds = max(
+                queue.request_bucket.wait_time(1, now),
+                queue.token_bucket.wait_time(waiter.estimated_tokens, now),
+            )
+            if wait_seconds > 0:
+                nearest_deadline = min(
+                    waiter.deadline for waiters in queue.users.values() for waiter in waiters
+                )
+                queue.wakeup.clear()
+                try:
+                    await asyncio.wait_for(
+                        queue.wakeup.wait(), timeout=max(min(wait_seconds, nearest_deadline - now), 0.001)
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            queue.request_bucket.take(1)
+            queue.token_bucket.take(waiter.estimated_tokens)
+            waiters.popleft()
+            if waiters:
+                queue.users.move_to_end(user_id)
+            else:
+                del queue.users[user_id]
+
+            waited = now - waiter.enqueued_at
+            queue.granted += 1
+            queue.total_wait_seconds += waited
+            queue.max_wait_seconds = max(queue.max_wait_seconds, waited)
+            if waited > 1:
+                logger.info(f"[LLM SCHEDULER] {model_name} call admitted after {waited:.2f}s")
+            if not waiter.future.done():
+                waiter.future.set_result(None)
+
+    async def aclose(self):
+        for queue in self._queues.values():
+            if queue.dispatcher is not None:
+                queue.dispatcher.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            model_name: {
+                "queue_depth": queue.depth,
+                "waiting_users": len(queue.users),
+                "granted": queue.granted,
+                "rejected": queue.rejected,
+                "timed_out": queue.timed_out,
+                "avg_wait_ms": round(queue.total_wait_seconds / queue.granted * 1000, 2) if queue.granted else 0.0,
+                "max_wait_ms": round(queue.max_wait_seconds * 1000, 2),
+            }
+            for model_name, queue in self._queues.items()
+        }
@@ -0,0 +1,129 @@
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Tuple
+
+import numpy as np
+
+from .prompts import PROMPT_VERSION
+
+# (video_id, model_name, PROMPT_VERSION), answers of another model or prompt aren't reused
+BucketKey = Tuple[str, str, str]
+
+
+class _VideoAnswers:
+    """
+    Ring of normalized query embeddings and their answers for one video.
+
+    The matrix starts at `initial_rows` and doubles as answers come in, up to `capacity`,
+    then the oldest answer is overwritten first.
+    """
+
+    def __init__(self, capacity: int, dimension: int, initial_rows: int = 8):
+        self.capacity = capacity
+        self.embeddings = np.zeros((min(initial_rows, capacity), dimension), dtype=np.float32)
+        self.answers: List[Optional[str]] = [None] * self.embeddings.shape[0]
+        self.size = 0
+        self.next_slot = 0
+
+    def _grow(self):
+        rows = min(self.embeddings.shape[0] * 2, self.capacity)
+        embeddings = np.zeros((rows, self.embeddings.shape[1]), dtype=np.float32)
+        embeddings[: self.size] = self.embeddings[: self.size]
+        self.embeddings = embeddings
+        self.answers.extend([None] * (rows - len(self.answers)))
+
+    def add(self, embedding: np.ndarray, answer: str):
+        if self.next_slot == self.embeddings.shape[0] and self.size < self.capacity:
+            self._grow()
+        self.next_slot %= self.embeddings.shape[0]
+        self.embeddings[self.next_slot] = embedding
+        self.answers[self.next_slot] = answer
+        self.next_slot += 1
+        self.size = min(self.size + 1, self.capacity)
+
+    def best_match(self, embedding: np.ndarray) -> tuple[float, Optional[str]]:
+        if self.size == 0:
+            return 0.0, None
+        # Rows are normalized, so the dot product is the cosine similarity
+        scores = self.embeddings[: self.size] @ embedding
+        best = int(np.argmax(scores))
+        return float(scores[best]), self.answers[best]
+
+
+class SemanticAnswerCache:
+    """
+    Serves stored answers for paraphrased questions about the same video.
+
+    Every answered query's embedding is kept per (video_id, model, prompt version), a lookup
+    is a single vectorized cosine scan over that bucket's embeddings. Each bucket keeps at
+    most `max_entries_per_video` answers, the oldest one is overwritten first, and at most
+    `max_videos` buckets are kept, the least recently used one is dropped first.
+
+    Paraphrases of time range questions ("minute 1 to 2" vs "minute 3 to 4") embed almost
+    identically, callers must not use this cache for them.
+    """
+
+    def __init__(
+        self, similarity_threshold: float = 0.92, max_entries_per_video: int = 256, max_videos: int = 256
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries_per_video = max_entries_per_video
+        self.max_videos = max_videos
+        self._videos: OrderedDict[BucketKey, _VideoAnswers] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(embedding: List[float] | np.ndarray) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+        return vector / norm
+
+    def get(self, video_id: str, model_name: str, embedding: List[float] | np.ndarray) -> Optional[str]:
+        key = (video_id, model_name, PROMPT_VERSION)
+        video_answers = self._videos.get(key)
+        vector = self._normalize(embedding)
+        if video_answers is None or vector is None or vector.shape[0] != video_answers.embeddings.shape[1]:
+            self.misses += 1
+            return None
+        self._videos.move_to_end(key)
+
+        score, answer = video_answers.best_match(vector)
+        if answer is None or score < self.similarity_threshold:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return answer
+
+    def set(self, video_id: str, model_name: str, embedding: List[float] | np.ndarray, answer: str):
+        vector = self._normalize(embedding)
+        if vector is None:
+            return
+        key = (video_id, model_name, PROMPT_VERSION)
+        video_answers = self._videos.get(key)
+        if video_answers is None or vector.shape[0] != video_answers.embeddings.shape[1]:
+            video_answers = _VideoAnswers(self.max_entries_per_video, vector.shape[0])
+            self._videos[key] = video_answers
+        self._videos.move_to_end(key)
+        while len(self._videos) > self.max_videos:
+            self._videos.popitem(last=False)
+        video_answers.add(vector, answer)
+
+    def invalidate_video(self, video_id: str):
+        for key in [key for key in self._videos if key[0] == video_id]:
+            del self._videos[key]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "videos": len({key[0] for key in self._videos}),
+            "buckets": len(self._videos),
+            "entries": sum(video.size for video in self._videos.values()),
+            "memory_bytes": sum(video.embeddings.nbytes for video in self._videos.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,121 @@
+import asyncio
+import time
+from contextlib import suppress
+from typing import Optional, Dict, Any, AsyncIterator, Tuple
+
+
+class TokenCoalescer:
+    """
+    Buffers streamed tokens so an answer goes out in a few frames instead of one per token.
+
+    The first token is released immediately to keep time to first token, after that the
+    buffer is released once `window_ms` passed since the last release or it holds
+    `max_chars` characters. A window of 0 disables coalescing.
+    """
+
+    def __init__(self, window_ms: int = 30, max_chars: int = 512):
+        self.window_seconds = window_ms / 1000
+        self.max_chars = max_chars
+        self._parts: list[str] = []
+        self._buffered_chars = 0
+        self._last_release: Optional[float] = None
+
+    def push(self, token: str) -> Optional[str]:
+        """Adds the token, returns the text to send now or None if it stays buffered."""
+        self._parts.append(token)
+        self._buffered_chars += len(token)
+
+        now = time.perf_counter()
+        if (
+            self._last_release is None
+            or now - self._last_release >= self.window_seconds
+            or self._buffered_chars >= self.max_chars
+        ):
+            return self.flush(now)
+        return None
+
+    def seconds_until_release(self) -> Optional[float]:
+        """Seconds until the buffered text is due, None when nothing is buffered."""
+        if not self._parts:
+            return None
+        if self._last_release is None:
+            return 0.0
+        return max(self._last_release + self.window_seconds - time.perf_counter(), 0.0)
+
+    def flush(self, now: Optional[float] = None) -> Optional[str]:
+        """Returns everything buffered, None if the buffer is empty."""
+        if not self._parts:
+            return None
+        text = "".join(self._parts)
+        self._parts.clear()
+        self._buffered_chars = 0
+        self._last_release = now if now is not None else time.perf_counter()
+        return text
+
+
+async def with_release_deadlines(
+    stream: AsyncIterator[Tuple[str, Any]], coalescer: TokenCoalescer
+) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Yields the (event_type, data) events of the stream, plus ("flush", None) whenever the
+    coalescer's buffered text falls due before the next event arrives. Without it the tail
+    of a burst would wait for the next token, however long the model stalls.
+    """
+    iterator = stream.__aiter__()
+    next_event: Optional[asyncio.Future] = None
+    try:
+        while True:
+            if next_event is None:
+                next_event = asyncio.ensure_future(iterator.__anext__())
+            done, _ = await asyncio.wait({next_event}, timeout=coalescer.seconds_until_release())
+            if not done:
+                yield "flush", None
+                continue
+            finished, next_event = next_event, None
+            try:
+                event = finished.result()
+            except StopAsyncIteration:
+                return
+            yield event
+    finally:
+        if next_event is not None:
+            # The stream can only be closed once its pending step is cancelled
+            next_event.cancel()
+            with suppress(asyncio.CancelledError, StopAsyncIteration):
+                await next_event
+
+
+class StreamMetrics:
+    """
+    Counts streamed answers and the tokens saved by cancelling abandoned ones.
+
+    The length an abandoned answer would have reached is unknown, so the saving is
+    estimated from the average length of the answers that completed.
+    """
+
+    def __init__(self):
+        self.completed_streams = 0
+        self.completed_tokens = 0
+        self.cancelled_streams = 0
+        self.tokens_streamed_before_cancel = 0
+        self.estimated_tokens_saved = 0
+
+    def record_completed(self, streamed_tokens: int):
+        self.completed_streams += 1
+        self.completed_tokens += streamed_tokens
+
+    def record_cancelled(self, streamed_tokens: int):
+        self.cancelled_streams += 1
+        self.tokens_streamed_before_cancel += streamed_tokens
+        if self.completed_streams:
+            average_tokens = self.completed_tokens / self.completed_streams
+            self.estimated_tokens_saved += max(int(average_tokens) - streamed_tokens, 0)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "completed_streams": self.completed_streams,
+            "completed_tokens": self.completed_tokens,
+            "cancelled_streams": self.cancelled_streams,
+            "tokens_streamed_before_cancel": self.tokens_streamed_before_cancel,
+            "estimated_tokens_saved": self.estimated_tokens_saved,
+        }
@@ -0,0 +1,72 @@
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import List, Dict, Optional
+
+from src.ai.youtube.transcript_preprocessor import TranscriptChunk
+from src.ai.context_packer import count_chunk_tokens
+from src.ai.lexical_index import BM25Index
+
+
+class VideoTranscript:
+    """
+    Chunks of one video sorted by time, with the boundaries kept in plain lists for bisect.
+
+    The preprocessor emits back to back chunks, so both start and end times are sorted
+    and a time range lookup is two binary searches.
+    """
+
+    def __init__(self, chunks: List[TranscriptChunk]):
+        ordered_chunks = sorted(chunks, key=lambda chunk: chunk.start_time)
+        self.chunks: List[Dict] = [
+            {"start_time": chunk.start_time, "end_time": chunk.end_time, "text": chunk.text}
+            for chunk in ordered_chunks
+        ]
+        self.start_times: List[float] = [chunk["start_time"] for chunk in self.chunks]
+        self.end_times: List[float] = [chunk["end_time"] for chunk in self.chunks]
+        # Counted once at ingest like pack_context charges it, so the whole transcript check is free
+        self.token_count: int = sum(count_chunk_tokens(chunk["text"]) for chunk in self.chunks)
+        self.lexical_index = BM25Index([chunk["text"] for chunk in self.chunks])
+
+    def covering(self, start_time: Optional[float], end_time: Optional[float]) -> List[Dict]:
+        """Returns the chunks overlapping the [start_time, end_time) minute range."""
+        first = 0 if start_time is None else bisect_left(self.end_times, start_time)
+        if end_time is None:
+            last = len(self.chunks)
+        elif start_time is not None and end_time <= start_time:
+            # A single minute, keep the chunk starting at it
+            last = bisect_right(self.start_times, end_time)
+        else:
+            last = bisect_left(self.start_times, end_time)
+        return self.chunks[first:last]
+
+    def lexical_search(self, query: str, k: int) -> List[Dict]:
+        """Returns the k best BM25 matches of the query, best first."""
+        return [self.chunks[doc_id] for doc_id, _ in self.lexical_index.search(query, k)]
+
+
+class TranscriptStore:
+    """
+    In-process store of the transcripts ingested by this worker, keyed by video_id.
+
+    Holds at most `max_videos` videos, the least recently used one is dropped first.
+    A miss only means the video was ingested elsewhere, callers fall back to the vector db.
+    """
+
+    def __init__(self, max_videos: int = 512):
+        self.max_videos = max_videos
+        self._videos: OrderedDict[str, VideoTranscript] = OrderedDict()
+
+    def put(self, video_id: str, chunks: List[TranscriptChunk]):
+        self._videos[video_id] = VideoTranscript(chunks)
+        self._videos.move_to_end(video_id)
+        while len(self._videos) > self.max_videos:
+            self._videos.popitem(last=False)
+
+    def get(self, video_id: str) -> Optional[VideoTranscript]:
+        video_transcript = self._videos.get(video_id)
+        if video_transcript is not None:
+            self._videos.move_to_end(video_id)
+        return video_transcript
+
+    def remove(self, video_id: str):
+        self._videos.pop(video_id, None)
@@ -0,0 +1,86 @@
+from typing import Protocol, List, Dict, Callable, TypedDict, runtime_checkable
+
+from src.ai.youtube.transcript_preprocessor import TranscriptChunk
+from src.config import CONFIG
+
+
+# Every video is embedded and stored once, whoever loaded it. Which users may search a
+# video is recorded in Postgres (VideoAccess) and checked before the agent runs.
+SHARED_NAMESPACE = "videos"
+
+
+class VideoRecords(TypedDict):
+    video_id: str
+    records: List[TranscriptChunk]
+
+
+@runtime_checkable
+class VectorStore(Protocol):
+    """
+    What the agent needs from a vector database.
+
+    Records live in SHARED_NAMESPACE and carry video_id, start_time, end_time and text.
+    Searches return hits shaped like Pinecone's: {"_id", "_score", "fields": {text, start_time,
+    end_time}}, best first, so callers don't care which backend answered.
+    """
+
+    def add_delete_listener(self, listener: Callable[[str], None]):
+        """Registers a callback run with the video_id after a video transcript is deleted."""
+        ...
+
+    async def embed_query(self, query: str) -> List[float]:
+        """Embeds the query with the same model the stored chunks were embedded with."""
+        ...
+
+    async def upsert_records_into_vdb(self, video_records_data: VideoRecords) -> bool:
+        ...
+
+    async def retrieve_context(self, query: str, video_id: str, k: int = 4) -> List[Dict]:
+        ...
+
+    async def retrieve_context_with_time_filter(
+        self,
+        query: str,
+        video_id: str,
+        start_time: int,
+        end_time: int,
+        k: int = 4,
+    ) -> List[Dict]:
+        """Like retrieve_context, only over chunks within [start_time, end_time] minutes."""
+        ...
+
+    async def fetch_video_chunks(self, video_id: str) -> List[Dict]:
+        """
+        Every stored chunk of the video as {id, text, start_time, end_time}, without a search.
+
+        Rebuilds the transcript store of a worker that didn't ingest the video.
+        """
+        ...
+
+    async def delete_video_transcript(self, video_url_or_id) -> bool:
+        """Deletes the video for everyone, only once no user has access to it anymore."""
+        ...
+
+    async def check_for_transcript(self, video_url_or_id) -> bool:
+        """Asks the vector db itself, requests check the ingestion registry in Postgres instead."""
+        ...
+
+    async def delete_legacy_namespaces(self) -> List[str]:
+        """
+        Deletes every namespace but SHARED_NAMESPACE, left over from when each user had their own.
+
+        Returns the deleted namespaces. Run once by src.ai.cleanup_legacy_namespaces.
+        """
+        ...
+
+
+async def init_vector_store() -> VectorStore:
+    """Creates the backend selected by CONFIG.VECTOR_STORE_BACKEND."""
+    if CONFIG.VECTOR_STORE_BACKEND == "local":
+        from src.ai.local_vector_db.local_store import init_local_vector_db
+
+        return await init_local_vector_db()
+
+    from src.ai.pinecone_vector_db.youtube_chunks import init_pinecone_db
+
+    return await init_pinecone_db()
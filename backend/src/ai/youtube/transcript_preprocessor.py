@@ -25,6 +25,8 @@ class TranscriptPreprocessor:
             
         Returns:
             List of TranscriptChunk objects with grouped text and time ranges.
+            Ids are derived from the video id and position, so loading a video
+            again overwrites its records instead of duplicating them.
         """
         if not transcript:
             return []
@@ -38,6 +40,7 @@ class TranscriptPreprocessor:
             if item.offset >= current_chunk_start + interval_seconds:
                 if current_text_parts:
                     chunks.append(TranscriptChunk(
+                        id=f"{video_id}-{len(chunks)}",
                         start_time=int(current_chunk_start / 60),
                         end_time=int(item.offset / 60),
                         text=" ".join(current_text_parts),
@@ -53,6 +56,7 @@ class TranscriptPreprocessor:
         if current_text_parts:
             last_item = transcript[-1]
             chunks.append(TranscriptChunk(
+                id=f"{video_id}-{len(chunks)}",
                 start_time=int(current_chunk_start / 60),
                 end_time=int((last_item.offset + last_item.duration) / 60),
                 text=" ".join(current_text_parts),
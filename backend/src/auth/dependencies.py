@@ -123,7 +123,7 @@ class RoleChecker:
     def __call__(self, user: Users = Depends(get_current_user)):
         if user.role not in self.allowed_roles:
             raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN, detail={"Method not allowed"}
+                status_code=status.HTTP_403_FORBIDDEN, detail="Method not allowed"
             )
 
 
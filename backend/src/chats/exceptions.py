@@ -18,4 +18,10 @@ class QADoesntExistError(ErrorResponse[T]):
     status_code: int = status.HTTP_404_NOT_FOUND
     error: str = "qas_doesnt_exist"
     message: str = "No data found for the provided chat id."
-    data: T | None = None
\ No newline at end of file
+    data: T | None = None
+
+class TooManyQuestionsError(ErrorResponse[T]):
+    status_code: int = status.HTTP_400_BAD_REQUEST
+    error: str = "too_many_questions"
+    message: str = "Too many questions in one batch."
+    data: T | None = None
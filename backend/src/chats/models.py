@@ -5,7 +5,7 @@ from jedi.inference.arguments import TreeArguments
 from typing import Optional, List, TYPE_CHECKING
 from uuid import UUID
 
-from sqlalchemy import ForeignKey, text, func, Index
+from sqlalchemy import ForeignKey, text, func, Index, Identity
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 import sqlalchemy.dialects.postgresql as pg
 
@@ -28,6 +28,12 @@ class Chats(Base):
     youtube_video_url: Mapped[str] = mapped_column(pg.VARCHAR(50), nullable=False)
     created_at: Mapped[Optional[str]] = mapped_column(pg.TIMESTAMP, server_default=func.now())
 
+    # Rolling summary of the turns older than the recent window sent with every prompt
+    conversation_summary: Mapped[Optional[str]] = mapped_column(pg.TEXT, nullable=True)
+    summarized_qa_count: Mapped[int] = mapped_column(
+        pg.INTEGER, server_default=text("0"), nullable=False
+    )
+
     user_uid: Mapped[UUID] = mapped_column(
         pg.UUID,
         ForeignKey("users.uuid", ondelete="CASCADE"),
@@ -59,6 +65,9 @@ class QuestionsAnswers(Base):
 
     query: Mapped[Optional[str]] = mapped_column(pg.TEXT)
     answer: Mapped[Optional[str]] = mapped_column(pg.TEXT)
+    created_at: Mapped[Optional[str]] = mapped_column(pg.TIMESTAMP, server_default=func.now())
+    # Insertion order, rows of one batched INSERT share created_at and the uuid is random
+    sequence_number: Mapped[int] = mapped_column(pg.BIGINT, Identity(), nullable=False)
 
     chat_uid: Mapped[Optional[UUID]] = mapped_column(
         pg.UUID,
@@ -68,8 +77,41 @@ class QuestionsAnswers(Base):
 
     __table_args__ = (
         Index("idx_chat_uid", "chat_uid"), 
+        Index("idx_chat_uid_sequence_number", "chat_uid", "sequence_number"),
     )
 
 
     chat: Mapped[Optional[Chats]] = relationship(back_populates="questions_answers")
-    
\ No newline at end of file
+    
+
+
+class VideoAccess(Base):
+    """Which users loaded which videos, the video itself is embedded and stored once."""
+
+    __tablename__ = "video_access"
+
+    user_uid: Mapped[UUID] = mapped_column(
+        pg.UUID,
+        ForeignKey("users.uuid", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    video_id: Mapped[str] = mapped_column(pg.VARCHAR(20), primary_key=True)
+    created_at: Mapped[Optional[str]] = mapped_column(pg.TIMESTAMP, server_default=func.now())
+
+    __table_args__ = (
+        # Garbage collection counts the users left on a video
+        Index("idx_video_access_video_id", "video_id"),
+    )
+
+
+class VideoIngestion(Base):
+    """Videos stored in the vector db, so checking for one needs no vector search."""
+
+    __tablename__ = "video_ingestions"
+
+    video_id: Mapped[str] = mapped_column(pg.VARCHAR(20), primary_key=True)
+    # "ingesting" while one request loads it (ingested_at is then the claim time), "ready" once stored
+    status: Mapped[str] = mapped_column(pg.VARCHAR(20), server_default=text("'ready'"), nullable=False)
+    # Unknown for the videos ingested before the registry existed
+    chunk_count: Mapped[Optional[int]] = mapped_column(pg.INTEGER, nullable=True)
+    ingested_at: Mapped[Optional[str]] = mapped_column(pg.TIMESTAMP, server_default=func.now())
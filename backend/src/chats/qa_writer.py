@@ -0,0 +1,86 @@
+import asyncio
+from typing import List, Dict, Optional
+
+from loguru import logger
+from sqlalchemy import insert
+
+from src.db.postgres_db import Session
+from .models import QuestionsAnswers
+
+
+class QAWriteBehindQueue:
+    """
+    Persists the (query, answer) pairs produced by the agent endpoint in the background.
+
+    Rows are buffered in memory and written every `flush_interval_seconds` with a single
+    multi-row INSERT, or earlier once `max_batch_size` rows are waiting. Started and stopped
+    in the app lifespan, stopping flushes whatever is still buffered.
+    """
+
+    def __init__(self, flush_interval_seconds: float = 0.5, max_batch_size: int = 200):
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_batch_size = max_batch_size
+        self._pending: List[Dict] = []
+        self._batch_ready = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        self.written_rows = 0
+        self.failed_rows = 0
+
+    def start(self):
+        self._flusher = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Not cancelled, a flush in progress has already taken its rows out of _pending
+        self._stopping = True
+        self._batch_ready.set()
+        if self._flusher is not None:
+            await self._flusher
+        await self.flush()
+
+    def enqueue(self, chat_uid: str, query: str, answer: str):
+        self._pending.append({"chat_uid": chat_uid, "query": query, "answer": answer})
+        if len(self._pending) >= self.max_batch_size:
+            self._batch_ready.set()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), timeout=self.flush_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+            await self.flush()
+
+    async def flush(self):
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        try:
+            async with Session() as session:
+                await session.execute(insert(QuestionsAnswers).values(rows))
+                await session.commit()
+            self.written_rows += len(rows)
+        except Exception as e:
+            # One bad row (e.g. its chat was deleted meanwhile) must not drop the whole batch
+            logger.warning(f"[QA WRITER] batch insert of {len(rows)} rows failed, retrying one by one: {e}")
+            await self._write_one_by_one(rows)
+
+    async def _write_one_by_one(self, rows: List[Dict]):
+        for row in rows:
+            try:
+                async with Session() as session:
+                    await session.execute(insert(QuestionsAnswers).values(row))
+                    await session.commit()
+                self.written_rows += 1
+            except Exception as e:
+                self.failed_rows += 1
+                logger.error(f"[QA WRITER] dropping QA of chat {row['chat_uid']}: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending_rows": len(self._pending),
+            "written_rows": self.written_rows,
+            "failed_rows": self.failed_rows,
+        }
@@ -10,15 +10,18 @@ from .schemas import (
     ResponseChatSchema,
     ResponseChatDataSchema,
     AgentQueryData,
+    AgentBatchQueryData,
 )
-from .services import chat_service
+from .exceptions import TooManyQuestionsError
+from .services import chat_service, video_access_service, ingestion_registry_service
 from src.db.postgres_db import get_session
 from src.auth.dependencies import AccessTokenBearer
 from typing import Dict, List
 from src.ai.exceptions import TranscriptDoesNotExistError, TranscriptAlreadyExistError
 from src.ai.agent import AgentContext, AgentState
 from src.app_responses import SuccessResponse, AppError
-from src.ai.chat_models import ChatModels
+from src.config import CONFIG
+from src.utils import get_video_id
 
 chats_router = APIRouter()
 
@@ -85,7 +88,7 @@ async def update_chat(
 
 @chats_router.delete(
     "/delete/{chat_uid}",
-    description="Deletes a chat from the database and the video related to it.",
+    description="Deletes a chat from the database, and the video related to it once no user has it loaded.",
 )
 async def delete_chat(
     request: Request,
@@ -95,14 +98,17 @@ async def delete_chat(
 ):
     user_id = decoded_token_data["sub"]
     youtube_video_url = await chat_service.get_video_url_by_chatid(chat_uid, session)
-    is_transcript_deleted = (
-        await request.app.state.components.vector_db.delete_video_transcript(
-            user_id, youtube_video_url
-        )
-    )
+    video_id = get_video_id(youtube_video_url)
+    is_unreferenced = await video_access_service.release_video(user_id, video_id, chat_uid, session)
+    # An "ingesting" video is being loaded right now, the load links its user once stored
+    if is_unreferenced and await ingestion_registry_service.get_status(video_id, session) != "ingesting":
+        # Last user gone, still under the video lock so nobody links it meanwhile
+        await ingestion_registry_service.remove(video_id, session)
+        await request.app.state.components.vector_db.delete_video_transcript(video_id)
+
+    # Commits the link removal together with the chat
     result = await chat_service.delete_chat(chat_uid, session)
-
-    if result and is_transcript_deleted:
+    if result:
         return True
 
 
@@ -167,26 +173,31 @@ async def get_all_current_chat_data(
 async def fetch_and_store_video(
     request: Request,
     video_id: str,
+    session: AsyncSession = Depends(get_session),
     decoded_token_data: Dict = Depends(AccessTokenBearer()),
 ) -> SuccessResponse[None]:
     user_id = decoded_token_data["sub"]
-    transcript_exists = (
-        await request.app.state.components.vector_db.check_for_transcript(
-            user_id, video_id
-        )
-    )
-    if transcript_exists:
-        return SuccessResponse[None](
-            message="Video already loaded previously.", status_code=200, data=None
-        )
-
-    data = {"user_id": user_id, "video_id": video_id}
-
-    await request.app.state.components.load_and_store_video(**data)
-
-    return SuccessResponse[None](
-        message="Video loaded successfully.", status_code=201, data=None
-    )
+    # The lock is only held to check and link, the ingestion itself runs without it. Loops
+    # again in the rare case the video was garbage collected between the two.
+    while True:
+        await video_access_service.lock_video(video_id, session)
+        if await video_access_service.has_access(user_id, video_id, session):
+            await session.commit()
+            return SuccessResponse[None](
+                message="Video already loaded previously.", status_code=200, data=None
+            )
+
+        # Videos loaded by another user are only linked, no transcript fetch or embedding
+        if await ingestion_registry_service.is_ingested(video_id, session):
+            await video_access_service.grant_access(user_id, video_id, session)
+            await session.commit()
+            return SuccessResponse[None](
+                message="Video loaded successfully.", status_code=201, data=None
+            )
+
+        await session.commit()
+        # Concurrent loads of one video wait here, across workers, and ingest it only once
+        await ingestion_registry_service.ensure_ingested(video_id, request.app.state.components, session)
 
 
 @chats_router.delete('/qa/delete/{chat_id}')
@@ -204,32 +215,52 @@ async def delete_qa(
     )
 
 
+def build_agent_context(request: Request, user_id: str, chat_id: str, video_id: str, model: str) -> Dict:
+    chat_models = request.app.state.chat_models
+    return {
+        "chat_model": chat_models.get(model),
+        "node_models": {
+            node: chat_models.get(model_name)
+            for node, model_name in CONFIG.NODE_MODELS.items()
+        },
+        "fallback_model": (
+            chat_models.get(CONFIG.HEDGE_FALLBACK_MODELS[model])
+            if model in CONFIG.HEDGE_FALLBACK_MODELS
+            else None
+        ),
+        "components": request.app.state.components,
+        "user_id": user_id,
+        "video_id": video_id,
+        "chat_id": chat_id,
+    }
+
+
 @chats_router.post("/agent/{chat_id}")
 async def get_response_from_llm(
     request: Request,
     chat_id: str,
     agent_query_data: AgentQueryData,
+    session: AsyncSession = Depends(get_session),
     decoded_token_data: Dict = Depends(AccessTokenBearer()),
 ):
     user_id = decoded_token_data["sub"]
     
     logger.info(f"The agent query data is {agent_query_data}")
 
-    # transcript_exists = (
-    #     await request.app.state.components.vector_db.check_for_transcript(
-    #         user_id, agent_query_data.video_id
-    #     )
-    # )
-    # if not transcript_exists:
-    #     raise AppError(TranscriptDoesNotExistError())
+    # History is loaded from and answers are written to this chat, it has to be the user's
+    await chat_service.get_user_chat(chat_id, user_id, session)
+    # The shared namespace holds every user's videos, search only the ones this user loaded
+    if not await video_access_service.has_access(user_id, agent_query_data.video_id, session):
+        raise AppError(TranscriptDoesNotExistError())
+    # Chats from before the shared namespace have no vectors in it yet, ingested on first use
+    if not await ingestion_registry_service.is_ingested(agent_query_data.video_id, session):
+        await ingestion_registry_service.ensure_ingested(
+            agent_query_data.video_id, request.app.state.components, session
+        )
 
-    context = {
-        "chat_model": ChatModels(agent_query_data.model),
-        "components": request.app.state.components,
-        "user_id": user_id,
-        "video_id": agent_query_data.video_id,
-        "chat_id": chat_id,
-    }
+    context = build_agent_context(
+        request, user_id=user_id, chat_id=chat_id, video_id=agent_query_data.video_id, model=agent_query_data.model
+    )
 
     input_state = {"user_query": agent_query_data.query, "conversation_history": []}
 
@@ -240,7 +271,11 @@ async def get_response_from_llm(
 
 
     return StreamingResponse(
-        request.app.state.agent.run_agent(input_state=input_state, context=context),
+        request.app.state.agent.run_agent(
+            input_state=input_state,
+            context=context,
+            is_disconnected=request.is_disconnected,
+        ),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -248,3 +283,47 @@ async def get_response_from_llm(
             "X-Accel-Buffering": "no",  # critical for nginx (later implementation)
         }
     )
+
+
+@chats_router.post(
+    "/agent/{chat_id}/batch",
+    description="Answers many standalone questions about one video, streamed back tagged by question index.",
+)
+async def get_batch_response_from_llm(
+    request: Request,
+    chat_id: str,
+    batch_query_data: AgentBatchQueryData,
+    session: AsyncSession = Depends(get_session),
+    decoded_token_data: Dict = Depends(AccessTokenBearer()),
+):
+    user_id = decoded_token_data["sub"]
+    if len(batch_query_data.questions) > CONFIG.BATCH_MAX_QUESTIONS:
+        raise AppError(TooManyQuestionsError())
+    await chat_service.get_user_chat(chat_id, user_id, session)
+    if not await video_access_service.has_access(user_id, batch_query_data.video_id, session):
+        raise AppError(TranscriptDoesNotExistError())
+    if not await ingestion_registry_service.is_ingested(batch_query_data.video_id, session):
+        await ingestion_registry_service.ensure_ingested(
+            batch_query_data.video_id, request.app.state.components, session
+        )
+
+    logger.info(f"[AGENT BATCH] {len(batch_query_data.questions)} questions on {batch_query_data.video_id}")
+    context = build_agent_context(
+        request, user_id=user_id, chat_id=chat_id, video_id=batch_query_data.video_id, model=batch_query_data.model
+    )
+
+    is_sse = batch_query_data.response_format == "sse"
+    return StreamingResponse(
+        request.app.state.agent.run_batch(
+            questions=batch_query_data.questions,
+            context=context,
+            response_format=batch_query_data.response_format,
+            is_disconnected=request.is_disconnected,
+        ),
+        media_type="text/event-stream" if is_sse else "application/x-ndjson",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        }
+    )
@@ -6,18 +6,28 @@ from datetime import datetime
 from .exceptions import InvalidYoutubeURLError
 
 
+AgentModelName = Literal[
+    "openai/gpt-oss-120b",
+    "openai/gpt-oss-20b",
+    "meta-llama/llama-4-scout-17b-16e-instruct",
+    "qwen/qwen3-32b",
+    "llama-3.1-8b-instant",
+    "llama-3.3-70b-versatile",
+    "moonshotai/kimi-k2-instruct-0905"
+]
+
+
 class AgentQueryData(BaseModel):
     query: str
     video_id: str
-    model: Literal[
-        "openai/gpt-oss-120b",
-        "openai/gpt-oss-20b",
-        "meta-llama/llama-4-scout-17b-16e-instruct",
-        "qwen/qwen3-32b",
-        "llama-3.1-8b-instant",
-        "llama-3.3-70b-versatile",
-        "moonshotai/kimi-k2-instruct-0905"
-    ] = "openai/gpt-oss-120b"
+    model: AgentModelName = "openai/gpt-oss-120b"
+
+
+class AgentBatchQueryData(BaseModel):
+    questions: List[str] = Field(min_length=1)
+    video_id: str
+    model: AgentModelName = "openai/gpt-oss-120b"
+    response_format: Literal["ndjson", "sse"] = "ndjson"
 
 
 class CreateChatSchema(BaseModel):
@@ -1,15 +1,23 @@
+import asyncio
+import time
+from datetime import timedelta
+
 from src.chats.schemas import CreateChatSchema
 from sqlalchemy.ext.asyncio.session import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, func, delete, update
+from sqlalchemy.dialects.postgresql import insert
 from fastapi import HTTPException, status
 
-from typing import Dict
+from typing import Dict, Optional
 
 from .exceptions import ChatNotFoundError
-from .models import Chats, QuestionsAnswers
+from .models import Chats, QuestionsAnswers, VideoAccess, VideoIngestion
 from src.auth.models import Users
 from src.chats.models import Chats
 from src.app_responses import AppError
+from src.ai.exceptions import VideoIngestionInProgressError
+from src.config import CONFIG
+from src.utils import get_video_id
 from .schemas import CreateChatSchema
 
 
@@ -26,6 +34,13 @@ class ChatServices:
         result = await session.execute(statement)
         return result.scalar_one_or_none()
 
+    async def get_user_chat(self, chat_uid: str, user_uid: str, session: AsyncSession) -> Chats:
+        """Returns the chat if it belongs to the user, another user's chat is reported as missing."""
+        chat = await self.get_chat_by_id(chat_uid, session)
+        if chat is None or str(chat.user_uid) != str(user_uid):
+            raise AppError(ChatNotFoundError[None]())
+        return chat
+
     async def delete_chat(self, chat_uid: str, session: AsyncSession):
         chat = await self.get_chat_by_id(chat_uid, session)
         if chat is None:
@@ -71,12 +86,64 @@ class ChatServices:
     async def get_all_qa(self, chat_uid: str, session: AsyncSession) -> list[QuestionsAnswers]:
         statement = select(QuestionsAnswers).where(
             QuestionsAnswers.chat_uid == chat_uid
-        )
+        ).order_by(QuestionsAnswers.sequence_number.asc())
         result = await session.execute(statement)
         questions_answers = result.scalars().all()
         return questions_answers
     
 
+    async def get_recent_qa(self, chat_uid: str, limit: int, session: AsyncSession) -> list[QuestionsAnswers]:
+        """Returns the latest `limit` QAs of the chat, oldest first."""
+        statement = (
+            select(QuestionsAnswers)
+            .where(QuestionsAnswers.chat_uid == chat_uid)
+            .order_by(QuestionsAnswers.sequence_number.desc())
+            .limit(limit)
+        )
+        result = await session.execute(statement)
+        return list(reversed(result.scalars().all()))
+
+    async def get_qa_slice(self, chat_uid: str, offset: int, limit: int, session: AsyncSession) -> list[QuestionsAnswers]:
+        """Returns `limit` QAs of the chat in chronological order starting at `offset`."""
+        statement = (
+            select(QuestionsAnswers)
+            .where(QuestionsAnswers.chat_uid == chat_uid)
+            .order_by(QuestionsAnswers.sequence_number.asc())
+            .offset(offset)
+            .limit(limit)
+        )
+        result = await session.execute(statement)
+        return result.scalars().all()
+
+    async def count_qa(self, chat_uid: str, session: AsyncSession) -> int:
+        statement = select(func.count()).select_from(QuestionsAnswers).where(
+            QuestionsAnswers.chat_uid == chat_uid
+        )
+        result = await session.execute(statement)
+        return result.scalar_one()
+
+    async def update_conversation_summary(
+        self,
+        chat_uid: str,
+        summary: str,
+        summarized_qa_count: int,
+        previous_summarized_qa_count: int,
+        session: AsyncSession,
+    ) -> bool:
+        """
+        Stores the summary unless summarized_qa_count moved since it was read as
+        `previous_summarized_qa_count` (another run stored its summary first, or the chat was
+        cleared). Returns whether it was stored.
+        """
+        statement = (
+            update(Chats)
+            .where(Chats.uuid == chat_uid, Chats.summarized_qa_count == previous_summarized_qa_count)
+            .values(conversation_summary=summary, summarized_qa_count=summarized_qa_count)
+        )
+        result = await session.execute(statement)
+        await session.commit()
+        return result.rowcount == 1
+
     async def  delete_all_qa_related_to_chat(self, chat_uid: str, session: AsyncSession):
         statement = select(QuestionsAnswers).where(
             QuestionsAnswers.chat_uid == chat_uid
@@ -85,6 +152,12 @@ class ChatServices:
         questions_answers = result.scalars().all()
         for qa in questions_answers:
             await session.delete(qa)
+
+        # The summary describes the deleted QAs, start over
+        chat = await self.get_chat_by_id(chat_uid, session)
+        if chat is not None:
+            chat.conversation_summary = None
+            chat.summarized_qa_count = 0
         await session.commit()
         return True
         
@@ -101,3 +174,148 @@ class ChatServices:
 
 
 chat_service = ChatServices()
+
+
+class VideoAccessServices:
+    """
+    Links between users and the videos they loaded, the vectors are stored once per video.
+
+    Loading and releasing a video first take `lock_video`, a transaction level advisory lock,
+    so a video garbage collected by one worker can't be linked to a user by another meanwhile.
+    """
+
+    async def lock_video(self, video_id: str, session: AsyncSession):
+        """Held until the session commits or rolls back."""
+        await session.execute(select(func.pg_advisory_xact_lock(func.hashtext(video_id))))
+
+    async def has_access(self, user_uid: str, video_id: str, session: AsyncSession) -> bool:
+        statement = select(VideoAccess.video_id).where(
+            VideoAccess.user_uid == user_uid, VideoAccess.video_id == video_id
+        )
+        result = await session.execute(statement)
+        return result.scalar_one_or_none() is not None
+
+    async def grant_access(self, user_uid: str, video_id: str, session: AsyncSession):
+        statement = insert(VideoAccess).values(user_uid=user_uid, video_id=video_id).on_conflict_do_nothing()
+        await session.execute(statement)
+
+    async def release_video(self, user_uid: str, video_id: str, chat_uid: str, session: AsyncSession) -> bool:
+        """
+        Removes the user's link to the video unless another of their chats still uses it.
+
+        Returns True when no user is left on the video, the caller then deletes its vectors
+        before committing.
+        """
+        await self.lock_video(video_id, session)
+        statement = select(Chats.youtube_video_url).where(Chats.user_uid == user_uid, Chats.uuid != chat_uid)
+        result = await session.execute(statement)
+        if any(get_video_id(url) == video_id for url in result.scalars().all()):
+            return False
+
+        await session.execute(
+            delete(VideoAccess).where(VideoAccess.user_uid == user_uid, VideoAccess.video_id == video_id)
+        )
+        return not await self.is_linked(video_id, session)
+
+    async def is_linked(self, video_id: str, session: AsyncSession) -> bool:
+        statement = select(func.count()).select_from(VideoAccess).where(VideoAccess.video_id == video_id)
+        result = await session.execute(statement)
+        return result.scalar_one() > 0
+
+
+video_access_service = VideoAccessServices()
+
+
+class IngestionRegistryServices:
+    """
+    Record of the videos stored in the vector db, so "is this video loaded?" is a primary key
+    read, not a vector search.
+
+    A video is claimed with an "ingesting" row under the video lock, then fetched, embedded and
+    upserted with no lock, transaction or pooled connection held, and marked "ready" once stored.
+    Concurrent loads of the same video wait for the claim instead of ingesting it again.
+    """
+
+    POLL_INTERVAL_SECONDS = 1.0
+
+    async def get_status(self, video_id: str, session: AsyncSession) -> Optional[str]:
+        statement = select(VideoIngestion.status).where(VideoIngestion.video_id == video_id)
+        result = await session.execute(statement)
+        return result.scalar_one_or_none()
+
+    async def is_ingested(self, video_id: str, session: AsyncSession) -> bool:
+        return await self.get_status(video_id, session) == "ready"
+
+    async def claim(self, video_id: str, session: AsyncSession) -> Optional[str]:
+        """
+        Called under the video lock. Returns "ready", "ingesting" when another request is on it,
+        or None when the caller now holds the claim and has to ingest the video.
+        """
+        # A claim older than the stale timeout was left by a worker that died mid ingestion
+        is_fresh = VideoIngestion.ingested_at > func.now() - timedelta(seconds=CONFIG.VIDEO_INGESTION_STALE_SECONDS)
+        statement = select(VideoIngestion.status, is_fresh.label("is_fresh")).where(
+            VideoIngestion.video_id == video_id
+        )
+        row = (await session.execute(statement)).one_or_none()
+        if row is not None and row.status == "ready":
+            return "ready"
+        if row is not None and row.status == "ingesting" and row.is_fresh:
+            return "ingesting"
+
+        statement = insert(VideoIngestion).values(video_id=video_id, status="ingesting", chunk_count=None)
+        statement = statement.on_conflict_do_update(
+            index_elements=[VideoIngestion.video_id],
+            set_={"status": "ingesting", "chunk_count": None, "ingested_at": func.now()},
+        )
+        await session.execute(statement)
+        return None
+
+    async def ensure_ingested(self, video_id: str, components, session: AsyncSession):
+        """
+        Returns once the video is stored, ingesting it when nobody has. Commits the session, the
+        caller links the video afterwards under the lock and has to check `is_ingested` again.
+        """
+        deadline = time.monotonic() + CONFIG.VIDEO_INGESTION_WAIT_SECONDS
+        while True:
+            await video_access_service.lock_video(video_id, session)
+            status = await self.claim(video_id, session)
+            # Releases the lock and the connection before the slow part
+            await session.commit()
+            if status == "ready":
+                return
+            if status is None:
+                break
+            if time.monotonic() > deadline:
+                raise AppError(VideoIngestionInProgressError())
+            await asyncio.sleep(self.POLL_INTERVAL_SECONDS)
+
+        try:
+            chunk_count = await components.load_and_store_video(video_id=video_id)
+        except BaseException:
+            await self._abandon(video_id, components, session)
+            raise
+        await self.record_ingestion(video_id, chunk_count, session)
+        await session.commit()
+
+    async def _abandon(self, video_id: str, components, session: AsyncSession):
+        """Drops the claim of a failed ingestion, and its partial vectors unless a user is linked."""
+        await session.rollback()
+        await video_access_service.lock_video(video_id, session)
+        await self.remove(video_id, session)
+        if not await video_access_service.is_linked(video_id, session):
+            await components.vector_db.delete_video_transcript(video_id)
+        await session.commit()
+
+    async def record_ingestion(self, video_id: str, chunk_count: int, session: AsyncSession):
+        statement = insert(VideoIngestion).values(video_id=video_id, status="ready", chunk_count=chunk_count)
+        statement = statement.on_conflict_do_update(
+            index_elements=[VideoIngestion.video_id],
+            set_={"status": "ready", "chunk_count": chunk_count, "ingested_at": func.now()},
+        )
+        await session.execute(statement)
+
+    async def remove(self, video_id: str, session: AsyncSession):
+        await session.execute(delete(VideoIngestion).where(VideoIngestion.video_id == video_id))
+
+
+ingestion_registry_service = IngestionRegistryServices()
@@ -1,3 +1,4 @@
+from typing import Dict, Literal, Tuple
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Config(BaseSettings):
@@ -20,6 +21,88 @@ class Config(BaseSettings):
     REFRESH_TOKEN_EXPIRY_DAYS: int
     ACCESS_TOKEN_EXPIRY_MINUTES: int
 
+    # "pinecone" is the hosted index, "local" an in-process store embedding on CPU (needs fastembed)
+    VECTOR_STORE_BACKEND: Literal["pinecone", "local"] = "pinecone"
+    LOCAL_EMBEDDING_MODEL: str = "BAAI/bge-small-en-v1.5"
+    # "exact" keeps the local vectors in memory, "ivf" persists an ANN index per namespace
+    LOCAL_VECTOR_INDEX: Literal["exact", "ivf"] = "exact"
+    LOCAL_VECTOR_STORE_DIR: str = "data/vector_store"
+    LOCAL_ANN_NLIST: int = 64
+    LOCAL_ANN_NPROBE: int = 8
+    # Share of tombstoned rows that triggers a compaction of the index files
+    LOCAL_ANN_COMPACT_RATIO: float = 0.3
+    # "ivf" only: search on int8 (4x smaller) or product quantized codes, then rescore the best
+    # k * LOCAL_RESCORE_FACTOR in float32 (0: 4 for int8, 16 for pq). LOCAL_PQ_SUBVECTORS must
+    # divide the embedding dimension, 0 uses dimension / 8 (one byte per 8 floats, 32x smaller)
+    LOCAL_VECTOR_QUANTIZATION: Literal["none", "int8", "pq"] = "none"
+    LOCAL_PQ_SUBVECTORS: int = 0
+    LOCAL_RESCORE_FACTOR: int = 0
+
+    # Agent
+    ROUTER_CONFIDENCE_THRESHOLD: float = 0.8
+    SPECULATIVE_RETRIEVAL: bool = True
+    # Node name -> model, nodes not listed use the model selected by the user.
+    # Internal JSON calls the user never sees go to a small fast model.
+    NODE_MODELS: Dict[str, str] = {
+        "llm_initial_decision_maker": "llama-3.1-8b-instant",
+        "fetch_conversation_history": "llama-3.1-8b-instant",
+    }
+
+    ANSWER_CACHE_MAX_ENTRIES: int = 1024
+    ANSWER_CACHE_TTL_SECONDS: int = 3600
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_THRESHOLD: float = 0.92
+    SEMANTIC_CACHE_MAX_ENTRIES_PER_VIDEO: int = 256
+    # Buckets (video, model, prompt version) kept, least recently used dropped first
+    SEMANTIC_CACHE_MAX_VIDEOS: int = 256
+    # Share of the model's context budget under which the whole transcript is sent, 0 disables,
+    # capped at 1 (see tests/test_whole_transcript.py for the sweep)
+    WHOLE_TRANSCRIPT_BUDGET_RATIO: float = 1.0
+    # Searches over-fetch RETRIEVAL_CANDIDATE_K hits, between MIN_K and MAX_K are kept depending on
+    # the score drop-off (ratio of / gap from the top score) and the model's context budget
+    RETRIEVAL_CANDIDATE_K: int = 12
+    RETRIEVAL_MIN_K: int = 2
+    RETRIEVAL_MAX_K: int = 8
+    RETRIEVAL_MIN_SCORE_RATIO: float = 0.6
+    RETRIEVAL_MAX_SCORE_GAP: float = 0.15
+    # BM25 matches fused with the dense hits, 0 disables. When the vector db errors or takes
+    # longer than the timeout, the lexical matches are used alone
+    RETRIEVAL_LEXICAL_K: int = 4
+    VECTOR_DB_TIMEOUT_SECONDS: float = 5.0
+    # Compound questions are searched as up to this many sub-queries in parallel, fused by rank.
+    # The concurrency caps the fanned out vector searches of the whole worker, 1 max disables
+    MULTI_QUERY_MAX_SUB_QUERIES: int = 4
+    MULTI_QUERY_CONCURRENCY: int = 8
+    # Streamed tokens are sent in frames of at most this window / size, 0 ms sends every token
+    SSE_TOKEN_WINDOW_MS: int = 30
+    SSE_TOKEN_MAX_CHARS: int = 512
+    # "custom" streams straight from the nodes, "events" filters astream_events v2
+    AGENT_STREAM_MODE: Literal["custom", "events"] = "custom"
+    # Answers of the agent endpoint are written in batches of up to this size / interval
+    QA_WRITER_FLUSH_INTERVAL_SECONDS: float = 0.5
+    QA_WRITER_MAX_BATCH_SIZE: int = 200
+    # A video is ingested by one request, concurrent loads of it wait up to this long for it.
+    # A claim older than the stale timeout is taken over (its worker is assumed dead)
+    VIDEO_INGESTION_WAIT_SECONDS: float = 120.0
+    VIDEO_INGESTION_STALE_SECONDS: int = 600
+    # Batch endpoint, questions per request and answers generated at once per request
+    BATCH_MAX_QUESTIONS: int = 100
+    BATCH_GENERATION_CONCURRENCY: int = 4
+    # (requests per minute, tokens per minute) per model, models not listed use the defaults
+    LLM_RATE_LIMITS: Dict[str, Tuple[int, int]] = {}
+    LLM_DEFAULT_RATE_LIMITS: Tuple[int, int] = (30, 8000)
+    LLM_MAX_QUEUE_SIZE: int = 100
+    LLM_QUEUE_TIMEOUT_SECONDS: float = 20.0
+    # The final answer is also requested from the fallback model when the selected one hasn't
+    # sent its first token after this many seconds, 0 disables hedging. 429/5xx fail over right away.
+    HEDGE_FIRST_TOKEN_SECONDS: float = 2.0
+    HEDGE_MEASURE_SECONDS: float = 5.0
+    HEDGE_FALLBACK_MODELS: Dict[str, str] = {
+        "openai/gpt-oss-120b": "openai/gpt-oss-20b",
+        "openai/gpt-oss-20b": "meta-llama/llama-4-scout-17b-16e-instruct",
+        "meta-llama/llama-4-scout-17b-16e-instruct": "openai/gpt-oss-20b",
+    }
+
     model_config = SettingsConfigDict(
         env_file='.env',
         extra='ignore'
@@ -0,0 +1,115 @@
+import asyncio
+import re
+import zlib
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from src.ai.agent import AgentContext
+from src.ai.chat_models import ChatModels
+from src.ai.components import Components
+from src.ai.memory import conversation_memory
+from src.ai.transcript_store import TranscriptStore
+from src.ai.youtube.transcript_preprocessor import TranscriptPreprocessor, TranscriptChunk
+
+VIDEO_ID = "dQw4w9WgXcQ"
+
+TRANSCRIPT = [
+    "Welcome to the course, today we set up a Python project from scratch.",
+    "First we create a virtual environment and install the dependencies with pip.",
+    "Then we write the first module and run the tests with pytest.",
+    "Finally we package the project and publish it to the package index.",
+]
+
+
+class BagOfWordsEmbedder:
+    """
+    Deterministic stand in for LocalEmbedder, hashed word counts, L2 normalised.
+
+    Texts sharing words score higher, which is all the retrieval tests need, and no model
+    has to be downloaded.
+    """
+
+    def __init__(self, dimension: int = 256):
+        self.dimension = dimension
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in re.findall(r"[a-z0-9]+", text.lower()):
+            vector[zlib.crc32(word.encode()) % self.dimension] += 1.0
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    async def embed_passages(self, texts: List[str]) -> np.ndarray:
+        return np.stack([self._embed(text) for text in texts])
+
+    async def embed_query(self, query: str) -> np.ndarray:
+        return self._embed(query)
+
+
+class FakeChatModel(GenericFakeChatModel):
+    """
+    Replays canned answers, streamed word by word like a provider would.
+
+    `chunk_delay_seconds` paces the chunks like a model generating them, and the stream
+    pauses `stall_seconds` before chunk `stall_at`, like a provider stalling mid answer.
+    """
+
+    model_name: str = "openai/gpt-oss-20b"
+    chunk_delay_seconds: float = 0.0
+    stall_at: Optional[int] = None
+    stall_seconds: float = 0.0
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        for index, chunk in enumerate(self._stream(messages, stop=stop, **kwargs)):
+            if index == self.stall_at:
+                await asyncio.sleep(self.stall_seconds)
+            elif self.chunk_delay_seconds:
+                await asyncio.sleep(self.chunk_delay_seconds)
+            yield chunk
+
+
+def make_chat_model(answers: List[str], model_name: str = "openai/gpt-oss-20b", **fake_options) -> ChatModels:
+    chat_model = ChatModels(model_name)
+    chat_model.llm = FakeChatModel(
+        model_name=model_name, messages=iter([AIMessage(content=answer) for answer in answers]), **fake_options
+    )
+    return chat_model
+
+
+def make_transcript_chunks(video_id: str = VIDEO_ID, texts: Optional[List[str]] = None) -> List[TranscriptChunk]:
+    return [
+        TranscriptChunk(id=f"{video_id}-{minute}", start_time=minute, end_time=minute + 1, text=text, video_id=video_id)
+        for minute, text in enumerate(texts or TRANSCRIPT)
+    ]
+
+
+def make_components(vector_db=None) -> Components:
+    """Components whose transcript store holds the short TRANSCRIPT, answered whole without a search."""
+    transcript_store = TranscriptStore()
+    transcript_store.put(VIDEO_ID, make_transcript_chunks())
+    return Components(vector_db, TranscriptPreprocessor(), transcript_store)
+
+
+def make_agent_context(chat_model: ChatModels, components: Optional[Components] = None) -> AgentContext:
+    return AgentContext(
+        chat_model=chat_model,
+        components=components or make_components(),
+        user_id="tests",
+        video_id=VIDEO_ID,
+        chat_id="tests",
+    )
+
+
+def detach_conversation_memory(monkeypatch, history: Optional[List[str]] = None):
+    """Serves a fixed history and skips the background summary, both would need Postgres."""
+
+    async def load(chat_id: str) -> List[str]:
+        return list(history or [])
+
+    async def update_summary(chat_id: str, chat_model: ChatModels):
+        return None
+
+    monkeypatch.setattr(conversation_memory, "load", load)
+    monkeypatch.setattr(conversation_memory, "update_summary", update_summary)
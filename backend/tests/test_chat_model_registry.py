@@ -0,0 +1,112 @@
+import asyncio
+import time
+
+import httpx
+
+from src.ai.chat_models import ChatModels, ChatModelRegistry
+
+
+def test_get_returns_one_shared_instance_per_model():
+    async def run():
+        registry = ChatModelRegistry()
+        try:
+            models = [registry.get(model_name) for model_name in ChatModels.AVAILABLE_MODELS * 10]
+            by_name = {chat_model.llm.model_name: chat_model for chat_model in models}
+
+            assert len(by_name) == len(ChatModels.AVAILABLE_MODELS)
+            assert all(chat_model is by_name[chat_model.llm.model_name] for chat_model in models)
+            assert all(chat_model.llm.http_async_client is registry.http_async_client for chat_model in models)
+        finally:
+            await registry.aclose()
+
+    asyncio.run(run())
+
+
+def test_concurrent_requests_share_the_instance():
+    async def run():
+        registry = ChatModelRegistry()
+
+        async def request(model_name: str) -> ChatModels:
+            await asyncio.sleep(0)
+            return registry.get(model_name)
+
+        try:
+            models = await asyncio.gather(*[request("openai/gpt-oss-20b") for _ in range(100)])
+            assert len({id(chat_model) for chat_model in models}) == 1
+        finally:
+            await registry.aclose()
+
+    asyncio.run(run())
+
+
+def test_aclose_closes_the_pooled_client():
+    async def run():
+        registry = ChatModelRegistry()
+        registry.warm_up(ChatModels.AVAILABLE_MODELS)
+        await registry.aclose()
+        assert registry.http_async_client.is_closed
+
+    asyncio.run(run())
+
+
+async def _serve_keep_alive(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Minimal HTTP/1.1 server answering every request on the connection with an empty JSON body."""
+    try:
+        while True:
+            request = await reader.readuntil(b"\r\n\r\n")
+            if not request:
+                break
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: 2\r\n\r\n{}")
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+def benchmark(requests: int = 50) -> dict:
+    """
+    Per request setup of building ChatModels (a fresh ChatGroq and http client) against a
+    registry lookup, and of a request on a fresh client against the registry's pooled one.
+    The requests go to a local keep-alive server, so this only counts the TCP connect, real
+    calls to the provider also pay the TLS handshake on every new connection.
+    """
+
+    async def run() -> dict:
+        results = {}
+        started_at = time.perf_counter()
+        for _ in range(requests):
+            ChatModels("openai/gpt-oss-20b", http_async_client=httpx.AsyncClient())
+        results["construct_per_request_us"] = round((time.perf_counter() - started_at) / requests * 1e6, 1)
+
+        registry = ChatModelRegistry()
+        registry.get("openai/gpt-oss-20b")
+        started_at = time.perf_counter()
+        for _ in range(requests):
+            registry.get("openai/gpt-oss-20b")
+        results["registry_get_us"] = round((time.perf_counter() - started_at) / requests * 1e6, 2)
+
+        server = await asyncio.start_server(_serve_keep_alive, "127.0.0.1", 0)
+        url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/"
+        async with server:
+            started_at = time.perf_counter()
+            for _ in range(requests):
+                async with httpx.AsyncClient() as client:
+                    await client.get(url)
+            results["fresh_client_request_us"] = round((time.perf_counter() - started_at) / requests * 1e6, 1)
+
+            await registry.http_async_client.get(url)
+            started_at = time.perf_counter()
+            for _ in range(requests):
+                await registry.http_async_client.get(url)
+            results["pooled_client_request_us"] = round((time.perf_counter() - started_at) / requests * 1e6, 1)
+            # The server waits for open connections on exit, the pool keeps one until closed
+            await registry.aclose()
+        return results
+
+    return asyncio.run(run())
+
+
+if __name__ == "__main__":
+    # python -m tests.test_chat_model_registry
+    print(benchmark())
@@ -0,0 +1,151 @@
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+from src.ai.agent import build_answer_prompt
+from src.ai.chat_models import ChatModels
+from src.ai.hedging import is_generating
+from src.ai.context_packer import ContextPacker, context_packer, count_tokens, _get_encoding
+from src.ai.prompts import Prompts
+
+MODEL_NAME = "openai/gpt-oss-20b"
+QUERY = "How do the tests use fixtures?"
+WORDS = (
+    "so the next thing we do is write a fixture that opens the database and every test "
+    "that needs it just takes it as an argument which keeps the setup in one place and "
+    "pytest runs it again for each test unless we give it a wider scope like module or session"
+).split()
+
+
+def make_minutes(minutes: int, words_per_minute: int = 150, seed: int = 7) -> List[Dict]:
+    """One chunk per minute of speech, shaped like the formatted search hits the agent gets."""
+    generator = random.Random(seed)
+    return [
+        {
+            "start_time": float(minute),
+            "end_time": float(minute + 1),
+            "text": " ".join(generator.choice(WORDS) for _ in range(words_per_minute)),
+        }
+        for minute in range(minutes)
+    ]
+
+
+def make_history(turns: int) -> List[str]:
+    return [
+        f"User: question number {turn} about the fixtures?\nAssistant: {' '.join(WORDS[: 20 + turn % 10])}."
+        for turn in range(turns)
+    ]
+
+
+def unpacked_prompt(chunks: List[Dict], history: List[str]) -> str:
+    """The answer prompt as it was built before packing, python reprs of the chunks and history."""
+    return Prompts.NORMAL_CHAT_PROMPT.value.format(
+        conversation_history=history, context=chunks, user_query=QUERY
+    )
+
+
+def packed_prompt(chunks: List[Dict], history: List[str]) -> str:
+    return build_answer_prompt(QUERY, history, context_packer.pack_context(chunks, MODEL_NAME))
+
+
+def test_packed_prompt_is_smaller_and_keeps_every_chunk():
+    minutes = make_minutes(30)
+    # Relevance order, with neighbouring minutes the packer merges into one line
+    chunks = [minutes[12], minutes[13], minutes[4], minutes[14]]
+    history = make_history(4)
+
+    packed = packed_prompt(chunks, history)
+
+    assert count_tokens(packed) < count_tokens(unpacked_prompt(chunks, history))
+    assert all(chunk["text"] in packed for chunk in chunks)
+    assert all(turn in packed for turn in history)
+    assert "[12-15 min]" in packed and "[4-5 min]" in packed
+    assert "'start_time'" not in packed
+
+
+def test_context_stays_within_the_model_budget():
+    packer = ContextPacker()
+    chunks = make_minutes(120)
+    packed_context = packer.pack_context(chunks, "llama-3.1-8b-instant")
+
+    assert count_tokens(str(chunks)) > packer.budget_for("llama-3.1-8b-instant")
+    assert count_tokens(packed_context) <= packer.budget_for("llama-3.1-8b-instant")
+    # The best ranked chunk is never the one dropped
+    assert chunks[0]["text"] in packed_context
+
+
+def test_history_keeps_the_most_recent_turns_within_budget():
+    packer = ContextPacker()
+    history = make_history(200)
+    packed_history = packer.pack_history(history)
+
+    assert count_tokens(packed_history) <= packer.HISTORY_TOKEN_BUDGET
+    assert packed_history.endswith(history[-1])
+    assert history[0] not in packed_history
+    assert packer.pack_history([]) == "None"
+
+
+def report() -> List[Dict]:
+    """Prompt tokens before and after packing, for a growing number of retrieved minutes."""
+    minutes = make_minutes(60)
+    history = make_history(12)
+    rows = []
+    for k in (2, 4, 8, 16, 32):
+        # Every other minute is adjacent to the previous one, like real neighbouring hits
+        chunks = [minutes[(index // 2) * 3 + index % 2] for index in range(k)]
+        before = count_tokens(unpacked_prompt(chunks, history))
+        after = count_tokens(packed_prompt(chunks, history))
+        rows.append({"chunks": k, "tokens_before": before, "tokens_after": after, "saved": f"{1 - after / before:.0%}"})
+    return rows
+
+
+async def time_to_first_token(chat_model: ChatModels, prompt: str) -> float:
+    """Milliseconds until the first content or reasoning delta, the rest of the stream is dropped."""
+    started = time.perf_counter()
+    stream = chat_model.astream_chunks(prompt)
+    try:
+        async for chunk in stream:
+            if is_generating(chunk):
+                return (time.perf_counter() - started) * 1000
+    finally:
+        await stream.aclose()
+    return float("nan")
+
+
+async def ttft_report(k: int = 16, repeats: int = 7) -> Dict:
+    """
+    Median TTFT of the unpacked and packed prompts on the real provider, needs GROQ_API_KEY.
+
+    The two prompts alternate so drifts in provider load hit both alike, and one call warms
+    the connection up before anything is timed.
+    """
+    minutes = make_minutes(60)
+    chunks = [minutes[(index // 2) * 3 + index % 2] for index in range(k)]
+    history = make_history(12)
+    prompts = {"unpacked": unpacked_prompt(chunks, history), "packed": packed_prompt(chunks, history)}
+    chat_model = ChatModels(MODEL_NAME)
+    await time_to_first_token(chat_model, "Say hi.")
+    ttft_ms: Dict[str, List[float]] = {name: [] for name in prompts}
+    for _ in range(repeats):
+        for name, prompt in prompts.items():
+            ttft_ms[name].append(await time_to_first_token(chat_model, prompt))
+    return {
+        "chunks": k,
+        **{f"tokens_{name}": count_tokens(prompt) for name, prompt in prompts.items()},
+        **{f"ttft_{name}_ms": round(statistics.median(times), 1) for name, times in ttft_ms.items()},
+    }
+
+
+if __name__ == "__main__":
+    # python -m tests.test_context_packer [--ttft]
+    print(f"tokenizer: {'o200k_base' if _get_encoding() else 'estimate, 4 characters per token'}")
+    for row in report():
+        print(row)
+    if "--ttft" in sys.argv:
+        if os.getenv("GROQ_API_KEY") in (None, "tests"):
+            sys.exit("--ttft streams from Groq, set GROQ_API_KEY")
+        print(asyncio.run(ttft_report()))
@@ -0,0 +1,144 @@
+import asyncio
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+
+from src.ai import memory
+from src.ai.memory import ConversationMemory
+
+CHAT_ID = "chat"
+
+
+class FakeSessions:
+    """Stands in for the Session factory, counts the sessions open at any time."""
+
+    def __init__(self):
+        self.open = 0
+
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        self.open += 1
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.open -= 1
+
+
+class FakeChatService:
+    """The chat_service queries the memory uses, over one in-memory chat."""
+
+    def __init__(self, turns: int):
+        self.chat = SimpleNamespace(conversation_summary=None, summarized_qa_count=0)
+        self.qas = [SimpleNamespace(query=f"question {turn}", answer=f"answer {turn}") for turn in range(turns)]
+
+    async def get_chat_by_id(self, chat_id, session):
+        return SimpleNamespace(**vars(self.chat))
+
+    async def count_qa(self, chat_id, session):
+        return len(self.qas)
+
+    async def get_recent_qa(self, chat_id, limit, session):
+        return self.qas[-limit:]
+
+    async def get_qa_slice(self, chat_id, offset, limit, session):
+        return self.qas[offset:offset + limit]
+
+    async def update_conversation_summary(
+        self, chat_id, summary, summarized_qa_count, previous_summarized_qa_count, session
+    ):
+        if self.chat.summarized_qa_count != previous_summarized_qa_count:
+            return False
+        self.chat.conversation_summary = summary
+        self.chat.summarized_qa_count = summarized_qa_count
+        return True
+
+
+class SummaryModel:
+    """Records how many sessions are open while it 'generates'."""
+
+    def __init__(self, sessions: FakeSessions, delay_seconds: float = 0.0):
+        self.sessions = sessions
+        self.delay_seconds = delay_seconds
+        self.sessions_open_during_calls: List[int] = []
+
+    async def call_llm(self, prompt):
+        self.sessions_open_during_calls.append(self.sessions.open)
+        await asyncio.sleep(self.delay_seconds)
+        return f"summary {len(self.sessions_open_during_calls)}"
+
+
+@pytest.fixture
+def sessions(monkeypatch):
+    sessions = FakeSessions()
+    monkeypatch.setattr(memory, "Session", sessions)
+    return sessions
+
+
+def use_chat(monkeypatch, turns: int) -> FakeChatService:
+    chat_service = FakeChatService(turns)
+    monkeypatch.setattr(memory, "chat_service", chat_service)
+    return chat_service
+
+
+def test_summarizes_once_enough_turns_left_the_window(sessions, monkeypatch):
+    conversation_memory = ConversationMemory(recent_turns=6, summarize_every=4)
+    chat_service = use_chat(monkeypatch, turns=9)
+    chat_model = SummaryModel(sessions)
+
+    asyncio.run(conversation_memory.update_summary(CHAT_ID, chat_model))
+    assert chat_model.sessions_open_during_calls == []
+
+    chat_service.qas.append(SimpleNamespace(query="question 9", answer="answer 9"))
+    asyncio.run(conversation_memory.update_summary(CHAT_ID, chat_model))
+    assert chat_service.chat.summarized_qa_count == 4
+    assert chat_service.chat.conversation_summary == "summary 1"
+
+
+def test_no_connection_is_held_during_the_llm_call(sessions, monkeypatch):
+    use_chat(monkeypatch, turns=10)
+    chat_model = SummaryModel(sessions)
+
+    asyncio.run(ConversationMemory(recent_turns=6, summarize_every=4).update_summary(CHAT_ID, chat_model))
+
+    assert chat_model.sessions_open_during_calls == [0]
+    assert sessions.open == 0
+
+
+def test_concurrent_runs_fold_the_turns_once(sessions, monkeypatch):
+    conversation_memory = ConversationMemory(recent_turns=6, summarize_every=4)
+    chat_service = use_chat(monkeypatch, turns=10)
+    chat_model = SummaryModel(sessions, delay_seconds=0.05)
+
+    async def run():
+        await asyncio.gather(*[conversation_memory.update_summary(CHAT_ID, chat_model) for _ in range(3)])
+
+    asyncio.run(run())
+    assert len(chat_model.sessions_open_during_calls) == 1
+    assert chat_service.chat.summarized_qa_count == 4
+
+
+def test_a_summary_stored_meanwhile_is_not_overwritten(sessions, monkeypatch):
+    chat_service = use_chat(monkeypatch, turns=10)
+
+    class OvertakenModel(SummaryModel):
+        async def call_llm(self, prompt):
+            # Another worker stores a summary of more turns while this one generates
+            chat_service.chat.summarized_qa_count = 8
+            chat_service.chat.conversation_summary = "newer summary"
+            return await super().call_llm(prompt)
+
+    asyncio.run(ConversationMemory(recent_turns=6, summarize_every=4).update_summary(CHAT_ID, OvertakenModel(sessions)))
+
+    assert (chat_service.chat.summarized_qa_count, chat_service.chat.conversation_summary) == (8, "newer summary")
+
+
+def test_turns_waiting_for_a_summary_are_sent_verbatim(sessions, monkeypatch):
+    use_chat(monkeypatch, turns=9)
+
+    history = asyncio.run(ConversationMemory(recent_turns=6, summarize_every=4).load(CHAT_ID))
+
+    assert len(history) == 9
+    assert history[0].startswith("User: question 0")
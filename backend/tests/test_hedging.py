@@ -0,0 +1,86 @@
+import asyncio
+from typing import List, Tuple
+
+from langchain_core.messages import AIMessageChunk
+
+from src.config import CONFIG
+from src.ai.agent import Agent
+from src.ai.chat_models import ChatModels
+from src.ai.hedging import HedgedStream
+from tests.fakes import VIDEO_ID, make_agent_context, make_chat_model, detach_conversation_memory
+
+PRIMARY = "openai/gpt-oss-120b"
+FALLBACK = "openai/gpt-oss-20b"
+QUERY = "How do I set up the project?"
+
+
+class ScriptedChatModel(ChatModels):
+    """Streams (delay, chunk) pairs, like a provider would after each delay."""
+
+    def __init__(self, model_name: str, script: List[Tuple[float, AIMessageChunk]]):
+        super().__init__(model_name)
+        self.script = script
+
+    async def astream_chunks(self, prompt, user_id=None):
+        for delay_seconds, chunk in self.script:
+            await asyncio.sleep(delay_seconds)
+            yield chunk
+
+
+def role_delta() -> AIMessageChunk:
+    return AIMessageChunk(content="")
+
+
+def reasoning(text: str) -> AIMessageChunk:
+    return AIMessageChunk(content="", additional_kwargs={"reasoning_content": text})
+
+
+def content(text: str) -> AIMessageChunk:
+    return AIMessageChunk(content=text)
+
+
+def stream(primary: ChatModels, fallback: ChatModels) -> Tuple[str, str]:
+    """Returns the streamed answer and the model that won."""
+    hedged_stream = HedgedStream(primary, fallback, first_token_timeout=0.1, measure_timeout=0.01)
+
+    async def collect() -> str:
+        return "".join([token async for token in hedged_stream.astream("prompt")])
+
+    return asyncio.run(collect()), hedged_stream.winner_model_name
+
+
+def test_reasoning_deltas_keep_the_primary():
+    primary = ScriptedChatModel(
+        PRIMARY, [(0.0, role_delta()), (0.02, reasoning("Let me think")), (0.3, content("From the primary."))]
+    )
+    fallback = ScriptedChatModel(FALLBACK, [(0.0, content("From the fallback."))])
+
+    assert stream(primary, fallback) == ("From the primary.", PRIMARY)
+
+
+def test_silent_primary_hedges_to_the_fallback():
+    primary = ScriptedChatModel(PRIMARY, [(0.0, role_delta()), (0.5, content("From the primary."))])
+    fallback = ScriptedChatModel(FALLBACK, [(0.0, role_delta()), (0.0, content("From the fallback."))])
+
+    assert stream(primary, fallback) == ("From the fallback.", FALLBACK)
+
+
+def test_hedged_answer_is_cached_under_the_model_that_wrote_it(monkeypatch):
+    detach_conversation_memory(monkeypatch)
+    monkeypatch.setattr(CONFIG, "SEMANTIC_CACHE_ENABLED", False)
+    monkeypatch.setattr(CONFIG, "AGENT_STREAM_MODE", "custom")
+    monkeypatch.setattr(CONFIG, "HEDGE_FIRST_TOKEN_SECONDS", 0.05)
+    monkeypatch.setattr(CONFIG, "HEDGE_MEASURE_SECONDS", 0.01)
+    context = make_agent_context(make_chat_model(["From the primary."], PRIMARY, stall_at=0, stall_seconds=0.5))
+    context.fallback_model = make_chat_model(["From the fallback."], FALLBACK)
+    agent = Agent()
+
+    async def run():
+        input_state = {"user_query": QUERY, "conversation_history": []}
+        return [frame async for frame in agent.run_agent(input_state, context)]
+
+    asyncio.run(run())
+
+    assert context.answered_by == FALLBACK
+    assert agent.answer_cache.get(agent.answer_cache.make_key(VIDEO_ID, QUERY, PRIMARY)) is None
+    assert agent.answer_cache.get(agent.answer_cache.make_key(VIDEO_ID, QUERY, FALLBACK)) == "From the fallback."
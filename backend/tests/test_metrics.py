@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import src
+from src import app
+from src.config import CONFIG
+from src.ai.agent import Agent
+from src.ai.chat_models import ChatModelRegistry
+from src.ai.hedging import HedgeMetrics
+from src.ai.scheduler import LLMScheduler
+from src.auth.dependencies import get_current_user
+from src.chats.qa_writer import QAWriteBehindQueue
+
+METRICS_URL = "/api/v1/metrics"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # The lifespan isn't run, the endpoint only reads these
+    monkeypatch.setattr(app.state, "agent", Agent(qa_writer=QAWriteBehindQueue()), raising=False)
+    scheduler = LLMScheduler(limits=CONFIG.LLM_RATE_LIMITS, default_limits=CONFIG.LLM_DEFAULT_RATE_LIMITS)
+    monkeypatch.setattr(app.state, "chat_models", ChatModelRegistry(scheduler=scheduler), raising=False)
+    monkeypatch.setattr(src, "hedge_metrics", HedgeMetrics())
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def sign_in_as(role: str):
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(role=role)
+
+
+def test_metrics_need_a_signed_in_user(client):
+    assert client.get(METRICS_URL).status_code == 401
+
+
+def test_metrics_are_hidden_from_users(client):
+    sign_in_as("user")
+
+    assert client.get(METRICS_URL).status_code == 403
+
+
+def test_admins_get_totals_without_per_request_records(client):
+    sign_in_as("admin")
+    src.hedge_metrics.record(
+        {"primary": "openai/gpt-oss-120b", "winner": "openai/gpt-oss-20b", "reason": "slow_first_token", "saved_ms": 120.0}
+    )
+
+    response = client.get(METRICS_URL)
+
+    assert response.status_code == 200
+    assert response.json()["hedging"]["hedged"] == 1
+    assert "recent" not in response.json()["hedging"]
@@ -0,0 +1,128 @@
+"""
+Offline recall vs tokens evaluation of the retrieval cut, on a small labelled lecture.
+
+Each question lists the minutes that answer it, recall is the share of those minutes the
+selected chunks cover and tokens are what the packed context costs. Questions answered by
+one minute are narrow, the others broad. The fixed top 4 search the agent used before is
+compared with the adaptive cut, dense only and fused with the lexical matches like
+hybrid_search does.
+"""
+import asyncio
+from typing import Dict, List, Set
+
+from src.ai.context_packer import context_packer, count_tokens
+from src.ai.local_vector_db.local_store import LocalVectorStore
+from src.ai.retrieval import AdaptiveTopK, format_hit
+from src.ai.transcript_store import VideoTranscript
+from tests.fakes import BagOfWordsEmbedder, VIDEO_ID, make_transcript_chunks
+
+MODEL_NAME = "openai/gpt-oss-20b"
+FIXED_K = 4
+
+LECTURE = [
+    "Welcome to the lecture on building web services in Python with a small framework.",
+    "We install the framework with pip inside a virtual environment made with venv.",
+    "The virtual environment keeps the project dependencies apart from the system packages.",
+    "Our first route returns a JSON greeting when the browser requests the root path.",
+    "Path parameters like the item id are declared in the route and typed as integers.",
+    "Query parameters are optional values after the question mark such as page and limit.",
+    "Request bodies are validated by pydantic models with typed fields.",
+    "A pydantic model rejects a body whose price field is not a number and returns error 422.",
+    "Dependencies are functions the framework calls before the route, like opening a database session.",
+    "The database session dependency yields the session and closes it after the response.",
+    "We store the items in Postgres through the async SQLAlchemy engine.",
+    "Migrations with Alembic create the items table and later add an index on the name column.",
+    "Authentication uses OAuth2 with a password flow that returns a bearer token.",
+    "The bearer token is a JWT signed with a secret key and expires after fifteen minutes.",
+    "Refresh tokens last seven days and are stored in an http only cookie.",
+    "Background tasks send the welcome email after the response is returned.",
+    "For heavier jobs like video encoding we hand the work to a Celery worker instead.",
+    "Tests use the test client and pytest fixtures that override the database dependency.",
+    "Each test runs inside a transaction that is rolled back so the database stays clean.",
+    "We build a Docker image with a slim Python base and install the requirements first for caching.",
+    "Gunicorn runs four Uvicorn workers behind an Nginx reverse proxy in production.",
+    "Logging goes to standard output in JSON so the platform can collect it.",
+    "Rate limiting protects the login route, five attempts per minute per address.",
+    "That is the end of the lecture, thanks for watching and see you in the next one.",
+]
+
+# Question -> minutes of LECTURE that answer it
+QUESTIONS: Dict[str, Set[int]] = {
+    "How do I install the framework and why use a virtual environment?": {1, 2},
+    "How are path parameters like the item id typed?": {4},
+    "What happens when the request body has a price that is not a number?": {6, 7},
+    "How does the database session dependency work and when is it closed?": {8, 9},
+    "Which tool creates the items table and adds the index?": {11},
+    "How long does the JWT bearer token last and how long do refresh tokens last?": {13, 14},
+    "When should I use background tasks versus a Celery worker?": {15, 16},
+    "How do the tests keep the database clean?": {17, 18},
+    "How is the app deployed in production with Docker, Gunicorn and Nginx?": {19, 20},
+    "How many login attempts does the rate limiting allow?": {22},
+    "What does the first route return?": {3},
+    "Where do the logs go?": {21},
+    "Where is the refresh token stored?": {14},
+}
+
+
+def covered_minutes(chunks: List[Dict]) -> Set[int]:
+    return {minute for chunk in chunks for minute in range(int(chunk["start_time"]), int(chunk["end_time"]))}
+
+
+def evaluate(directory: str) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """Mean recall and packed context tokens per strategy, over the narrow and the broad questions."""
+
+    async def run() -> Dict[str, Dict[str, Dict[str, float]]]:
+        transcript_chunks = make_transcript_chunks(VIDEO_ID, LECTURE)
+        store = LocalVectorStore(BagOfWordsEmbedder(), index_type="exact", directory=directory)
+        await store.upsert_records_into_vdb({"video_id": VIDEO_ID, "records": transcript_chunks})
+        transcript = VideoTranscript(transcript_chunks)
+        adaptive_top_k = AdaptiveTopK()
+
+        samples: Dict[str, Dict[str, List[tuple]]] = {}
+        for question, relevant in QUESTIONS.items():
+            hits = await store.retrieve_context(question, VIDEO_ID, k=adaptive_top_k.candidate_k)
+            selections = {
+                "fixed_k4": [format_hit(hit) for hit in hits[:FIXED_K]],
+                "adaptive": adaptive_top_k.select([hits], MODEL_NAME),
+                "adaptive_hybrid": adaptive_top_k.select(
+                    [hits], MODEL_NAME, [transcript.lexical_search(question, FIXED_K)]
+                ),
+            }
+            group = "narrow" if len(relevant) == 1 else "broad"
+            for strategy, chunks in selections.items():
+                recall = len(covered_minutes(chunks) & relevant) / len(relevant)
+                tokens = count_tokens(context_packer.pack_context(chunks, MODEL_NAME))
+                samples.setdefault(strategy, {}).setdefault(group, []).append((recall, tokens))
+        return {
+            strategy: {
+                group: {
+                    "recall": round(sum(recall for recall, _ in values) / len(values), 3),
+                    "tokens": round(sum(tokens for _, tokens in values) / len(values), 1),
+                }
+                for group, values in groups.items()
+            }
+            for strategy, groups in samples.items()
+        }
+
+    return asyncio.run(run())
+
+
+def test_adaptive_cut_against_fixed_top_k(tmp_path):
+    results = evaluate(str(tmp_path))
+    fixed, adaptive, hybrid = results["fixed_k4"], results["adaptive"], results["adaptive_hybrid"]
+
+    for group in ("narrow", "broad"):
+        assert adaptive[group]["recall"] >= fixed[group]["recall"]
+        assert hybrid[group]["recall"] >= adaptive[group]["recall"]
+    # Narrow questions stop at the score drop instead of paying for four chunks
+    assert adaptive["narrow"]["tokens"] < fixed["narrow"]["tokens"]
+    assert hybrid["broad"]["recall"] > fixed["broad"]["recall"]
+
+
+if __name__ == "__main__":
+    # python -m tests.test_retrieval_eval
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as directory:
+        for strategy, groups in evaluate(directory).items():
+            print(strategy, groups)
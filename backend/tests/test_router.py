@@ -0,0 +1,49 @@
+import pytest
+
+from src.ai.router import HeuristicRouter, UNANCHORED_RANGE_CONFIDENCE
+
+router = HeuristicRouter(confidence_threshold=0.8)
+
+
+@pytest.mark.parametrize(
+    "query, time_range",
+    [
+        ("What happens from 5 to 10 min?", (5, 10)),
+        ("summarize between 10 and 15 minutes", (10, 15)),
+        ("what is said at 3 to 4 minutes", (3, 4)),
+        ("explain 5 min to 10 min", (5, 10)),
+        ("what is covered in minute 5 to 10", (5, 10)),
+        ("minutes 3-4 please", (3, 4)),
+        ("what happens 5:30 - 10:00", (5, 10)),
+    ],
+)
+def test_anchored_ranges_are_decided_locally(query, time_range):
+    assert router.extract_time_range(query) == (*time_range, 1.0)
+    assert router.route(query) is not None
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "steps 1 and 2 minutes",
+        "what happens 1 to 2 minutes in",
+        "summarize 10-12 minutes",
+    ],
+)
+def test_unanchored_ranges_go_to_the_llm(query):
+    assert router.extract_time_range(query)[2] == UNANCHORED_RANGE_CONFIDENCE
+    assert router.route(query) is None
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "what is GPT-4 and 5 minute rule",
+        "does version 1.5 to 2 minutes change anything",
+        "is the -3 to 4 minute offset right",
+    ],
+)
+def test_numbers_inside_words_are_not_range_starts(query):
+    start_time, end_time, _ = router.extract_time_range(query)
+    assert (start_time, end_time) == (None, None)
+    assert router.route(query) is None
@@ -0,0 +1,48 @@
+import numpy as np
+
+from src.ai.semantic_cache import SemanticAnswerCache
+
+MODEL_NAME = "openai/gpt-oss-20b"
+DIMENSION = 64
+
+
+def embedding(seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal(DIMENSION).astype(np.float32)
+
+
+def test_bucket_memory_grows_with_its_answers():
+    cache = SemanticAnswerCache(max_entries_per_video=256)
+    cache.set("video", MODEL_NAME, embedding(0), "answer 0")
+    first_answer_bytes = cache.stats()["memory_bytes"]
+
+    for seed in range(1, 20):
+        cache.set("video", MODEL_NAME, embedding(seed), f"answer {seed}")
+
+    assert first_answer_bytes < 256 * DIMENSION * 4
+    assert cache.stats()["memory_bytes"] == 32 * DIMENSION * 4
+    assert all(cache.get("video", MODEL_NAME, embedding(seed)) == f"answer {seed}" for seed in range(20))
+
+
+def test_full_bucket_overwrites_the_oldest_answer():
+    cache = SemanticAnswerCache(max_entries_per_video=10)
+    for seed in range(13):
+        cache.set("video", MODEL_NAME, embedding(seed), f"answer {seed}")
+
+    assert cache.stats()["entries"] == 10
+    assert cache.stats()["memory_bytes"] == 10 * DIMENSION * 4
+    assert [cache.get("video", MODEL_NAME, embedding(seed)) for seed in range(3)] == [None] * 3
+    assert all(cache.get("video", MODEL_NAME, embedding(seed)) == f"answer {seed}" for seed in range(3, 13))
+
+
+def test_least_recently_used_bucket_is_dropped():
+    cache = SemanticAnswerCache(max_videos=2)
+    cache.set("first", MODEL_NAME, embedding(1), "first answer")
+    cache.set("second", MODEL_NAME, embedding(2), "second answer")
+    assert cache.get("first", MODEL_NAME, embedding(1)) == "first answer"
+
+    cache.set("third", MODEL_NAME, embedding(3), "third answer")
+
+    assert cache.stats()["buckets"] == 2
+    assert cache.get("second", MODEL_NAME, embedding(2)) is None
+    assert cache.get("first", MODEL_NAME, embedding(1)) == "first answer"
+    assert cache.get("third", MODEL_NAME, embedding(3)) == "third answer"
@@ -0,0 +1,83 @@
+import asyncio
+import gc
+from typing import List
+
+import pytest
+
+from src.config import CONFIG
+from src.ai.agent import Agent, discard_search, retrieve_video_context
+from src.ai.context_packer import context_packer
+from tests.fakes import make_agent_context, make_chat_model, detach_conversation_memory
+
+
+async def slow_search() -> List[dict]:
+    await asyncio.sleep(10)
+    return []
+
+
+async def failed_search() -> List[dict]:
+    raise ConnectionError("vector db unreachable")
+
+
+def test_whole_transcript_answer_cancels_the_speculative_search():
+    async def run() -> asyncio.Task:
+        context = make_agent_context(make_chat_model([]))
+        context.speculative_retrieval = search = asyncio.create_task(slow_search())
+        await retrieve_video_context(context, "How do I set up the project?", None, None)
+        assert context.speculative_retrieval is None
+        await asyncio.sleep(0)
+        return search
+
+    assert asyncio.run(run()).cancelled()
+
+
+def test_time_range_answer_cancels_the_speculative_search(monkeypatch):
+    # Too long to send whole, so the time index answers
+    monkeypatch.setattr(context_packer, "whole_transcript_budget_ratio", 0.0)
+
+    async def run() -> asyncio.Task:
+        context = make_agent_context(make_chat_model([]))
+        context.speculative_retrieval = search = asyncio.create_task(slow_search())
+        chunks = await retrieve_video_context(context, "what happens in minute 1", 1, 2)
+        assert chunks
+        await asyncio.sleep(0)
+        return search
+
+    assert asyncio.run(run()).cancelled()
+
+
+def test_disconnected_client_cancels_the_speculative_search(monkeypatch):
+    detach_conversation_memory(monkeypatch)
+    monkeypatch.setattr(CONFIG, "SEMANTIC_CACHE_ENABLED", False)
+
+    async def is_disconnected() -> bool:
+        return True
+
+    async def run() -> asyncio.Task:
+        context = make_agent_context(make_chat_model(["An answer."]))
+        context.speculative_retrieval = search = asyncio.create_task(slow_search())
+        input_state = {"user_query": "How do I set up the project?", "conversation_history": []}
+        frames = [frame async for frame in Agent().run_agent(input_state, context, is_disconnected)]
+        assert frames == []
+        await asyncio.sleep(0)
+        return search
+
+    assert asyncio.run(run()).cancelled()
+
+
+@pytest.mark.parametrize("discard", [False, True])
+def test_failed_search_is_reported_unless_discarded(discard):
+    reported = []
+
+    async def run():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, error: reported.append(error))
+        search = asyncio.create_task(failed_search())
+        await asyncio.sleep(0)
+        if discard:
+            discard_search(search)
+        del search
+        await asyncio.sleep(0)
+        gc.collect()
+
+    asyncio.run(run())
+    assert (reported == []) == discard
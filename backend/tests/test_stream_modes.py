@@ -0,0 +1,113 @@
+import asyncio
+import json
+import time
+from typing import List
+
+import pytest
+
+from src.config import CONFIG
+from src.ai.agent import Agent
+from tests.fakes import make_agent_context, make_chat_model, detach_conversation_memory
+
+ANSWER = (
+    "You create a virtual environment, install the dependencies with pip, "
+    "write the first module and run the tests with pytest."
+)
+
+QUERIES = [
+    # Standalone, decided locally, whole transcript
+    "How do I set up the project?",
+    # Follow up, goes through the conversation history node
+    "tell me more about that",
+    # Time range, served from the time index
+    "what happens between minute 1 and 2",
+]
+
+
+def run_agent(query: str, stream_mode: str, monkeypatch, answer: str = ANSWER, agent: Agent | None = None) -> List[str]:
+    monkeypatch.setattr(CONFIG, "AGENT_STREAM_MODE", stream_mode)
+    context = make_agent_context(make_chat_model([answer]))
+    agent = agent or Agent()
+
+    async def collect() -> List[str]:
+        input_state = {"user_query": query, "conversation_history": []}
+        return [frame async for frame in agent.run_agent(input_state, context)]
+
+    return asyncio.run(collect())
+
+
+def parse_frames(frames: List[str]) -> List[tuple]:
+    parsed = []
+    for frame in frames:
+        event_line, data_line = frame.strip().split("\n")
+        parsed.append((event_line.removeprefix("event: "), json.loads(data_line.removeprefix("data: "))))
+    return parsed
+
+
+@pytest.fixture(autouse=True)
+def isolated_agent(monkeypatch):
+    detach_conversation_memory(monkeypatch, history=["User: what is pip?\nAssistant: A package installer."])
+    monkeypatch.setattr(CONFIG, "SEMANTIC_CACHE_ENABLED", False)
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_stream_modes_send_identical_frames(query, monkeypatch):
+    # Without coalescing every token is its own frame, so the frames must match one to one
+    monkeypatch.setattr(CONFIG, "SSE_TOKEN_WINDOW_MS", 0)
+    custom_frames = run_agent(query, "custom", monkeypatch)
+    events_frames = run_agent(query, "events", monkeypatch)
+
+    assert custom_frames == events_frames
+    events = parse_frames(custom_frames)
+    assert [data["name"] for event, data in events if event == "agent_step"][-1] == "final_llm_response"
+    assert "".join(data["text"] for event, data in events if event == "token") == ANSWER
+    assert sum(event == "token" for event, _ in events) > 1
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_stream_modes_send_the_same_steps_and_text_when_coalescing(query, monkeypatch):
+    monkeypatch.setattr(CONFIG, "SSE_TOKEN_WINDOW_MS", 30)
+    custom_events = parse_frames(run_agent(query, "custom", monkeypatch))
+    events_events = parse_frames(run_agent(query, "events", monkeypatch))
+
+    for events in (custom_events, events_events):
+        assert "".join(data["text"] for event, data in events if event == "token") == ANSWER
+    assert [data for event, data in custom_events if event == "agent_step"] == [
+        data for event, data in events_events if event == "agent_step"
+    ]
+
+
+def benchmark(tokens: int = 2000, runs: int = 5) -> dict:
+    """Per token overhead of each stream mode over the raw model stream, in microseconds."""
+    answer = " ".join(f"word{index}" for index in range(tokens))
+    results = {}
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        detach_conversation_memory(monkeypatch)
+        monkeypatch.setattr(CONFIG, "SEMANTIC_CACHE_ENABLED", False)
+        monkeypatch.setattr(CONFIG, "SSE_TOKEN_WINDOW_MS", 0)
+
+        async def raw_stream() -> float:
+            chat_model = make_chat_model([answer])
+            started_at = time.perf_counter()
+            async for _ in chat_model.astream_llm("prompt"):
+                pass
+            return time.perf_counter() - started_at
+
+        baseline = min(asyncio.run(raw_stream()) for _ in range(runs))
+        # FakeChatModel splits on whitespace and keeps the separators as chunks
+        chunks = 2 * tokens - 1
+        agent = Agent()
+        for stream_mode in ("custom", "events"):
+            elapsed = []
+            for run in range(runs):
+                started_at = time.perf_counter()
+                # A new query per run, the answer cache would serve the repeats
+                run_agent(f"How do I set up the project, {stream_mode} take {run}?", stream_mode, monkeypatch, answer, agent)
+                elapsed.append(time.perf_counter() - started_at)
+            results[f"{stream_mode}_us_per_token"] = round((min(elapsed) - baseline) / chunks * 1e6, 2)
+    return {"chunks": chunks, "raw_stream_us_per_token": round(baseline / chunks * 1e6, 2), **results}
+
+
+if __name__ == "__main__":
+    # python -m tests.test_stream_modes
+    print(benchmark())
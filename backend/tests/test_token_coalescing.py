@@ -0,0 +1,129 @@
+import asyncio
+import json
+import time
+from typing import List, Tuple
+
+import pytest
+
+from src.config import CONFIG
+from src.ai.agent import Agent
+from src.ai.streaming import TokenCoalescer, with_release_deadlines
+from tests.fakes import VIDEO_ID, make_agent_context, make_chat_model, detach_conversation_memory
+
+ANSWER = "You create a virtual environment, install the dependencies with pip and run the tests."
+QUERY = "How do I set up the project?"
+
+
+def stream_answer(answer: str = ANSWER, agent: Agent | None = None, **fake_options) -> List[Tuple[float, str]]:
+    """Runs the agent on a paced fake model, returns (seconds since start, frame) pairs."""
+    context = make_agent_context(make_chat_model([answer], **fake_options))
+    agent = agent or Agent()
+
+    async def collect() -> List[Tuple[float, str]]:
+        started_at = time.perf_counter()
+        input_state = {"user_query": QUERY, "conversation_history": []}
+        return [(time.perf_counter() - started_at, frame) async for frame in agent.run_agent(input_state, context)]
+
+    return asyncio.run(collect())
+
+
+def token_text(frame: str) -> str:
+    event_line, data_line = frame.strip().split("\n")
+    if event_line != "event: token":
+        return ""
+    return json.loads(data_line.removeprefix("data: "))["text"]
+
+
+@pytest.fixture(autouse=True)
+def isolated_agent(monkeypatch):
+    detach_conversation_memory(monkeypatch)
+    monkeypatch.setattr(CONFIG, "SEMANTIC_CACHE_ENABLED", False)
+    monkeypatch.setattr(CONFIG, "SSE_TOKEN_WINDOW_MS", 30)
+
+
+def test_first_token_is_released_immediately():
+    coalescer = TokenCoalescer(window_ms=30)
+
+    assert coalescer.push("You") == "You"
+    assert coalescer.push(" create") is None
+    assert coalescer.seconds_until_release() > 0
+
+
+def test_buffer_is_released_at_max_chars():
+    coalescer = TokenCoalescer(window_ms=10_000, max_chars=8)
+    coalescer.push("a")
+
+    assert coalescer.push("bcd") is None
+    assert coalescer.push("efghi") == "bcdefghi"
+
+
+def test_buffered_tail_is_flushed_while_the_stream_stalls():
+    async def stalling_stream():
+        for token in ("You", " create", " a"):
+            yield "token", {"text": token}
+        await asyncio.sleep(0.5)
+        yield "token", {"text": " virtual"}
+
+    async def run() -> List[Tuple[float, str]]:
+        coalescer = TokenCoalescer(window_ms=30)
+        released = []
+        started_at = time.perf_counter()
+        async for event_type, data in with_release_deadlines(stalling_stream(), coalescer):
+            text = coalescer.push(data["text"]) if event_type == "token" else coalescer.flush()
+            if text:
+                released.append((time.perf_counter() - started_at, text))
+        return released
+
+    released = asyncio.run(run())
+
+    assert [text for _, text in released] == ["You", " create a", " virtual"]
+    # Due 30ms after the first release, long before the stalled token arrives
+    assert released[1][0] < 0.25
+
+
+def test_agent_flushes_the_buffered_text_before_a_stall():
+    # FakeChatModel streams words and separators as chunks, chunk 9 is the space after "environment,"
+    frames = stream_answer(chunk_delay_seconds=0.001, stall_at=9, stall_seconds=0.5)
+    stalled_text = "You create a virtual environment,"
+
+    released_before_stall = "".join(token_text(frame) for elapsed, frame in frames if elapsed < 0.4)
+    assert released_before_stall == stalled_text
+    assert "".join(token_text(frame) for _, frame in frames) == ANSWER
+
+
+def benchmark(tokens: int = 400, runs: int = 3, chunk_delay_seconds: float = 0.002) -> dict:
+    """
+    Frames, bytes on the wire and CPU time per streamed answer, without coalescing
+    (SSE_TOKEN_WINDOW_MS=0) and with the default 30ms window. The model streams a chunk every
+    `chunk_delay_seconds`. CPU is the process time of the agent side only, the ASGI server's
+    work per frame (chunked encoding, socket writes) comes on top and scales with the frames.
+    """
+    answer = " ".join(f"word{index}" for index in range(tokens))
+    results = {}
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        detach_conversation_memory(monkeypatch)
+        monkeypatch.setattr(CONFIG, "SEMANTIC_CACHE_ENABLED", False)
+        agent = Agent()
+        for window_ms in (0, 30):
+            monkeypatch.setattr(CONFIG, "SSE_TOKEN_WINDOW_MS", window_ms)
+            cpu_times, frames = [], []
+            for run in range(runs):
+                # The answer cache would serve the repeats
+                agent.answer_cache.invalidate_video(VIDEO_ID)
+                started_cpu = time.process_time()
+                frames = stream_answer(answer, agent, chunk_delay_seconds=chunk_delay_seconds)
+                cpu_times.append(time.process_time() - started_cpu)
+            token_frames = [frame for _, frame in frames if frame.startswith("event: token")]
+            results[f"window_{window_ms}ms"] = {
+                "token_frames": len(token_frames),
+                "bytes": sum(len(frame.encode()) for _, frame in frames),
+                "cpu_ms": round(min(cpu_times) * 1000, 1),
+                "wall_ms": round(frames[-1][0] * 1000, 1),
+            }
+    return results
+
+
+if __name__ == "__main__":
+    # python -m tests.test_token_coalescing
+    for window, metrics in benchmark().items():
+        print(window, metrics)
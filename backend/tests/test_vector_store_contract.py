@@ -0,0 +1,222 @@
+"""
+Contract every VectorStore backend has to meet, run against the local exact and IVF stores.
+
+The Pinecone backend runs the same tests against a real index when PINECONE_CONTRACT_TESTS=1
+(with PINECONE_API_KEY and PINECONE_HOST set). Its writes are eventually consistent, so every
+check waits for the index to settle first.
+"""
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, List
+from uuid import uuid4
+
+import pytest
+
+from src.ai.vector_store import VectorStore
+from src.ai.local_vector_db.local_store import LocalVectorStore
+from src.ai.youtube.transcript_preprocessor import TranscriptChunk
+from tests.fakes import BagOfWordsEmbedder
+
+TOPICS = [
+    "Welcome and an overview of what the course covers.",
+    "Installing Python with the official installer on every platform.",
+    "Virtual environments isolate the dependencies of each project.",
+    "Writing unit tests with pytest fixtures and parametrized cases.",
+    "Packaging the project and publishing it to the package index.",
+    "Closing remarks, thanks for watching and see you next time.",
+]
+OTHER_TOPICS = [
+    "Baking sourdough bread needs an active starter.",
+    "Proofing the dough overnight in the fridge improves the flavour.",
+]
+SETTLE_TIMEOUT_SECONDS = 60.0
+
+
+@asynccontextmanager
+async def local_store(index_type: str, directory: str):
+    yield LocalVectorStore(BagOfWordsEmbedder(), index_type=index_type, directory=directory)
+
+
+@asynccontextmanager
+async def pinecone_store(directory: str):
+    from src.ai.pinecone_vector_db.youtube_chunks import init_pinecone_db
+
+    store = await init_pinecone_db()
+    try:
+        yield store
+    finally:
+        await store.index.close()
+        await store.client.close()
+
+
+BACKENDS = [
+    pytest.param(lambda directory: local_store("exact", directory), id="local-exact"),
+    pytest.param(lambda directory: local_store("ivf", directory), id="local-ivf"),
+    pytest.param(
+        pinecone_store,
+        id="pinecone",
+        marks=pytest.mark.skipif(
+            os.getenv("PINECONE_CONTRACT_TESTS") != "1", reason="needs a Pinecone index, set PINECONE_CONTRACT_TESTS=1"
+        ),
+    ),
+]
+
+
+def new_video_id() -> str:
+    # Shaped like a YouTube id, get_video_id passes those through
+    return uuid4().hex[:11]
+
+
+def records(video_id: str, texts: List[str]) -> dict:
+    return {
+        "video_id": video_id,
+        "records": [
+            TranscriptChunk(id=f"{video_id}-{minute}", start_time=minute, end_time=minute + 1, text=text, video_id=video_id)
+            for minute, text in enumerate(texts)
+        ],
+    }
+
+
+async def settle(check: Callable[[], Awaitable[bool]]):
+    """Polls until the check passes, local backends pass on the first try."""
+    deadline = time.monotonic() + SETTLE_TIMEOUT_SECONDS
+    while not await check():
+        assert time.monotonic() < deadline, "the vector store didn't settle"
+        await asyncio.sleep(1.0)
+
+
+def run_contract(make_store, tmp_path, scenario: Callable[[VectorStore, str, str], Awaitable[None]]):
+    """Runs the scenario on a fresh store holding two videos, both deleted afterwards."""
+
+    async def run():
+        async with make_store(str(tmp_path)) as store:
+            video_id, other_video_id = new_video_id(), new_video_id()
+            await store.upsert_records_into_vdb(records(video_id, TOPICS))
+            await store.upsert_records_into_vdb(records(other_video_id, OTHER_TOPICS))
+
+            async def is_searchable() -> bool:
+                chunks = await store.fetch_video_chunks(video_id)
+                hits = await store.retrieve_context("pytest fixtures", video_id, k=len(TOPICS))
+                return len(chunks) == len(TOPICS) and len(hits) == len(TOPICS)
+
+            await settle(is_searchable)
+            try:
+                await scenario(store, video_id, other_video_id)
+            finally:
+                await store.delete_video_transcript(video_id)
+                await store.delete_video_transcript(other_video_id)
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("make_store", BACKENDS)
+def test_implements_the_protocol(make_store, tmp_path):
+    async def scenario(store: VectorStore, video_id: str, other_video_id: str):
+        assert isinstance(store, VectorStore)
+        embedding = await store.embed_query("pytest fixtures")
+        assert len(embedding) > 0 and all(isinstance(value, float) for value in embedding)
+
+    run_contract(make_store, tmp_path, scenario)
+
+
+@pytest.mark.parametrize("make_store", BACKENDS)
+def test_search_returns_the_video_hits_best_first(make_store, tmp_path):
+    async def scenario(store: VectorStore, video_id: str, other_video_id: str):
+        hits = await store.retrieve_context("How do pytest fixtures work in unit tests?", video_id, k=3)
+
+        assert len(hits) == 3
+        assert hits[0]["_id"] == f"{video_id}-3"
+        assert all(hit["_id"].startswith(f"{video_id}-") for hit in hits)
+        scores = [hit["_score"] for hit in hits]
+        assert scores == sorted(scores, reverse=True)
+        assert set(hits[0]["fields"]) >= {"text", "start_time", "end_time"}
+        assert hits[0]["fields"]["text"] == TOPICS[3]
+        assert (hits[0]["fields"]["start_time"], hits[0]["fields"]["end_time"]) == (3, 4)
+
+    run_contract(make_store, tmp_path, scenario)
+
+
+@pytest.mark.parametrize("make_store", BACKENDS)
+def test_time_filter_keeps_chunks_inside_the_range(make_store, tmp_path):
+    async def scenario(store: VectorStore, video_id: str, other_video_id: str):
+        hits = await store.retrieve_context_with_time_filter(
+            "pytest fixtures", video_id, start_time=1, end_time=3, k=len(TOPICS)
+        )
+
+        assert {hit["_id"] for hit in hits} == {f"{video_id}-1", f"{video_id}-2"}
+        assert all(1 <= hit["fields"]["start_time"] and hit["fields"]["end_time"] <= 3 for hit in hits)
+
+    run_contract(make_store, tmp_path, scenario)
+
+
+@pytest.mark.parametrize("make_store", BACKENDS)
+def test_fetch_returns_every_chunk_of_the_video(make_store, tmp_path):
+    async def scenario(store: VectorStore, video_id: str, other_video_id: str):
+        chunks = sorted(await store.fetch_video_chunks(video_id), key=lambda chunk: chunk["start_time"])
+
+        assert [chunk["id"] for chunk in chunks] == [f"{video_id}-{minute}" for minute in range(len(TOPICS))]
+        assert [chunk["text"] for chunk in chunks] == TOPICS
+        assert [(chunk["start_time"], chunk["end_time"]) for chunk in chunks] == [
+            (minute, minute + 1) for minute in range(len(TOPICS))
+        ]
+        assert await store.fetch_video_chunks(new_video_id()) == []
+
+    run_contract(make_store, tmp_path, scenario)
+
+
+@pytest.mark.parametrize("make_store", BACKENDS)
+def test_upserting_known_ids_replaces_the_chunks(make_store, tmp_path):
+    async def scenario(store: VectorStore, video_id: str, other_video_id: str):
+        await store.upsert_records_into_vdb(records(video_id, ["Rewritten introduction about sourdough starters."]))
+
+        async def is_replaced() -> bool:
+            chunks = await store.fetch_video_chunks(video_id)
+            return any(chunk["text"].startswith("Rewritten") for chunk in chunks)
+
+        await settle(is_replaced)
+        chunks = await store.fetch_video_chunks(video_id)
+        assert len(chunks) == len(TOPICS)
+        assert sum(chunk["id"] == f"{video_id}-0" for chunk in chunks) == 1
+
+    run_contract(make_store, tmp_path, scenario)
+
+
+@pytest.mark.parametrize("make_store", BACKENDS)
+def test_delete_removes_only_that_video_and_notifies(make_store, tmp_path):
+    async def scenario(store: VectorStore, video_id: str, other_video_id: str):
+        deleted: List[str] = []
+        store.add_delete_listener(deleted.append)
+        assert await store.check_for_transcript(video_id)
+
+        await store.delete_video_transcript(video_id)
+
+        async def is_deleted() -> bool:
+            return not await store.check_for_transcript(video_id)
+
+        await settle(is_deleted)
+        assert deleted == [video_id]
+        assert await store.retrieve_context("pytest fixtures", video_id) == []
+        assert await store.fetch_video_chunks(video_id) == []
+        assert await store.check_for_transcript(other_video_id)
+        assert len(await store.fetch_video_chunks(other_video_id)) == len(OTHER_TOPICS)
+
+    run_contract(make_store, tmp_path, scenario)
+
+
+def test_legacy_namespaces_are_deleted_and_the_shared_one_kept(tmp_path):
+    # Local IVF only, on Pinecone it would wipe every other namespace of the index
+    async def scenario(store: VectorStore, video_id: str, other_video_id: str):
+        legacy_namespace = store._namespace("legacy-user", create=True)
+        legacy_namespace.insert(
+            [chunk.model_dump() for chunk in records(video_id, TOPICS)["records"]],
+            await store.embedder.embed_passages(TOPICS),
+        )
+
+        assert await store.delete_legacy_namespaces() == ["legacy-user"]
+        assert not (tmp_path / "legacy-user").exists()
+        assert await store.delete_legacy_namespaces() == []
+        assert len(await store.fetch_video_chunks(video_id)) == len(TOPICS)
+
+    run_contract(lambda directory: local_store("ivf", directory), tmp_path, scenario)
@@ -0,0 +1,184 @@
+"""
+When a transcript is sent whole instead of searched, and what the switch-over point costs.
+
+The sweep runs retrieve_video_context over synthetic lectures of growing length for several
+WHOLE_TRANSCRIPT_BUDGET_RATIO values. Every minute has its own topic sentence in speech
+filler, some questions also need the next minute, which continues the topic without naming
+it again, like speech does. The vector db is the local store with a fixed added round trip
+standing in for Pinecone. Latency is the retrieval only, the prefill of the extra prompt
+tokens comes on top in production.
+"""
+import asyncio
+import random
+import re
+import time
+from typing import Dict, List, Set, Tuple
+
+import pytest
+
+from src.ai.agent import retrieve_video_context
+from src.ai.components import Components
+from src.ai.context_packer import context_packer, count_tokens
+from src.ai.local_vector_db.local_store import LocalVectorStore
+from src.ai.transcript_store import TranscriptStore
+from src.ai.youtube.transcript_preprocessor import TranscriptPreprocessor
+from tests.fakes import BagOfWordsEmbedder, make_agent_context, make_chat_model, make_transcript_chunks
+
+MODEL_NAME = "openai/gpt-oss-20b"
+VECTOR_DB_ROUND_TRIP_SECONDS = 0.15
+LECTURE_MINUTES = (3, 6, 12, 25, 50)
+RATIOS = (0.0, 0.25, 0.5, 1.0, 2.0)
+
+TOPICS = (
+    "caching indexes migrations sockets threads queues tokens cookies sessions headers "
+    "schemas fixtures workers proxies certificates logging metrics retries timeouts pools "
+    "serializers validators routers templates signals webhooks uploads streams compression "
+    "pagination sorting filtering transactions replicas backups containers volumes secrets "
+    "permissions roles quotas throttling profiling tracing sharding partitions triggers "
+    "cursors snapshots checksums locks leases"
+).split()
+FILLER = (
+    "so um basically what we want here is to just take a look at this and you know see how "
+    "it works in practice because honestly it is one of those things people skip and later "
+    "regret so bear with me for a second while I pull up the editor and scroll down a bit"
+).split()
+
+
+class DelayedVectorStore(LocalVectorStore):
+    """Local store paying a fixed round trip on every search, like a hosted vector db."""
+
+    def __init__(self, *args, round_trip_seconds: float = VECTOR_DB_ROUND_TRIP_SECONDS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.round_trip_seconds = round_trip_seconds
+        self.searches = 0
+
+    async def retrieve_context(self, *args, **kwargs):
+        self.searches += 1
+        await asyncio.sleep(self.round_trip_seconds)
+        return await super().retrieve_context(*args, **kwargs)
+
+
+class UnreachableVectorStore:
+    """Fails the test on any use, for paths that must not touch the vector db."""
+
+    def __getattr__(self, name):
+        raise AssertionError(f"vector_db.{name} was used")
+
+
+def make_lecture(minutes: int, seed: int = 11) -> Tuple[List[str], Dict[str, Set[int]]]:
+    """Minute texts of about 150 words, and the questions with the minutes answering them."""
+    generator = random.Random(seed)
+    texts, questions = [], {}
+    for minute in range(minutes):
+        topic = TOPICS[minute % len(TOPICS)]
+        filler = " ".join(generator.choice(FILLER) for _ in range(130))
+        if minute % 4 == 1:
+            # The previous minute's topic goes on here without being named
+            texts.append(f"{filler} and that is also why you should never change them in production")
+        else:
+            texts.append(f"Next up are {topic}, here is how {topic} fit into the service. {filler}")
+        if minute % 4 == 0:
+            answer = {minute, minute + 1} if minute + 1 < minutes else {minute}
+            questions[f"What should I know about {topic}?"] = answer
+        elif minute % 4 == 2:
+            questions[f"How do {topic} fit into the service?"] = {minute}
+    return texts, questions
+
+
+def covered_minutes(packed_context: str) -> Set[int]:
+    """Minutes the packed context covers, read from its "[start-end min]" line prefixes."""
+    return {
+        minute
+        for start, end in re.findall(r"^\[(\d+)-(\d+) min\]", packed_context, re.MULTILINE)
+        for minute in range(int(start), int(end))
+    }
+
+
+def evaluate(directory: str, round_trip_seconds: float = VECTOR_DB_ROUND_TRIP_SECONDS) -> Dict[float, Dict[str, float]]:
+    """Per ratio, the share of questions answered whole, retrieval latency, context tokens and recall."""
+
+    async def run() -> Dict[float, Dict[str, float]]:
+        vector_db = DelayedVectorStore(
+            BagOfWordsEmbedder(), index_type="exact", directory=directory, round_trip_seconds=round_trip_seconds
+        )
+        components = Components(vector_db, TranscriptPreprocessor(), TranscriptStore())
+        lectures = []
+        for minutes in LECTURE_MINUTES:
+            video_id = f"lecture{minutes:04d}"
+            texts, questions = make_lecture(minutes)
+            chunks = make_transcript_chunks(video_id, texts)
+            await vector_db.upsert_records_into_vdb({"video_id": video_id, "records": chunks})
+            components.transcript_store.put(video_id, chunks)
+            lectures.append((video_id, questions))
+
+        results = {}
+        chat_model = make_chat_model([], MODEL_NAME)
+        initial_ratio = context_packer.whole_transcript_budget_ratio
+        try:
+            for ratio in RATIOS:
+                context_packer.whole_transcript_budget_ratio = ratio
+                samples = []
+                for video_id, questions in lectures:
+                    context = make_agent_context(chat_model, components)
+                    context.video_id = video_id
+                    for question, relevant in questions.items():
+                        searches = vector_db.searches
+                        started_at = time.perf_counter()
+                        chunks = await retrieve_video_context(context, question, None, None)
+                        latency = time.perf_counter() - started_at
+                        # Recall of what reaches the prompt, a whole transcript over budget is cut
+                        packed_context = context_packer.pack_context(chunks, MODEL_NAME)
+                        samples.append((
+                            vector_db.searches == searches,
+                            latency,
+                            count_tokens(packed_context),
+                            len(covered_minutes(packed_context) & relevant) / len(relevant),
+                        ))
+                results[ratio] = {
+                    "answered_whole": round(sum(sample[0] for sample in samples) / len(samples), 2),
+                    "latency_ms": round(sum(sample[1] for sample in samples) / len(samples) * 1000, 1),
+                    "context_tokens": round(sum(sample[2] for sample in samples) / len(samples)),
+                    "recall": round(sum(sample[3] for sample in samples) / len(samples), 3),
+                }
+        finally:
+            context_packer.whole_transcript_budget_ratio = initial_ratio
+        return results
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("start_time, end_time", [(None, None), (1, 2)])
+def test_short_cached_transcript_never_calls_the_vector_db(start_time, end_time):
+    components = Components(UnreachableVectorStore(), TranscriptPreprocessor(), TranscriptStore())
+    chunks = make_transcript_chunks()
+    components.transcript_store.put(chunks[0].video_id, chunks)
+    context = make_agent_context(make_chat_model([]), components)
+
+    relevant_context = asyncio.run(
+        retrieve_video_context(context, "How do I set up the project?", start_time, end_time)
+    )
+
+    assert [chunk["text"] for chunk in relevant_context] == [chunk.text for chunk in chunks]
+
+
+def test_whole_transcript_trades_tokens_for_recall_and_latency(tmp_path):
+    results = evaluate(str(tmp_path), round_trip_seconds=0.02)
+    searched, default = results[0.0], results[1.0]
+
+    assert searched["answered_whole"] == 0.0
+    assert 0.0 < default["answered_whole"] < 1.0
+    assert default["recall"] > searched["recall"]
+    assert default["latency_ms"] < searched["latency_ms"]
+    assert default["context_tokens"] > searched["context_tokens"]
+    assert all(results[low]["recall"] <= results[high]["recall"] for low, high in zip(RATIOS, RATIOS[1:]))
+    # Ratios past 1 are capped, an over budget transcript would lose its last minutes
+    assert (results[2.0]["answered_whole"], results[2.0]["recall"]) == (default["answered_whole"], default["recall"])
+
+
+if __name__ == "__main__":
+    # python -m tests.test_whole_transcript
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as directory:
+        for ratio, metrics in evaluate(directory).items():
+            print(f"ratio {ratio}", metrics)
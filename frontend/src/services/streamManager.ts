@@ -20,11 +20,11 @@ export type StreamErrorCallback = (chatId: string, error: Error) => void;
  * 1. PERSISTENCE SOURCE OF TRUTH: Handles the transition from a volatile AI stream to a permanent database record.
  * 2. OPTIMISTIC UPDATES: Immediately injects the generated answer into the TanStack Query cache 
  *    before the DB save finishes, ensuring 0ms latency for the user.
- * 3. DB SYNCHRONIZATION: Saves the Q&A pair to the backend and then "re-hydrates" the cache 
- *    with the real server-generated IDs and timestamps.
+ * 3. DB SYNCHRONIZATION: The agent endpoint persists the Q&A pair itself once the stream completes,
+ *    so no extra save request is made here.
  * 4. BACKGROUND NOTIFICATIONS: Detects if a stream completed in a chat that is NOT the current active one, 
  *    and triggers a "Response ready!" toast notification with navigation support.
- * 5. ERROR RECOVERY: Implements cache rollbacks if a database save fails after an optimistic update.
+ * 5. ERROR RECOVERY: Implements cache rollbacks if the cache update fails after an optimistic update.
  */
 class StreamManager {
   private static instance: StreamManager;
@@ -70,7 +70,7 @@ class StreamManager {
   }
 
   /**
-   * Handle stream completion - save to DB and update cache
+   * Handle stream completion - update cache (the backend already persisted the Q&A)
    */
   async handleStreamComplete(
     chatId: string,
@@ -133,45 +133,19 @@ class StreamManager {
         console.log(`[StreamManager] Cache updated optimistically for chat: ${chatId}`);
       }
 
-      // 2. Save Q&A to database in the background
-      const response = await chatApi.createQA(chatId, { query, answer });
-      const savedQA = response.data?.data;
-
-      // 3. Confirm the save by updating cache with REAL server data (if available)
-      if (this.queryClient && savedQA) {
-          this.queryClient.setQueryData(['chat-data', chatId], (old: any) => {
-              if (!old?.data?.questions_answers) return old;
-              
-              const qas = [...old.data.questions_answers];
-              // Find the optimistic entry we just added (last one likely, or match content)
-              const index = qas.findIndex((qa: any) => qa.query === query && qa.answer === answer);
-              
-              if (index !== -1) {
-                  // Update with server data (preserves order, updates timestamp/id)
-                  qas[index] = savedQA;
-                  return {
-                      ...old,
-                      data: {
-                          ...old.data,
-                          questions_answers: qas
-                      }
-                  };
-              }
-              return old;
-          });
-      }
+      // 2. The Q&A is saved by the backend at the end of the stream, nothing to send
 
-      console.log(`[StreamManager] Q&A saved to database for chat: ${chatId}`);
+      console.log(`[StreamManager] Q&A persisted server-side for chat: ${chatId}`);
 
-      // 4. Remove from active streams
+      // 3. Remove from active streams
       useStreamStore.getState().removeStream(chatId);
 
-      // 5. Notify all registered callbacks
+      // 4. Notify all registered callbacks
       this.completionCallbacks.forEach((callback) => {
         callback(chatId, query, answer);
       });
 
-      // 6. Show notification if this was a background stream
+      // 5. Show notification if this was a background stream
       if (!isCurrentChat) {
         toast.success('Response ready!', {
           description: 'Click to view the completed analysis',
@@ -188,7 +162,7 @@ class StreamManager {
       }
 
     } catch (error) {
-      console.error(`[StreamManager] Failed to save Q&A for chat ${chatId}:`, error);
+      console.error(`[StreamManager] Failed to update cache for chat ${chatId}:`, error);
       
       // ROLLBACK CACHE if save failed
       if (this.queryClient && previousData) {
@@ -204,8 +178,8 @@ class StreamManager {
         callback(chatId, error as Error);
       });
 
-      toast.error('Failed to save response', {
-        description: 'The response was generated but could not be saved.',
+      toast.error('Failed to show response', {
+        description: 'The response was generated but could not be displayed. Reload the chat.',
       });
     }
   }